@@ -0,0 +1,408 @@
+import atexit
+import gzip
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import click
+import psycopg2
+import psycopg2.extras
+
+from db import pooled_connection
+
+
+# Events written per multi-row INSERT, and the longest an event waits in
+# memory before its batch is flushed anyway
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 1.0
+
+# Events held in memory per process before the overflow policy kicks in
+MAX_QUEUE = 10_000
+
+# What log() does when the queue is full:
+#   "sync"  - write the event right away on its own connection (default)
+#   "block" - wait up to BLOCK_TIMEOUT for room, then drop it
+#   "drop"  - drop it
+OVERFLOW_POLICIES = ("sync", "block", "drop")
+BLOCK_TIMEOUT = 0.5
+
+# Failed batches are retried this many times before being written row by
+# row, so one bad event (say, a user deleted meanwhile) can't sink the rest
+FLUSH_RETRIES = 3
+
+INSERT_EVENTS = "INSERT INTO activity_log (user_id, action, details, timestamp) VALUES %s"
+
+# activity_log is partitioned by month (see create_tables.py). Maintenance
+# keeps this many future months created and archives partitions older
+# than the retention window to ARCHIVE_DIR as gzip'd CSV.
+PARTITIONS_AHEAD = 3
+RETENTION_MONTHS = 12
+ARCHIVE_DIR = "archive/activity_log"
+PARTITION_NAME = re.compile(r"activity_log_(\d{4})_(\d{2})")
+
+
+def _now():
+    # timestamptz, stored in the session time zone like CURRENT_TIMESTAMP
+    return datetime.now(timezone.utc)
+
+
+def write_events(conn, events):
+    """Insert ``(user_id, action, details, timestamp)`` rows in one statement"""
+    cursor = conn.cursor()
+    psycopg2.extras.execute_values(cursor, INSERT_EVENTS, events, page_size=len(events))
+    cursor.close()
+
+
+class ActivityWriter:
+    """Write-behind buffer for activity_log.
+
+    ``log`` only puts the event on a bounded in-process queue; a daemon
+    thread drains it and writes whole batches with one multi-row INSERT
+    whenever BATCH_SIZE events are waiting or FLUSH_INTERVAL has passed.
+    Events keep the time they were logged, not the time they were written.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_queue=MAX_QUEUE,
+                 overflow="sync", block_timeout=BLOCK_TIMEOUT):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown activity log overflow policy: {overflow}")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._flush_requested = threading.Event()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"queued": 0, "written": 0, "batches": 0, "overflow_sync": 0, "dropped": 0,
+                       "failed": 0}
+
+    def _count(self, field, n=1):
+        with self._stats_lock:
+            self._stats[field] += n
+
+    def _ensure_started(self):
+        # One drain thread per process: gunicorn workers forked after the
+        # first log() call must start their own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    # ---------------- producer side ----------------
+    def log(self, user_id, action, details=None):
+        """Queue an activity event for the writer thread"""
+        event = (user_id, action, details, _now())
+        self._ensure_started()
+        try:
+            if self.overflow == "block":
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            if self.overflow == "sync":
+                self._count("overflow_sync")
+                self.write([event])
+            else:
+                self._count("dropped")
+            return
+        self._count("queued")
+
+    def write(self, events):
+        """Write events now, bypassing the queue"""
+        self._write(events, attempts=1)
+
+    def flush(self, timeout=5.0):
+        """Ask the writer to flush now and wait until the queue is empty"""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        self._flush_requested.set()
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self._queue.unfinished_tasks == 0
+
+    def close(self, timeout=5.0):
+        """Flush what is queued and stop the writer thread"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ---------------- writer thread ----------------
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            elif self._stopping.is_set():
+                return
+
+    def _collect(self):
+        """Block for the first event, then take more until the batch is full or due"""
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if self._stopping.is_set() or self._flush_requested.is_set():
+                timeout = 0
+            elif deadline is None:
+                timeout = self.flush_interval
+            else:
+                timeout = deadline - time.monotonic()
+
+            try:
+                if timeout <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                if batch or self._stopping.is_set() or self._flush_requested.is_set():
+                    break
+                continue
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+
+        if not batch:
+            self._flush_requested.clear()
+        return batch
+
+    def _write(self, events, attempts=FLUSH_RETRIES):
+        for attempt in range(attempts):
+            try:
+                with pooled_connection() as conn:
+                    write_events(conn, events)
+                    conn.commit()
+                self._count("written", len(events))
+                self._count("batches")
+                return
+            except psycopg2.IntegrityError:
+                break
+            except Exception as e:
+                print(f"⚠️  activity_log write of {len(events)} event(s) failed: {e}", file=sys.stderr, flush=True)
+                if attempt + 1 < attempts:
+                    time.sleep(min(2 ** attempt, 5))
+
+        # Last resort: row by row, skipping the ones that still fail
+        written = 0
+        try:
+            with pooled_connection() as conn:
+                for event in events:
+                    try:
+                        write_events(conn, [event])
+                        conn.commit()
+                        written += 1
+                    except psycopg2.IntegrityError:
+                        conn.rollback()
+        except Exception as e:
+            print(f"⚠️  activity_log lost {len(events) - written} event(s): {e}", file=sys.stderr, flush=True)
+        self._count("written", written)
+        self._count("failed", len(events) - written)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(pending=self._queue.qsize(), max_queue=self._queue.maxsize, overflow=self.overflow,
+                     running=self._thread is not None and self._thread.is_alive())
+        return stats
+
+
+_writer = None
+_write_through = False
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        _writer = ActivityWriter()
+        atexit.register(_writer.close)
+    return _writer
+
+
+def log(conn, user_id, action, details=None, sync=False):
+    """Record an activity event.
+
+    By default the event is handed to the write-behind writer and ``conn``
+    is left alone, so call it after the change it describes has committed.
+    With ``sync`` the row is inserted in the caller's transaction instead
+    and commits or rolls back with it.
+
+    ACTIVITY_LOG_MODE=sync turns the write-behind off: events are written
+    one by one as they are logged, on the writer's own connection.
+    """
+    if sync:
+        write_events(conn, [(user_id, action, details, _now())])
+    elif _write_through:
+        get_writer().write([(user_id, action, details, _now())])
+    else:
+        get_writer().log(user_id, action, details)
+
+
+def log_many(conn, events, sync=False):
+    """Record several ``(user_id, action, details)`` events, like log().
+
+    With ``sync`` they go into the caller's transaction as one multi-row
+    INSERT.
+    """
+    now = _now()
+    rows = [(user_id, action, details, now) for user_id, action, details in events]
+    if not rows:
+        return
+    if sync:
+        write_events(conn, rows)
+    elif _write_through:
+        get_writer().write(rows)
+    else:
+        writer = get_writer()
+        for user_id, action, details in events:
+            writer.log(user_id, action, details)
+
+
+# ---------------- partition maintenance ----------------
+def _add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def create_partitions(conn, months_ahead=PARTITIONS_AHEAD):
+    """Make sure partitions exist from this month through ``months_ahead`` more"""
+    cursor = conn.cursor()
+    cursor.execute("""
+                   SELECT create_activity_log_partition(
+                                  (date_trunc('month', CURRENT_DATE) + make_interval(months => n))::DATE)
+                   FROM generate_series(0, %s) AS n
+                   """, (months_ahead,))
+    names = [row[0] for row in cursor.fetchall()]
+    conn.commit()
+    cursor.close()
+    return names
+
+
+def monthly_partitions(conn):
+    """Return ``[(name, month, attached)]`` for every monthly partition table.
+
+    Detached ones are included so an archive run that stopped halfway is
+    finished by the next one.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+                   SELECT c.relname, i.inhrelid IS NOT NULL
+                   FROM pg_class c
+                            LEFT JOIN pg_inherits i
+                                      ON i.inhrelid = c.oid AND i.inhparent = 'activity_log'::regclass
+                   WHERE c.relkind = 'r'
+                     AND c.relnamespace = current_schema()::regnamespace
+                     AND c.relname LIKE 'activity\\_log\\_%'
+                   ORDER BY c.relname
+                   """)
+    partitions = []
+    for name, attached in cursor.fetchall():
+        m = PARTITION_NAME.fullmatch(name)
+        if m:
+            partitions.append((name, date(int(m.group(1)), int(m.group(2)), 1), attached))
+    cursor.close()
+    return partitions
+
+
+def archive_partition(conn, name, archive_dir=ARCHIVE_DIR):
+    """Detach a monthly partition, write it to ``<archive_dir>/<name>.csv.gz`` and drop it.
+
+    The table is only dropped once the file is complete and on disk.
+    Returns ``(path, rows)``.
+    """
+    if not PARTITION_NAME.fullmatch(name):
+        raise ValueError(f"Not an activity_log partition: {name}")
+
+    cursor = conn.cursor()
+    cursor.execute("""
+                   SELECT 1
+                   FROM pg_inherits
+                   WHERE inhrelid = %s::regclass
+                     AND inhparent = 'activity_log'::regclass
+                   """, (name,))
+    if cursor.fetchone():
+        cursor.execute(f"ALTER TABLE activity_log DETACH PARTITION {name}")
+        conn.commit()
+
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial = path + ".part"
+    with open(partial, "wb") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8", newline="") as f:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+            rows = cursor.rowcount
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+
+    cursor.execute(f"DROP TABLE {name}")
+    conn.commit()
+    cursor.close()
+    return path, rows
+
+
+def archive_partitions(conn, retention_months=RETENTION_MONTHS, archive_dir=ARCHIVE_DIR, echo=None):
+    """Archive every monthly partition older than ``retention_months``"""
+    cutoff = _add_months(date.today().replace(day=1), -retention_months)
+    archived = []
+    for name, month, _ in monthly_partitions(conn):
+        if month >= cutoff:
+            continue
+        path, rows = archive_partition(conn, name, archive_dir)
+        archived.append((name, path, rows))
+        if echo:
+            echo(f"   {name}: {rows} row(s) -> {path}")
+    return archived
+
+
+@click.command("activity-partitions")
+@click.option("--ahead", type=int, default=PARTITIONS_AHEAD, show_default=True,
+              help="Future months to create partitions for")
+@click.option("--retain", type=int, default=RETENTION_MONTHS, show_default=True,
+              help="Months of activity to keep in the database")
+@click.option("--archive-dir", type=click.Path(file_okay=False), default=ARCHIVE_DIR, show_default=True)
+def activity_partitions_command(ahead, retain, archive_dir):
+    """Create upcoming activity_log partitions and archive expired ones."""
+    with pooled_connection() as conn:
+        names = create_partitions(conn, ahead)
+        click.echo(f"✅ activity_log partitions ready through {names[-1]}")
+        archived = archive_partitions(conn, retain, archive_dir, echo=click.echo)
+
+    if archived:
+        click.echo(f"📂 Archived {len(archived)} partition(s) to {archive_dir}")
+
+
+def init_app(app):
+    global _writer, _write_through
+
+    app.config.setdefault("ACTIVITY_LOG_MODE", "async")
+    app.config.setdefault("ACTIVITY_BATCH_SIZE", BATCH_SIZE)
+    app.config.setdefault("ACTIVITY_FLUSH_INTERVAL", FLUSH_INTERVAL)
+    app.config.setdefault("ACTIVITY_MAX_QUEUE", MAX_QUEUE)
+    app.config.setdefault("ACTIVITY_OVERFLOW", "sync")
+
+    _write_through = app.config["ACTIVITY_LOG_MODE"] == "sync"
+    _writer = ActivityWriter(batch_size=app.config["ACTIVITY_BATCH_SIZE"],
+                             flush_interval=app.config["ACTIVITY_FLUSH_INTERVAL"],
+                             max_queue=app.config["ACTIVITY_MAX_QUEUE"],
+                             overflow=app.config["ACTIVITY_OVERFLOW"])
+    atexit.register(_writer.close)
+
+    app.cli.add_command(activity_partitions_command)
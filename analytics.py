@@ -0,0 +1,412 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import click
+import psycopg2.extras
+
+from db import get_dict_cursor, pooled_connection
+
+
+# Rollup granularities; every event is counted once per grain
+GRAINS = ("hour", "day")
+
+# Funnel stages in order. Reaching a later stage counts as having passed
+# the earlier ones, so Applied -> Interview still counts as shortlisted.
+FUNNEL_STAGES = ("Applied", "Shortlisted", "Interview")
+
+# Rows younger than this may belong to transactions that have not
+# committed yet (activity_log is written behind the request), so the
+# watermarks never move past them
+SETTLE_SECONDS = 120
+
+# Source rows read per rollup transaction
+ROLLUP_BATCH_SIZE = 5000
+
+# pg_try_advisory_lock key so only one process rolls up at a time
+ROLLUP_LOCK_KEY = 72_310_001
+
+
+def _stage(status):
+    return FUNNEL_STAGES.index(status) if status in FUNNEL_STAGES else -1
+
+
+def _bucket(ts, grain):
+    if grain == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# ---------------- applications ----------------
+def _roll_up_applications_batch(conn, batch_size, settle_seconds):
+    """Fold the next batch of changed applications into the rollups.
+
+    Each row is diffed against analytics_application_state: unseen
+    applications count as new, a different status counts as a status
+    change timed from when the previous one was first seen. Only the
+    latest status of a row is visible, so several changes between two
+    runs are recorded as one.
+    """
+    cursor = get_dict_cursor(conn)
+    cursor.execute("""
+                   SELECT last_ts, last_id
+                   FROM analytics_watermarks
+                   WHERE source = 'applications'
+                       FOR UPDATE
+                   """)
+    mark = cursor.fetchone()
+
+    cursor.execute("""
+                   SELECT a.application_id,
+                          a.job_id,
+                          COALESCE(a.status, '') AS status,
+                          COALESCE(a.applied_on, a.updated_on) AS applied_on,
+                          a.updated_on,
+                          s.status       AS previous_status,
+                          s.status_since,
+                          s.stage
+                   FROM applications a
+                            LEFT JOIN analytics_application_state s ON s.application_id = a.application_id
+                   WHERE (%(last_ts)s::TIMESTAMP IS NULL
+                       OR (a.updated_on, a.application_id) > (%(last_ts)s, %(last_id)s))
+                     AND a.updated_on <= LOCALTIMESTAMP - make_interval(secs => %(settle)s)
+                   ORDER BY a.updated_on, a.application_id
+                   LIMIT %(limit)s
+                   """, {"last_ts": mark["last_ts"], "last_id": mark["last_id"],
+                         "settle": settle_seconds, "limit": batch_size})
+    rows = cursor.fetchall()
+    if not rows:
+        conn.rollback()
+        cursor.close()
+        return 0
+
+    applications = defaultdict(int)
+    changes = defaultdict(lambda: [0, 0.0])
+    funnel = defaultdict(int)
+    states = []
+
+    for row in rows:
+        stage = _stage(row["status"])
+        if row["previous_status"] is None:
+            for grain in GRAINS:
+                applications[(grain, _bucket(row["applied_on"], grain), row["job_id"])] += 1
+            previous_stage = -1
+            stage = max(stage, 0)
+            since = row["applied_on"] if row["status"] == FUNNEL_STAGES[0] else row["updated_on"]
+        elif row["status"] != row["previous_status"]:
+            seconds = max((row["updated_on"] - row["status_since"]).total_seconds(), 0.0)
+            for grain in GRAINS:
+                change = changes[(grain, _bucket(row["updated_on"], grain), row["job_id"],
+                                  row["previous_status"], row["status"])]
+                change[0] += 1
+                change[1] += seconds
+            previous_stage = row["stage"]
+            since = row["updated_on"]
+        else:
+            continue
+
+        for reached in range(previous_stage + 1, stage + 1):
+            funnel[(row["job_id"], FUNNEL_STAGES[reached])] += 1
+        states.append((row["application_id"], row["job_id"], row["status"], since,
+                       max(stage, previous_stage)))
+
+    if applications:
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO analytics_applications (grain, bucket, job_id, applications)
+            VALUES %s
+            ON CONFLICT (grain, bucket, job_id)
+                DO UPDATE SET applications = analytics_applications.applications + EXCLUDED.applications
+            """, [key + (n,) for key, n in applications.items()])
+    if changes:
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO analytics_status_changes (grain, bucket, job_id, from_status, to_status,
+                                                  changes, total_seconds)
+            VALUES %s
+            ON CONFLICT (grain, bucket, job_id, from_status, to_status)
+                DO UPDATE SET changes       = analytics_status_changes.changes + EXCLUDED.changes,
+                              total_seconds = analytics_status_changes.total_seconds + EXCLUDED.total_seconds
+            """, [key + tuple(totals) for key, totals in changes.items()])
+    if funnel:
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO analytics_job_funnel (job_id, stage, applications)
+            VALUES %s
+            ON CONFLICT (job_id, stage)
+                DO UPDATE SET applications = analytics_job_funnel.applications + EXCLUDED.applications
+            """, [key + (n,) for key, n in funnel.items()])
+    if states:
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO analytics_application_state (application_id, job_id, status, status_since, stage)
+            VALUES %s
+            ON CONFLICT (application_id)
+                DO UPDATE SET job_id       = EXCLUDED.job_id,
+                              status       = EXCLUDED.status,
+                              status_since = EXCLUDED.status_since,
+                              stage        = EXCLUDED.stage
+            """, states)
+
+    last = rows[-1]
+    cursor.execute("""
+                   UPDATE analytics_watermarks
+                   SET last_ts    = %s,
+                       last_id    = %s,
+                       updated_at = CURRENT_TIMESTAMP
+                   WHERE source = 'applications'
+                   """, (last["updated_on"], last["application_id"]))
+    conn.commit()
+    cursor.close()
+    return len(rows)
+
+
+# ---------------- activity log ----------------
+def _activity_bound(conn, settle_seconds):
+    """First log_id that may still have uncommitted neighbours, or None.
+
+    The timestamp filter only touches the newest partitions.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+                   SELECT MIN(log_id)
+                   FROM activity_log
+                   WHERE timestamp > LOCALTIMESTAMP - make_interval(secs => %s)
+                   """, (settle_seconds,))
+    bound = cursor.fetchone()[0]
+    conn.rollback()
+    cursor.close()
+    return bound
+
+
+def _roll_up_activity_batch(conn, bound, batch_size):
+    cursor = conn.cursor()
+    cursor.execute("""
+                   SELECT last_id
+                   FROM analytics_watermarks
+                   WHERE source = 'activity_log'
+                       FOR UPDATE
+                   """)
+    last_id = cursor.fetchone()[0]
+
+    cursor.execute("""
+                   WITH batch AS (SELECT log_id, action, timestamp
+                                  FROM activity_log
+                                  WHERE log_id > %(last_id)s
+                                    AND (%(bound)s::BIGINT IS NULL OR log_id < %(bound)s)
+                                  ORDER BY log_id
+                                  LIMIT %(limit)s),
+                        rolled AS (
+                            INSERT INTO analytics_activity (grain, bucket, action, events)
+                                SELECT g.grain, date_trunc(g.grain, b.timestamp), COALESCE(b.action, ''), COUNT(*)
+                                FROM batch b
+                                         CROSS JOIN (VALUES ('hour'), ('day')) AS g (grain)
+                                GROUP BY 1, 2, 3
+                                ON CONFLICT (grain, bucket, action)
+                                    DO UPDATE SET events = analytics_activity.events + EXCLUDED.events)
+                   SELECT COUNT(*), MAX(log_id)
+                   FROM batch
+                   """, {"last_id": last_id, "bound": bound, "limit": batch_size})
+    count, max_id = cursor.fetchone()
+
+    if count:
+        cursor.execute("""
+                       UPDATE analytics_watermarks
+                       SET last_id    = %s,
+                           updated_at = CURRENT_TIMESTAMP
+                       WHERE source = 'activity_log'
+                       """, (max_id,))
+        conn.commit()
+    else:
+        conn.rollback()
+    cursor.close()
+    return count
+
+
+# ---------------- driver ----------------
+def roll_up(conn, batch_size=ROLLUP_BATCH_SIZE, settle_seconds=SETTLE_SECONDS, rebuild=False):
+    """Bring every rollup up to date with its source tables.
+
+    With ``rebuild`` the rollups are emptied first and refilled from all
+    historical rows. Returns None without doing anything when another
+    process holds the rollup lock, otherwise a report of the rows folded in.
+    """
+    started = time.monotonic()
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_try_advisory_lock(%s)", (ROLLUP_LOCK_KEY,))
+    if not cursor.fetchone()[0]:
+        conn.rollback()
+        cursor.close()
+        return None
+
+    report = {"applications": 0, "activity": 0, "batches": 0}
+    try:
+        if rebuild:
+            reset(conn)
+
+        while True:
+            n = _roll_up_applications_batch(conn, batch_size, settle_seconds)
+            report["applications"] += n
+            if n:
+                report["batches"] += 1
+            if n < batch_size:
+                break
+
+        bound = _activity_bound(conn, settle_seconds)
+        while True:
+            n = _roll_up_activity_batch(conn, bound, batch_size)
+            report["activity"] += n
+            if n:
+                report["batches"] += 1
+            if n < batch_size:
+                break
+    finally:
+        conn.rollback()
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (ROLLUP_LOCK_KEY,))
+        conn.commit()
+        cursor.close()
+
+    report["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return report
+
+
+def reset(conn):
+    """Empty every rollup and rewind the watermarks, for a full backfill"""
+    cursor = conn.cursor()
+    cursor.execute("""
+                   TRUNCATE analytics_application_state, analytics_applications, analytics_status_changes,
+                       analytics_job_funnel, analytics_activity;
+                   UPDATE analytics_watermarks
+                   SET last_ts    = NULL,
+                       last_id    = 0,
+                       updated_at = CURRENT_TIMESTAMP;
+                   """)
+    conn.commit()
+    cursor.close()
+
+
+# ---------------- reporting (rollups only) ----------------
+def hr_report(conn, date_from, date_to, grain="day", job_id=None):
+    """Funnel, volume and status-change figures for the HR analytics endpoint.
+
+    ``date_from`` and ``date_to`` are inclusive dates. The funnel counts
+    are all-time; everything else is limited to the date range.
+    """
+    params = {"grain": grain, "date_from": date_from, "date_to": date_to + timedelta(days=1),
+              "job_id": job_id}
+    cursor = get_dict_cursor(conn)
+
+    cursor.execute("""
+                   SELECT bucket, SUM(applications)::INTEGER AS applications
+                   FROM analytics_applications
+                   WHERE grain = %(grain)s
+                     AND bucket >= %(date_from)s
+                     AND bucket < %(date_to)s
+                     AND (%(job_id)s::INTEGER IS NULL OR job_id = %(job_id)s)
+                   GROUP BY bucket
+                   ORDER BY bucket
+                   """, params)
+    applications = [{"bucket": row["bucket"].isoformat(), "applications": row["applications"]}
+                    for row in cursor.fetchall()]
+
+    cursor.execute("""
+                   SELECT f.job_id,
+                          j.title,
+                          SUM(f.applications) FILTER (WHERE f.stage = 'Applied')::INTEGER     AS applied,
+                          SUM(f.applications) FILTER (WHERE f.stage = 'Shortlisted')::INTEGER AS shortlisted,
+                          SUM(f.applications) FILTER (WHERE f.stage = 'Interview')::INTEGER   AS interview
+                   FROM analytics_job_funnel f
+                            LEFT JOIN jobs j ON j.job_id = f.job_id
+                   WHERE (%(job_id)s::INTEGER IS NULL OR f.job_id = %(job_id)s)
+                   GROUP BY f.job_id, j.title
+                   ORDER BY applied DESC NULLS LAST, f.job_id
+                   """, params)
+    funnel = []
+    for row in cursor.fetchall():
+        applied, shortlisted, interview = (row["applied"] or 0, row["shortlisted"] or 0, row["interview"] or 0)
+        funnel.append({
+            "job_id": row["job_id"],
+            "title": row["title"],
+            "applied": applied,
+            "shortlisted": shortlisted,
+            "interview": interview,
+            "shortlist_rate": round(shortlisted / applied, 4) if applied else None,
+            "interview_rate": round(interview / shortlisted, 4) if shortlisted else None,
+        })
+
+    cursor.execute("""
+                   SELECT from_status,
+                          to_status,
+                          SUM(changes)::INTEGER                     AS changes,
+                          SUM(total_seconds) / SUM(changes) / 3600 AS avg_hours
+                   FROM analytics_status_changes
+                   WHERE grain = 'day'
+                     AND bucket >= %(date_from)s
+                     AND bucket < %(date_to)s
+                     AND (%(job_id)s::INTEGER IS NULL OR job_id = %(job_id)s)
+                   GROUP BY from_status, to_status
+                   ORDER BY changes DESC
+                   """, params)
+    status_changes = [{"from": row["from_status"], "to": row["to_status"], "changes": row["changes"],
+                       "avg_hours": round(row["avg_hours"], 2)}
+                      for row in cursor.fetchall()]
+
+    cursor.execute("""
+                   SELECT bucket, action, events
+                   FROM analytics_activity
+                   WHERE grain = %(grain)s
+                     AND bucket >= %(date_from)s
+                     AND bucket < %(date_to)s
+                   ORDER BY bucket, action
+                   """, params)
+    activity = [{"bucket": row["bucket"].isoformat(), "action": row["action"], "events": row["events"]}
+                for row in cursor.fetchall()]
+
+    cursor.execute("SELECT source, last_ts, last_id, updated_at FROM analytics_watermarks ORDER BY source")
+    freshness = {row["source"]: {"last_ts": row["last_ts"].isoformat() if row["last_ts"] else None,
+                                 "last_id": row["last_id"],
+                                 "updated_at": row["updated_at"].isoformat()}
+                 for row in cursor.fetchall()}
+    cursor.close()
+
+    return {
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "grain": grain,
+        "job_id": job_id,
+        "applications": applications,
+        "funnel": funnel,
+        "status_changes": status_changes,
+        "activity": activity,
+        "watermarks": freshness,
+    }
+
+
+def _echo_report(report):
+    if report is None:
+        click.echo("⚠️  Another analytics rollup is running; nothing done")
+        return
+    click.echo(f"✅ Rolled up {report['applications']} application change(s) and "
+               f"{report['activity']} activity event(s) in {report['batches']} batch(es), "
+               f"{report['elapsed_ms']} ms")
+
+
+@click.command("analytics-rollup")
+@click.option("--batch-size", type=int, default=ROLLUP_BATCH_SIZE, show_default=True)
+def analytics_rollup_command(batch_size):
+    """Fold new application and activity rows into the HR analytics rollups."""
+    with pooled_connection() as conn:
+        _echo_report(roll_up(conn, batch_size))
+
+
+@click.command("analytics-backfill")
+@click.option("--batch-size", type=int, default=50_000, show_default=True)
+def analytics_backfill_command(batch_size):
+    """Rebuild the HR analytics rollups from all historical data.
+
+    Status changes from before the first rollup were never observed, so
+    historical applications only contribute their current status.
+    """
+    with pooled_connection() as conn:
+        _echo_report(roll_up(conn, batch_size, rebuild=True))
+
+
+def init_app(app):
+    app.cli.add_command(analytics_rollup_command)
+    app.cli.add_command(analytics_backfill_command)
@@ -1,14 +1,32 @@
-from flask import Flask, render_template, request, redirect, session, url_for, flash, send_from_directory, jsonify
+from flask import Flask, render_template, request, redirect, session, url_for, flash, send_from_directory, jsonify, \
+    Response
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from functools import wraps
-from PyPDF2 import PdfReader
 import psycopg2
-import psycopg2.extras
 import psycopg2.errors
+import io
 import os
-import re
+
+import activity
+import analytics
+import cache
+import chatbot
+import db
+import export
+import job_import
+import pagination
+import ranking
+import recommend
+import rescoring
+import resume_import
+import search
+import skill_extractor
+import stats
+import tasks
+from db import get_db_connection, get_dict_cursor
+from search import JOB_COLUMNS, MAX_PER_PAGE, did_you_mean, fuzzy_search_jobs, is_fuzzy_cursor, search_jobs
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "change-this-secret")
@@ -20,46 +38,26 @@ os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
 ALLOWED_EXTENSIONS = {"pdf"}
 
-
-def get_db_connection():
-    """Get PostgreSQL database connection with DictCursor"""
-    database_url = os.environ.get("DATABASE_URL")
-    if not database_url:
-        raise ValueError("DATABASE_URL environment variable is not set")
-
-    conn = psycopg2.connect(database_url)
-    return conn
-
-
-def get_dict_cursor(conn):
-    """Get a cursor that returns results as dictionaries"""
-    return conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-
-def parse_resume(file_path):
-    reader = PdfReader(file_path)
-    text = ""
-
-    for page in reader.pages:
-        text += page.extract_text() or ""
-
-    text = text.lower()
-
-    skills_list = [
-        "python", "java", "flask", "django",
-        "react", "node", "sql",
-        "machine learning", "html", "css", "javascript"
-    ]
-
-    detected_skills = [s for s in skills_list if s in text]
-
-    exp_match = re.search(r'(\d+)\+?\s+years', text)
-    experience = int(exp_match.group(1)) if exp_match else 0
-
-    return {
-        "skills": ", ".join(detected_skills),
-        "experience": experience
-    }
+app.config["USE_STATS_TABLE"] = os.environ.get("USE_STATS_TABLE", "0") == "1"
+app.config["CACHE_BACKEND"] = os.environ.get("CACHE_BACKEND", "memory")
+app.config["CACHE_SQLITE_PATH"] = os.environ.get("CACHE_SQLITE_PATH", "cache.sqlite")
+app.config["HOME_CACHE_TTL"] = int(os.environ.get("HOME_CACHE_TTL", 60))
+app.config["CHATBOT_CACHE_TTL"] = int(os.environ.get("CHATBOT_CACHE_TTL", 30))
+app.config["ACTIVITY_LOG_MODE"] = os.environ.get("ACTIVITY_LOG_MODE", "async")
+app.config["ACTIVITY_OVERFLOW"] = os.environ.get("ACTIVITY_OVERFLOW", "sync")
+
+db.init_app(app)
+activity.init_app(app)
+stats.init_app(app)
+cache.init_app(app)
+search.init_app(app)
+export.init_app(app)
+skill_extractor.init_app(app)
+resume_import.init_app(app)
+rescoring.init_app(app)
+chatbot.init_app(app)
+analytics.init_app(app)
+job_import.init_app(app)
 
 
 # ---------------- DECORATORS ----------------
@@ -101,34 +99,43 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-@app.route("/")
-def home():
+def load_home_page_data():
+    """Counters and featured jobs for the public home page"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT COUNT(*) FROM jobs WHERE status='Active'")
-    total_jobs = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(DISTINCT company) FROM jobs WHERE status='Active'")
-    total_companies = cursor.fetchone()[0]
-
     cursor = get_dict_cursor(conn)
+
     cursor.execute("""
-                   SELECT *
+                   SELECT COUNT(*)                AS total_jobs,
+                          COUNT(DISTINCT company) AS total_companies
+                   FROM jobs
+                   WHERE status = 'Active'
+                   """)
+    counts = cursor.fetchone()
+
+    cursor.execute(f"""
+                   SELECT {JOB_COLUMNS}
                    FROM jobs
                    WHERE status = 'Active'
                    ORDER BY created_at DESC
                    LIMIT 6
                    """)
-    featured_jobs = cursor.fetchall()
+    featured_jobs = [dict(job) for job in cursor.fetchall()]
 
     cursor.close()
-    conn.close()
 
-    return render_template("home.html",
-                           total_jobs=total_jobs,
-                           total_companies=total_companies,
-                           featured_jobs=featured_jobs)
+    return {
+        "total_jobs": counts["total_jobs"],
+        "total_companies": counts["total_companies"],
+        "featured_jobs": featured_jobs
+    }
+
+
+@app.route("/")
+def home():
+    data = cache.get_cache().get_or_set("home:page", load_home_page_data,
+                                        ttl=app.config["HOME_CACHE_TTL"])
+    return render_template("home.html", **data)
+
 
 @app.route("/register", methods=["GET", "POST"])
 def register():
@@ -151,15 +158,9 @@ def register():
 
             user_id = cursor.fetchone()[0]
 
-            cursor.execute(
-                """INSERT INTO activity_log (user_id, action, details)
-                   VALUES (%s, %s, %s)""",
-                (user_id, "REGISTRATION", f"{role} registered")
-            )
-
             conn.commit()
+            activity.log(conn, user_id, "REGISTRATION", f"{role} registered")
             cursor.close()
-            conn.close()
 
             flash("Registration successful", "success")
             return redirect(url_for("login"))
@@ -167,7 +168,6 @@ def register():
         except psycopg2.errors.UniqueViolation:
             conn.rollback()
             cursor.close()
-            conn.close()
             flash("Email already exists", "danger")
 
     return render_template("register.html")
@@ -189,7 +189,6 @@ def login():
 
         user = cursor.fetchone()
         cursor.close()
-        conn.close()
 
         if user and check_password_hash(user["password"], password):
             session["user_id"] = user["user_id"]
@@ -221,22 +220,7 @@ def logout():
 @hr_required
 def hr_dashboard():
     conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT COUNT(*) FROM jobs")
-    total_jobs = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM jobs WHERE status='Active'")
-    active_jobs = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM applications")
-    total_applications = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM applications WHERE status='Shortlisted'")
-    shortlisted = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM applications WHERE status='Interview'")
-    interviews = cursor.fetchone()[0]
+    dashboard_stats = stats.hr_dashboard_stats(conn)
 
     # Recent applications
     cursor = get_dict_cursor(conn)
@@ -257,15 +241,10 @@ def hr_dashboard():
     recent_applications = cursor.fetchall()
 
     cursor.close()
-    conn.close()
 
     return render_template("hr_dashboard.html",
-                           total_jobs=total_jobs,
-                           active_jobs=active_jobs,
-                           total_applications=total_applications,
-                           shortlisted=shortlisted,
-                           interviews=interviews,
-                           recent_applications=recent_applications)
+                           recent_applications=recent_applications,
+                           **dashboard_stats)
 
 
 # ---------------- HR - JOB POSTING ----------------
@@ -292,20 +271,17 @@ def post_job():
                                          skills_required, description, requirements,
                                          posted_by)
                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                       RETURNING job_id
                        """, (title, company, location, job_type,
                              experience_required, salary_range,
                              skills_required, description, requirements,
                              session['user_id']))
-
-        cursor.execute(
-            """INSERT INTO activity_log (user_id, action, details)
-               VALUES (%s, %s, %s)""",
-            (session['user_id'], "JOB_POSTED", f"Posted: {title}")
-        )
+        job_id = cursor.fetchone()[0]
 
         conn.commit()
+        activity.log(conn, session['user_id'], "JOB_POSTED", f"Posted: {title}")
         cursor.close()
-        conn.close()
+        cache.jobs_changed([job_id], conn)
 
         flash("Job posted successfully!", "success")
         return redirect(url_for("hr_jobs"))
@@ -313,60 +289,128 @@ def post_job():
     return render_template("post_job.html")
 
 
+# ---------------- HR - BULK JOB IMPORT ----------------
+@app.route("/hr/jobs/import", methods=["POST"])
+@hr_required
+def bulk_import_jobs():
+    """Merge a CSV/JSONL feed of openings into this user's jobs, keyed by external_ref.
+
+    The feed is an uploaded ``file`` or the raw request body; ``dry_run=1``
+    only validates it.
+    """
+    upload = request.files.get("file")
+    if upload:
+        fmt = request.form.get("format") or job_import.detect_format(upload.filename, upload.mimetype)
+        raw = upload.stream
+    else:
+        fmt = request.args.get("format") or job_import.detect_format(None, request.mimetype)
+        raw = request.stream
+    if fmt not in job_import.IMPORT_FORMATS:
+        return jsonify({"error": "Send a .csv or .jsonl feed, or set format=csv|jsonl"}), 400
+
+    try:
+        report = job_import.import_jobs(get_db_connection(),
+                                        io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""), fmt,
+                                        posted_by=session['user_id'],
+                                        dry_run=request.values.get("dry_run") == "1")
+    except UnicodeDecodeError:
+        return jsonify({"error": "Feed must be UTF-8 encoded"}), 400
+
+    return jsonify(report)
+
+
 # ---------------- HR - VIEW JOBS ----------------
 @app.route("/hr/jobs")
 @hr_required
 def hr_jobs():
-    conn = get_db_connection()
-    cursor = get_dict_cursor(conn)
-
-    cursor.execute("""
-                   SELECT j.*, COUNT(a.application_id) as application_count
-                   FROM jobs j
-                            LEFT JOIN applications a ON j.job_id = a.job_id
-                   GROUP BY j.job_id
-                   ORDER BY j.created_at DESC
-                   """)
-    jobs = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
+    page = pagination.fetch_page(
+        get_db_connection(),
+        f"""
+        SELECT {JOB_COLUMNS},
+               (SELECT COUNT(*) FROM applications a WHERE a.job_id = jobs.job_id) AS application_count
+        FROM jobs
+        WHERE TRUE {{keyset}}
+        """,
+        (),
+        key=("jobs.created_at", "jobs.job_id"),
+        key_fields=("created_at", "job_id"),
+        token=request.args.get("cursor"),
+        page_size=pagination.page_size_from_request(),
+        scope="hr_jobs",
+        with_total=True
+    )
 
-    return render_template("hr_jobs.html", jobs=jobs)
+    return render_template("hr_jobs.html", jobs=page.items, next_cursor=page.next_cursor,
+                           total_estimate=page.total)
 
 
 # ---------------- HR - VIEW APPLICATIONS ----------------
 @app.route("/hr/applications")
 @hr_required
 def hr_applications():
-    conn = get_db_connection()
-    cursor = get_dict_cursor(conn)
+    page = pagination.fetch_page(
+        get_db_connection(),
+        """
+        SELECT a.application_id,
+               a.status,
+               a.applied_on,
+               a.updated_on,
+               a.score,
+               a.cover_letter,
+               j.title AS job_title,
+               j.job_id,
+               u.full_name,
+               u.email,
+               u.phone,
+               u.skills,
+               u.experience_years,
+               u.resume_path
+        FROM applications a
+                 JOIN jobs j ON a.job_id = j.job_id
+                 JOIN users u ON a.candidate_id = u.user_id
+        WHERE TRUE {keyset}
+        """,
+        (),
+        key=("a.applied_on", "a.application_id"),
+        key_fields=("applied_on", "application_id"),
+        token=request.args.get("cursor"),
+        page_size=pagination.page_size_from_request(),
+        scope="hr_applications",
+        with_total=True
+    )
 
-    cursor.execute("""
-                   SELECT a.application_id,
-                          a.status,
-                          a.applied_on,
-                          a.score,
-                          a.cover_letter,
-                          j.title AS job_title,
-                          j.job_id,
-                          u.full_name,
-                          u.email,
-                          u.phone,
-                          u.skills,
-                          u.experience_years,
-                          u.resume_path
-                   FROM applications a
-                            JOIN jobs j ON a.job_id = j.job_id
-                            JOIN users u ON a.candidate_id = u.user_id
-                   ORDER BY a.applied_on DESC
-                   """)
-    applications = cursor.fetchall()
+    return render_template("hr_applications.html", applications=page.items,
+                           next_cursor=page.next_cursor, total_estimate=page.total)
 
-    cursor.close()
-    conn.close()
 
-    return render_template("hr_applications.html", applications=applications)
+# ---------------- HR - EXPORT APPLICATIONS ----------------
+@app.route("/hr/applications/export")
+@hr_required
+def export_applications():
+    fmt = request.args.get("format", "csv")
+    if fmt not in export.EXPORT_FORMATS:
+        flash("Unsupported export format", "danger")
+        return redirect(url_for("hr_applications"))
+
+    # Bad dates must fail here: once streaming starts the 200 is already sent
+    try:
+        date_from = date.fromisoformat(request.args["from"]) if request.args.get("from") else None
+        date_to = date.fromisoformat(request.args["to"]) if request.args.get("to") else None
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYY-MM-DD dates"}), 400
+
+    filters = {
+        "job_id": request.args.get("job_id", type=int),
+        "status": request.args.get("status") or None,
+        "date_from": date_from,
+        "date_to": date_to,
+        "include_cover_letter": request.args.get("cover_letters") == "1",
+    }
+    filename = f"applications_{datetime.now():%Y%m%d_%H%M%S}.{fmt}"
+
+    return Response(export.iter_export(fmt, filters),
+                    mimetype=export.EXPORT_FORMATS[fmt],
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 # ---------------- HR - UPDATE APPLICATION STATUS ----------------
@@ -388,20 +432,118 @@ def update_application(app_id):
         (new_status, hr_notes, app_id)
     )
 
-    cursor.execute(
-        """INSERT INTO activity_log (user_id, action, details)
-           VALUES (%s, %s, %s)""",
-        (session['user_id'], "STATUS_UPDATE", f"Application #{app_id} → {new_status}")
-    )
-
     conn.commit()
+    activity.log(conn, session['user_id'], "STATUS_UPDATE", f"Application #{app_id} → {new_status}")
     cursor.close()
-    conn.close()
 
     flash(f"Application status updated to {new_status}", "success")
     return redirect(url_for("hr_applications"))
 
 
+# ---------------- HR - BULK UPDATE APPLICATION STATUS ----------------
+BULK_UPDATE_MAX = 1000
+APPLICATION_STATUSES = ("Applied", "Shortlisted", "Interview", "Rejected", "Hired")
+PG_INT_MAX = 2 ** 31 - 1
+
+
+@app.route("/hr/applications/bulk-update", methods=["POST"])
+@hr_required
+def bulk_update_applications():
+    """Set one status (and optionally notes) on many applications at once.
+
+    JSON body: ``{"status": ..., "hr_notes": ..., "applications": [...]}``
+    where each application is an id or ``{"application_id": ..., "updated_on": ...}``.
+    When ``updated_on`` is sent the row is only changed if it still has
+    that value; otherwise it is reported as a conflict with its current one.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    new_status = data.get("status")
+    new_status = new_status.strip() if isinstance(new_status, str) else ""
+    hr_notes = data.get("hr_notes")
+    items = data.get("applications")
+
+    if not new_status or not isinstance(items, list) or not items:
+        return jsonify({"error": "status and a non-empty applications list are required"}), 400
+    if new_status not in APPLICATION_STATUSES:
+        return jsonify({"error": f"status must be one of: {', '.join(APPLICATION_STATUSES)}"}), 400
+    if hr_notes is not None and not isinstance(hr_notes, str):
+        return jsonify({"error": "hr_notes must be a string"}), 400
+    if len(items) > BULK_UPDATE_MAX:
+        return jsonify({"error": f"At most {BULK_UPDATE_MAX} applications per request"}), 400
+
+    entries = []  # (application_id, error) in request order
+    expected = {}  # application_id -> updated_on the client saw, or None
+    for item in items:
+        app_id, seen = ((item.get("application_id"), item.get("updated_on")) if isinstance(item, dict)
+                        else (item, None))
+        try:
+            if type(app_id) is not int or not 0 < app_id <= PG_INT_MAX:
+                raise ValueError("application_id must be a positive 32-bit integer")
+            seen = datetime.fromisoformat(seen) if seen is not None else None
+        except (TypeError, ValueError) as e:
+            entries.append((app_id, str(e)))
+            continue
+        expected.setdefault(app_id, seen)
+        entries.append((app_id, None))
+
+    updated, current = {}, {}
+    if expected:
+        ids = list(expected)
+        conn = get_db_connection()
+        cursor = get_dict_cursor(conn)
+
+        cursor.execute("""
+                       UPDATE applications a
+                       SET status     = %s,
+                           hr_notes   = COALESCE(%s, a.hr_notes),
+                           updated_on = CURRENT_TIMESTAMP
+                       FROM unnest(%s::INTEGER[], %s::TIMESTAMP[]) AS e (application_id, updated_on)
+                       WHERE a.application_id = ANY (%s)
+                         AND e.application_id = a.application_id
+                         AND (e.updated_on IS NULL OR a.updated_on = e.updated_on)
+                       RETURNING a.application_id, a.updated_on
+                       """, (new_status, hr_notes, ids, [expected[i] for i in ids], ids))
+        updated = {row["application_id"]: row["updated_on"] for row in cursor.fetchall()}
+
+        missed = [i for i in ids if i not in updated]
+        if missed:
+            cursor.execute("""
+                           SELECT application_id, updated_on
+                           FROM applications
+                           WHERE application_id = ANY (%s)
+                           """, (missed,))
+            current = {row["application_id"]: row["updated_on"] for row in cursor.fetchall()}
+
+        # One INSERT for the whole batch, committed with the changes it records
+        activity.log_many(conn, [(session['user_id'], "STATUS_UPDATE", f"Application #{app_id} → {new_status}")
+                                 for app_id in updated], sync=True)
+
+        conn.commit()
+        cursor.close()
+
+    results = []
+    for app_id, error in entries:
+        if error:
+            results.append({"application_id": app_id, "result": "invalid", "error": error})
+        elif app_id in updated:
+            results.append({"application_id": app_id, "result": "updated",
+                            "updated_on": updated[app_id].isoformat()})
+        elif app_id in current:
+            results.append({"application_id": app_id, "result": "conflict",
+                            "updated_on": current[app_id].isoformat() if current[app_id] else None})
+        else:
+            results.append({"application_id": app_id, "result": "not_found"})
+
+    return jsonify({
+        "status": new_status,
+        "updated": len(updated),
+        "conflicts": len(current),
+        "results": results,
+    })
+
+
 # ---------------- HR - DELETE JOB ----------------
 @app.route("/hr/job/<int:job_id>/delete", methods=["POST"])
 @hr_required
@@ -413,52 +555,63 @@ def delete_job(job_id):
     cursor.execute("DELETE FROM saved_jobs WHERE job_id = %s", (job_id,))
     cursor.execute("DELETE FROM jobs WHERE job_id = %s", (job_id,))
 
-    cursor.execute(
-        """INSERT INTO activity_log (user_id, action, details)
-           VALUES (%s, %s, %s)""",
-        (session['user_id'], "JOB_DELETED", f"Deleted Job ID: {job_id}")
-    )
+    # Deleting a job also deletes its applications; the audit row must not
+    # be lost if the process dies before the write-behind flush
+    activity.log(conn, session['user_id'], "JOB_DELETED", f"Deleted Job ID: {job_id}", sync=True)
 
     conn.commit()
     cursor.close()
-    conn.close()
+    cache.jobs_changed([job_id], conn)
 
     flash("Job deleted successfully", "info")
     return redirect(url_for("hr_jobs"))
 
 
+# ---------------- HR - RANK CANDIDATES FOR A JOB ----------------
+@app.route("/hr/job/<int:job_id>/ranking", methods=["GET"])
+@hr_required
+def rank_candidates(job_id):
+    """Best-matching candidates for a job, scored against its current skills"""
+    ranked = ranking.rank_candidates_for_job(
+        get_db_connection(), job_id,
+        top_k=max(1, request.args.get("limit", 50, type=int)),
+        min_experience=request.args.get("min_experience", type=int),
+        max_experience=request.args.get("max_experience", type=int),
+    )
+
+    if ranked is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"job_id": job_id, "candidates": ranked})
+
+
+# ---------------- HR - ANALYTICS ----------------
+@app.route("/hr/analytics", methods=["GET"])
+@hr_required
+def hr_analytics():
+    """Application funnels and activity from the analytics rollups"""
+    try:
+        date_to = date.fromisoformat(request.args["to"]) if request.args.get("to") else date.today()
+        date_from = (date.fromisoformat(request.args["from"]) if request.args.get("from")
+                     else date_to - timedelta(days=29))
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+
+    grain = request.args.get("grain", "day")
+    if grain not in analytics.GRAINS:
+        return jsonify({"error": f"grain must be one of: {', '.join(analytics.GRAINS)}"}), 400
+
+    return jsonify(analytics.hr_report(get_db_connection(), date_from, date_to, grain,
+                                       job_id=request.args.get("job_id", type=int)))
+
+
 # ---------------- CANDIDATE DASHBOARD ----------------
 @app.route("/candidate/dashboard")
 @candidate_required
 def candidate_dashboard():
     conn = get_db_connection()
-    cursor = conn.cursor()
-
     user_id = session['user_id']
 
-    cursor.execute("SELECT COUNT(*) FROM applications WHERE candidate_id = %s", (user_id,))
-    total_applications = cursor.fetchone()[0]
-
-    cursor.execute(
-        "SELECT COUNT(*) FROM applications WHERE candidate_id = %s AND status = 'Applied'",
-        (user_id,)
-    )
-    pending = cursor.fetchone()[0]
-
-    cursor.execute(
-        "SELECT COUNT(*) FROM applications WHERE candidate_id = %s AND status = 'Shortlisted'",
-        (user_id,)
-    )
-    shortlisted = cursor.fetchone()[0]
-
-    cursor.execute(
-        "SELECT COUNT(*) FROM applications WHERE candidate_id = %s AND status = 'Interview'",
-        (user_id,)
-    )
-    interviews = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM saved_jobs WHERE candidate_id = %s", (user_id,))
-    saved_count = cursor.fetchone()[0]
+    dashboard_stats = stats.candidate_dashboard_stats(conn, user_id)
 
     cursor = get_dict_cursor(conn)
     cursor.execute("""
@@ -478,15 +631,24 @@ def candidate_dashboard():
     recent_applications = cursor.fetchall()
 
     cursor.close()
-    conn.close()
+
+    recommended_jobs = recommend.recommended_jobs(conn, user_id)
 
     return render_template("candidate_dashboard.html",
-                           total_applications=total_applications,
-                           pending=pending,
-                           shortlisted=shortlisted,
-                           interviews=interviews,
-                           saved_count=saved_count,
-                           recent_applications=recent_applications)
+                           recent_applications=recent_applications,
+                           recommended_jobs=recommended_jobs,
+                           **dashboard_stats)
+
+
+# ---------------- CANDIDATE - RECOMMENDED JOBS ----------------
+@app.route("/candidate/recommendations", methods=["GET"])
+@candidate_required
+def candidate_recommendations():
+    """Top active jobs for the logged-in candidate from the in-memory skill index"""
+    limit = request.args.get("limit", recommend.DEFAULT_RECOMMENDATIONS, type=int)
+    jobs = recommend.recommended_jobs(get_db_connection(), session['user_id'],
+                                      limit=max(1, min(limit, recommend.MAX_RECOMMENDATIONS)))
+    return jsonify({"jobs": jobs})
 
 
 # ---------------- CANDIDATE - PROFILE ----------------
@@ -506,15 +668,11 @@ def candidate_profile():
             file = request.files['resume']
             if file and allowed_file(file.filename):
                 filename = secure_filename(f"{user_id}_{file.filename}")
-                filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                file.save(filepath)
+                resume_data = file.read()
+                with open(os.path.join(app.config["UPLOAD_FOLDER"], filename), "wb") as f:
+                    f.write(resume_data)
                 resume_path = filename
 
-                # Parse resume
-                parsed_data = parse_resume(filepath)
-                skills = parsed_data.get("skills", skills)
-                experience_years = parsed_data.get("experience", experience_years)
-
         conn = get_db_connection()
         cursor = conn.cursor()
 
@@ -540,17 +698,34 @@ def candidate_profile():
                            WHERE user_id = %s
                            """, (phone, location, skills, experience_years, user_id))
 
-        cursor.execute(
-            """INSERT INTO activity_log (user_id, action, details)
-               VALUES (%s, %s, %s)""",
-            (user_id, "PROFILE_UPDATE", "Profile updated")
-        )
+        if resume_path:
+            # Parsed by worker.py, which need not share this disk, so the PDF
+            # travels through the database; the task only becomes visible on
+            # commit. Uploads still waiting are superseded along with their task.
+            cursor.execute("DELETE FROM resume_uploads WHERE user_id = %s", (user_id,))
+            cursor.execute("""
+                           INSERT INTO resume_uploads (user_id, resume_path, content)
+                           VALUES (%s, %s, %s)
+                           RETURNING upload_id
+                           """, (user_id, resume_path, psycopg2.Binary(resume_data)))
+            upload_id = cursor.fetchone()[0]
+            tasks.enqueue(conn, "parse_resume",
+                          {"user_id": user_id,
+                           "resume_path": resume_path,
+                           "upload_id": upload_id},
+                          user_id=user_id, supersede=True)
 
         conn.commit()
+        activity.log(conn, user_id, "PROFILE_UPDATE", "Profile updated")
         cursor.close()
-        conn.close()
 
-        flash("Profile updated successfully!", "success")
+        # A skills edit changes the scores of this candidate's applications
+        rescoring.schedule_rescore(conn, [("candidate", user_id)])
+
+        if resume_path:
+            flash("Profile updated! Your resume is being parsed in the background.", "success")
+        else:
+            flash("Profile updated successfully!", "success")
         return redirect(url_for("candidate_dashboard"))
 
     conn = get_db_connection()
@@ -558,41 +733,56 @@ def candidate_profile():
     cursor.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
     user = cursor.fetchone()
     cursor.close()
-    conn.close()
 
-    return render_template("candidate_profile.html", user=user)
+    resume_task = tasks.latest_task(conn, "parse_resume", user_id)
+
+    return render_template("candidate_profile.html", user=user, resume_task=resume_task)
+
+
+@app.route("/candidate/profile/resume-status")
+@candidate_required
+def resume_parse_status():
+    """Polled by the profile page while a resume is queued or parsing"""
+    task = tasks.latest_task(get_db_connection(), "parse_resume", session['user_id'])
+    if not task:
+        return jsonify({"status": None})
+
+    return jsonify({
+        "status": "parsing" if task["status"] in ("queued", "running") else task["status"],
+        "error": task["error"],
+        "finished_at": task["finished_at"].isoformat() if task["finished_at"] else None,
+        "result": task["result"]
+    })
 
 
 # ---------------- CANDIDATE - BROWSE JOBS ----------------
 @app.route("/candidate/jobs")
 @candidate_required
 def browse_jobs():
-    conn = get_db_connection()
-    cursor = get_dict_cursor(conn)
-
     search = request.args.get("search", "")
     location = request.args.get("location", "")
+    job_type = request.args.get("job_type", "")
+    page_cursor = request.args.get("cursor")
+    per_page = pagination.page_size_from_request(maximum=MAX_PER_PAGE)
+    # A page after an automatic fuzzy fallback carries a fuzzy-scoped cursor
+    fuzzy = request.args.get("fuzzy") == "1" or is_fuzzy_cursor(page_cursor)
 
-    query = "SELECT * FROM jobs WHERE status = 'Active'"
-    params = []
-
-    if search:
-        query += " AND (title ILIKE %s OR skills_required ILIKE %s OR company ILIKE %s)"
-        params.extend([f"%{search}%", f"%{search}%", f"%{search}%"])
-
-    if location:
-        query += " AND location ILIKE %s"
-        params.append(f"%{location}%")
-
-    query += " ORDER BY created_at DESC"
+    conn = get_db_connection()
+    suggestion = None
 
-    cursor.execute(query, params)
-    jobs = cursor.fetchall()
+    if not fuzzy:
+        page = search_jobs(conn, search, location, job_type, cursor=page_cursor, per_page=per_page)
+        # Nothing matched exactly: retry typo-tolerant ("banglore", "pyhton")
+        fuzzy = not page.items and not page_cursor and bool(search or location)
 
-    cursor.close()
-    conn.close()
+    if fuzzy:
+        suggestion = did_you_mean(conn, search) if search else None
+        page = fuzzy_search_jobs(conn, suggestion or search, location, job_type,
+                                 cursor=page_cursor, per_page=per_page)
 
-    return render_template("browse_jobs.html", jobs=jobs, search=search, location=location)
+    return render_template("browse_jobs.html", jobs=page.items, search=search, location=location,
+                           job_type=job_type, next_cursor=page.next_cursor,
+                           fuzzy=fuzzy, suggestion=suggestion)
 
 
 # ---------------- CANDIDATE - VIEW JOB DETAILS ----------------
@@ -619,7 +809,6 @@ def job_details(job_id):
     is_saved = cursor.fetchone() is not None
 
     cursor.close()
-    conn.close()
 
     if not job:
         flash("Job not found", "danger")
@@ -650,11 +839,16 @@ def apply_job(job_id):
     cursor.execute("SELECT * FROM jobs WHERE job_id = %s", (job_id,))
     job = cursor.fetchone()
 
-    # Calculate matching score
-    user_skills = set(user['skills'].lower().split(", ")) if user['skills'] else set()
-    job_skills = set(job['skills_required'].lower().split(", ")) if job['skills_required'] else set()
-    matching_skills = user_skills.intersection(job_skills)
-    score = int((len(matching_skills) / len(job_skills)) * 100) if job_skills else 0
+    # Calculate matching score: share of the job's skills the candidate has
+    cursor.execute("""
+                   SELECT COALESCE(COUNT(us.skill_id) * 100 / NULLIF(COUNT(*), 0), 0) AS score
+                   FROM job_skills js
+                            LEFT JOIN user_skills us
+                                      ON us.skill_id = js.skill_id
+                                          AND us.user_id = %s
+                   WHERE js.job_id = %s
+                   """, (user_id, job_id))
+    score = cursor.fetchone()["score"]
 
     try:
         cursor = conn.cursor()
@@ -663,13 +857,8 @@ def apply_job(job_id):
                        VALUES (%s, %s, %s, %s, %s)
                        """, (job_id, user_id, cover_letter, user['resume_path'], score))
 
-        cursor.execute(
-            """INSERT INTO activity_log (user_id, action, details)
-               VALUES (%s, %s, %s)""",
-            (user_id, "APPLICATION", f"Applied to: {job['title']}")
-        )
-
         conn.commit()
+        activity.log(conn, user_id, "APPLICATION", f"Applied to: {job['title']}")
         flash("Application submitted successfully!", "success")
 
     except psycopg2.errors.UniqueViolation:
@@ -677,7 +866,6 @@ def apply_job(job_id):
         flash("You have already applied to this job", "warning")
 
     cursor.close()
-    conn.close()
 
     return redirect(url_for("job_details", job_id=job_id))
 
@@ -704,7 +892,6 @@ def save_job(job_id):
         flash("Job already saved", "info")
 
     cursor.close()
-    conn.close()
 
     return redirect(url_for("job_details", job_id=job_id))
 
@@ -724,7 +911,6 @@ def unsave_job(job_id):
 
     conn.commit()
     cursor.close()
-    conn.close()
 
     flash("Job removed from saved list", "info")
     return redirect(url_for("job_details", job_id=job_id))
@@ -736,30 +922,32 @@ def unsave_job(job_id):
 def my_applications():
     user_id = session['user_id']
 
-    conn = get_db_connection()
-    cursor = get_dict_cursor(conn)
-
-    cursor.execute("""
-                   SELECT a.application_id,
-                          a.status,
-                          a.applied_on,
-                          a.score,
-                          a.hr_notes,
-                          j.title,
-                          j.company,
-                          j.location,
-                          j.job_id
-                   FROM applications a
-                            JOIN jobs j ON a.job_id = j.job_id
-                   WHERE a.candidate_id = %s
-                   ORDER BY a.applied_on DESC
-                   """, (user_id,))
-    applications = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
+    page = pagination.fetch_page(
+        get_db_connection(),
+        """
+        SELECT a.application_id,
+               a.status,
+               a.applied_on,
+               a.score,
+               a.hr_notes,
+               j.title,
+               j.company,
+               j.location,
+               j.job_id
+        FROM applications a
+                 JOIN jobs j ON a.job_id = j.job_id
+        WHERE a.candidate_id = %s {keyset}
+        """,
+        (user_id,),
+        key=("a.applied_on", "a.application_id"),
+        key_fields=("applied_on", "application_id"),
+        token=request.args.get("cursor"),
+        page_size=pagination.page_size_from_request(),
+        scope=f"my_applications:{user_id}"
+    )
 
-    return render_template("my_applications.html", applications=applications)
+    return render_template("my_applications.html", applications=page.items,
+                           next_cursor=page.next_cursor)
 
 
 # ---------------- CANDIDATE - SAVED JOBS ----------------
@@ -768,22 +956,23 @@ def my_applications():
 def saved_jobs():
     user_id = session['user_id']
 
-    conn = get_db_connection()
-    cursor = get_dict_cursor(conn)
-
-    cursor.execute("""
-                   SELECT j.*, s.saved_on
-                   FROM saved_jobs s
-                            JOIN jobs j ON s.job_id = j.job_id
-                   WHERE s.candidate_id = %s
-                   ORDER BY s.saved_on DESC
-                   """, (user_id,))
-    jobs = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
+    page = pagination.fetch_page(
+        get_db_connection(),
+        f"""
+        SELECT {JOB_COLUMNS}, s.saved_on, s.save_id
+        FROM saved_jobs s
+                 JOIN jobs ON s.job_id = jobs.job_id
+        WHERE s.candidate_id = %s {{keyset}}
+        """,
+        (user_id,),
+        key=("s.saved_on", "s.save_id"),
+        key_fields=("saved_on", "save_id"),
+        token=request.args.get("cursor"),
+        page_size=pagination.page_size_from_request(),
+        scope=f"saved_jobs:{user_id}"
+    )
 
-    return render_template("saved_jobs.html", jobs=jobs)
+    return render_template("saved_jobs.html", jobs=page.items, next_cursor=page.next_cursor)
 
 
 # ---------------- RESUME DOWNLOAD ----------------
@@ -798,234 +987,7 @@ def download_resume(filename):
 def chatbot_message():
     """Handle chatbot queries and return job recommendations"""
     data = request.get_json()
-    user_message = data.get("message", "").lower().strip()
-
-    response = {
-        "message": "",
-        "jobs": [],
-        "suggestions": [],
-        "action": None
-    }
-
-    conn = get_db_connection()
-    cursor = get_dict_cursor(conn)
-
-    # Intent Detection
-    if any(keyword in user_message for keyword in ["hello", "hi", "hey", "start"]):
-        response["message"] = """👋 Hello! I'm your Job Assistant. I can help you with:
-
-- Find jobs by title, location, or skills
-- Get salary information
-- Connect with HR teams
-- Apply to positions
-
-What are you looking for today?"""
-        response["suggestions"] = [
-            "Show me Python jobs",
-            "Jobs in Bangalore",
-            "Full-time positions",
-            "Entry level jobs"
-        ]
-
-    elif any(keyword in user_message for keyword in ["available jobs", "show jobs", "list jobs", "all jobs"]):
-        cursor.execute("""
-                       SELECT *
-                       FROM jobs
-                       WHERE status = 'Active'
-                       ORDER BY created_at DESC
-                       LIMIT 6
-                       """)
-        jobs = cursor.fetchall()
-
-        response["message"] = f"📋 Found {len(jobs)} active positions for you!"
-        response["jobs"] = [dict(job) for job in jobs]
-        response["suggestions"] = ["Tell me more about these", "Jobs in specific location", "Filter by experience"]
-
-    elif "location" in user_message or any(
-            city in user_message for city in ["bangalore", "delhi", "mumbai", "hyderabad", "chennai", "pune"]):
-        # Extract location
-        location = None
-        cities = {
-            "bangalore": "Bangalore",
-            "delhi": "Delhi",
-            "mumbai": "Mumbai",
-            "hyderabad": "Hyderabad",
-            "chennai": "Chennai",
-            "pune": "Pune"
-        }
-        for key, value in cities.items():
-            if key in user_message:
-                location = value
-                break
-
-        if location:
-            cursor.execute("""
-                           SELECT *
-                           FROM jobs
-                           WHERE status = 'Active'
-                             AND location ILIKE %s
-                           ORDER BY created_at DESC
-                           """, (f"%{location}%",))
-            jobs = cursor.fetchall()
-
-            response["message"] = f"📍 Found {len(jobs)} jobs in {location}"
-            response["jobs"] = [dict(job) for job in jobs]
-        else:
-            response[
-                "message"] = "Which city are you interested in? (Bangalore, Delhi, Mumbai, Hyderabad, Chennai, Pune)"
-            response["suggestions"] = ["Bangalore", "Delhi", "Mumbai", "Hyderabad"]
-
-    elif any(keyword in user_message for keyword in
-             ["python", "java", "react", "developer", "engineer", "analyst", "hr", "ai", "ml"]):
-        # Extract skill/title
-        skills = ["python", "java", "react", "javascript", "sql", "ai", "ml", "data", "frontend", "backend"]
-        found_skill = None
-        for skill in skills:
-            if skill in user_message:
-                found_skill = skill
-                break
-
-        if found_skill:
-            cursor.execute("""
-                           SELECT *
-                           FROM jobs
-                           WHERE status = 'Active'
-                             AND (title ILIKE %s OR skills_required ILIKE %s OR description ILIKE %s)
-                           ORDER BY created_at DESC
-                           """, (f"%{found_skill}%", f"%{found_skill}%", f"%{found_skill}%"))
-            jobs = cursor.fetchall()
-
-            response["message"] = f"💼 Found {len(jobs)} {found_skill.capitalize()} related positions"
-            response["jobs"] = [dict(job) for job in jobs]
-        else:
-            response["message"] = "What specific skill or job title are you looking for?"
-
-    elif any(keyword in user_message for keyword in ["salary", "pay", "package", "lpa"]):
-        cursor.execute("""
-                       SELECT *
-                       FROM jobs
-                       WHERE status = 'Active'
-                         AND salary_range IS NOT NULL
-                         AND salary_range != ''
-                       ORDER BY created_at DESC
-                       LIMIT 6
-                       """)
-        jobs = cursor.fetchall()
-
-        response["message"] = "💰 Here are positions with salary information:"
-        response["jobs"] = [dict(job) for job in jobs]
-        response["suggestions"] = ["Show high paying jobs", "Entry level salaries"]
-
-    elif any(keyword in user_message for keyword in ["experience", "fresher", "entry level", "senior"]):
-        if "fresher" in user_message or "entry" in user_message:
-            exp_level = "0-2 years"
-        elif "senior" in user_message:
-            exp_level = "5+"
-        else:
-            exp_level = "2-4 years"
-
-        cursor.execute("""
-                       SELECT *
-                       FROM jobs
-                       WHERE status = 'Active'
-                         AND experience_required ILIKE %s
-                       ORDER BY created_at DESC
-                       """, (f"%{exp_level.split('-')[0]}%",))
-        jobs = cursor.fetchall()
-
-        response["message"] = f"🎯 Found {len(jobs)} positions for {exp_level} experience"
-        response["jobs"] = [dict(job) for job in jobs]
-
-    elif any(keyword in user_message for keyword in ["full-time", "part-time", "contract", "internship", "job type"]):
-        job_type = "Full-time"
-        if "part-time" in user_message or "part time" in user_message:
-            job_type = "Part-time"
-        elif "contract" in user_message:
-            job_type = "Contract"
-        elif "internship" in user_message:
-            job_type = "Internship"
-
-        cursor.execute("""
-                       SELECT *
-                       FROM jobs
-                       WHERE status = 'Active'
-                         AND job_type = %s
-                       ORDER BY created_at DESC
-                       """, (job_type,))
-        jobs = cursor.fetchall()
-
-        response["message"] = f"⏰ Found {len(jobs)} {job_type} positions"
-        response["jobs"] = [dict(job) for job in jobs]
-
-    elif any(keyword in user_message for keyword in ["hr", "contact", "connect", "recruiter"]):
-        response["message"] = """📞 To connect with our HR team:
-
-- Apply to any job posting
-- Our HR will review your application
-- You'll receive interview invitations via email
-- Direct contact info is available in job postings
-
-Would you like to see available positions?"""
-        response["suggestions"] = ["Show all jobs", "Jobs with immediate hiring"]
-
-    elif any(keyword in user_message for keyword in ["apply", "application", "how to apply"]):
-        response["message"] = """📝 How to Apply:
-
-1. Browse jobs that match your skills
-2. Click "Apply Now" on any job card
-3. Fill in your details and upload resume
-4. Submit your application
-5. Track status in your dashboard
-
-Ready to start? Let me show you some jobs!"""
-        response["suggestions"] = ["Show me jobs", "What documents needed?"]
-        response["action"] = "show_jobs"
-
-    elif any(keyword in user_message for keyword in ["help", "what can you do", "features"]):
-        response["message"] = """🤖 I can help you with:
-
-✅ Find jobs by title, skills, or location
-✅ Filter by experience level
-✅ Check salary information
-✅ Get job type details (Full-time, Part-time, etc.)
-✅ Guide you through application process
-✅ Connect you with HR teams
-
-Try asking:
-- "Show Python jobs in Bangalore"
-- "Entry level positions"
-- "Jobs with 10+ LPA salary"
-- "How to apply?"
-"""
-        response["suggestions"] = ["Show all jobs", "Jobs in my city", "Entry level jobs"]
-
-    else:
-        # Default fallback - search in all fields
-        cursor.execute("""
-                       SELECT *
-                       FROM jobs
-                       WHERE status = 'Active'
-                         AND (title ILIKE %s OR company ILIKE %s OR skills_required ILIKE %s OR description ILIKE %s)
-                       ORDER BY created_at DESC
-                       LIMIT 6
-                       """, (f"%{user_message}%", f"%{user_message}%", f"%{user_message}%", f"%{user_message}%"))
-        jobs = cursor.fetchall()
-
-        if jobs:
-            response["message"] = f"🔍 Found {len(jobs)} jobs matching '{user_message}'"
-            response["jobs"] = [dict(job) for job in jobs]
-        else:
-            response["message"] = """I didn't quite understand that. Try asking:
-
-- "Show me jobs in [city]"
-- "Find [skill] developer jobs"
-- "Entry level positions"
-- "Help" for more options"""
-            response["suggestions"] = ["Show all jobs", "Help", "Available locations"]
-
-    cursor.close()
-    conn.close()
-    return jsonify(response)
+    return chatbot.json_response(chatbot.respond(data.get("message", ""), data.get("cursor")))
 
 
 @app.route("/chatbot/job-details/<int:job_id>", methods=["GET"])
@@ -1034,15 +996,36 @@ def chatbot_job_details(job_id):
     conn = get_db_connection()
     cursor = get_dict_cursor(conn)
 
-    cursor.execute("SELECT * FROM jobs WHERE job_id=%s", (job_id,))
+    cursor.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE job_id = %s", (job_id,))
     job = cursor.fetchone()
 
     cursor.close()
-    conn.close()
 
     if job:
-        return jsonify(dict(job))
-    return jsonify({"error": "Job not found"}), 404
+        return chatbot.json_response(dict(job))
+    return chatbot.json_response({"error": "Job not found"}, 404)
+
+
+# ---------------- SYSTEM - DB POOL STATS ----------------
+@app.route("/hr/system/db-pool", methods=["GET"])
+@hr_required
+def db_pool_stats():
+    """Connection pool counters for sizing DB_POOL_MIN / DB_POOL_MAX"""
+    return jsonify(db.get_pool().stats())
+
+
+@app.route("/hr/system/cache", methods=["GET"])
+@hr_required
+def cache_stats():
+    """Cache hit/miss counters per namespace"""
+    return jsonify(cache.get_cache().stats())
+
+
+@app.route("/hr/system/activity-log", methods=["GET"])
+@hr_required
+def activity_log_stats():
+    """Write-behind activity log counters for this worker process"""
+    return jsonify(activity.get_writer().stats())
 
 
 # ---------------- RUN APP ----------------
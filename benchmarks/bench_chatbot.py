@@ -0,0 +1,87 @@
+"""Check the chatbot router against the golden corpus and time it.
+
+Usage: python benchmarks/bench_chatbot.py [data/chatbot_golden.jsonl]
+
+Every corpus message must route to its expected intent with exactly the
+expected entities; mismatches are listed and the exit status is 1. The
+router is then timed against the keyword cascade chatbot_message used
+before, which only picked the intent (entities were searched for again
+inside each branch).
+"""
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chatbot import router  # noqa: E402
+
+
+CORPUS = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "data", "chatbot_golden.jsonl")
+REPEAT = 200
+
+LEGACY_CASCADE = [
+    ("greeting", ["hello", "hi", "hey", "start"]),
+    ("show_jobs", ["available jobs", "show jobs", "list jobs", "all jobs"]),
+    ("location", ["location", "bangalore", "delhi", "mumbai", "hyderabad", "chennai", "pune"]),
+    ("skill", ["python", "java", "react", "developer", "engineer", "analyst", "hr", "ai", "ml"]),
+    ("salary", ["salary", "pay", "package", "lpa"]),
+    ("experience", ["experience", "fresher", "entry level", "senior"]),
+    ("job_type", ["full-time", "part-time", "contract", "internship", "job type"]),
+    ("hr_contact", ["hr", "contact", "connect", "recruiter"]),
+    ("apply_help", ["apply", "application", "how to apply"]),
+    ("help", ["help", "what can you do", "features"]),
+]
+
+
+def legacy_route(message):
+    message = message.lower().strip()
+    for intent, keywords in LEGACY_CASCADE:
+        if any(keyword in message for keyword in keywords):
+            return intent
+    return "fallback"
+
+
+def timed(fn, messages):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        for message in messages:
+            fn(message)
+        samples.append((time.perf_counter() - started) * 1e6 / len(messages))
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    with open(CORPUS, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    failures = []
+    legacy_agree = 0
+    for case in corpus:
+        match = router.route(case["message"])
+        if match.name != case["intent"] or match.entities != case["entities"]:
+            failures.append((case, match))
+        legacy_agree += legacy_route(case["message"]) == case["intent"]
+
+    print(f"{len(corpus)} messages: {len(corpus) - len(failures)} routed as expected, "
+          f"legacy cascade agreed on {legacy_agree}")
+    for case, match in failures:
+        print(f"  ✗ {case['message']!r}: expected {case['intent']} {case['entities']}, "
+              f"got {match.name} {match.entities}")
+
+    messages = [case["message"] for case in corpus]
+    print(f"{'router':<16} {'p50 us/msg':>11} {'p95 us/msg':>11}")
+    for label, fn in (("compiled", router.route), ("legacy cascade", legacy_route)):
+        p50, p95 = timed(fn, messages)
+        print(f"{label:<16} {p50:>11.1f} {p95:>11.1f}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
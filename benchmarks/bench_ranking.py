@@ -0,0 +1,88 @@
+"""Rank synthetic candidates against a job with the bitset engine.
+
+Usage: python benchmarks/bench_ranking.py [candidate_count]
+
+Builds a random candidate matrix in memory (no database needed), then times
+ranking.CandidateMatrix.rank for a few jobs, with and without experience
+filters. For comparison it also times the per-candidate set intersection
+apply_job uses, on a sample, and extrapolates it to the full population.
+"""
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ranking import CandidateMatrix, SkillVocabulary  # noqa: E402
+from skill_extractor import load_taxonomy_file  # noqa: E402
+
+
+CANDIDATES = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+REPEAT = 20
+TOP_K = 50
+LOOP_SAMPLE = 100_000
+
+
+def synthetic_matrix(vocabulary, n, seed=7):
+    rng = np.random.default_rng(seed)
+    skills_per_candidate = rng.integers(2, 13, size=n)
+    rows = np.repeat(np.arange(n), skills_per_candidate)
+    bits = rng.integers(0, len(vocabulary.slugs), size=len(rows)).astype(np.uint64)
+
+    matrix = np.zeros((n, vocabulary.words), dtype=np.uint64)
+    np.bitwise_or.at(matrix, (rows, (bits >> np.uint64(6)).astype(np.intp)),
+                     np.uint64(1) << (bits & np.uint64(63)))
+    experience = rng.integers(0, 21, size=n)
+    return CandidateMatrix(vocabulary, np.arange(1, n + 1), experience, matrix), rows, bits
+
+
+def timed(fn, *args, **kwargs):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn(*args, **kwargs)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    vocabulary = SkillVocabulary(slug for slug, _, _ in load_taxonomy_file())
+
+    started = time.perf_counter()
+    matrix, rows, bits = synthetic_matrix(vocabulary, CANDIDATES)
+    print(f"{CANDIDATES:,} candidates x {len(vocabulary.slugs)} skills "
+          f"({matrix.bits.nbytes / 2 ** 20:.0f} MiB) built in {time.perf_counter() - started:.1f}s")
+
+    jobs = {
+        "3 skills": vocabulary.slugs[:3],
+        "8 skills": vocabulary.slugs[10:90:10],
+        "15 skills, spread": vocabulary.slugs[::13],
+    }
+
+    print(f"{'job':<20} {'filter':<10} {'p50 ms':>9} {'p95 ms':>9} {'top score':>10}")
+    for label, slugs in jobs.items():
+        job_row = vocabulary.encode(slugs)
+        for filter_label, kwargs in (("none", {}), ("3-8 yrs", {"min_experience": 3, "max_experience": 8})):
+            p50, p95 = timed(matrix.rank, job_row, TOP_K, **kwargs)
+            _, scores = matrix.rank(job_row, TOP_K, **kwargs)
+            print(f"{label:<20} {filter_label:<10} {p50:>9.1f} {p95:>9.1f} {scores[0] if len(scores) else 0:>10}")
+
+    # apply_job's approach: one Python set intersection per candidate
+    sample = min(LOOP_SAMPLE, CANDIDATES)
+    boundaries = np.searchsorted(rows, np.arange(sample + 1))
+    candidate_sets = [set(bits[boundaries[i]:boundaries[i + 1]].tolist()) for i in range(sample)]
+    job_set = {vocabulary.index[slug] for slug in jobs["8 skills"]}
+
+    started = time.perf_counter()
+    scores = [len(skills & job_set) * 100 // len(job_set) for skills in candidate_sets]
+    sorted(range(sample), key=scores.__getitem__, reverse=True)[:TOP_K]
+    loop_ms = (time.perf_counter() - started) * 1000 * CANDIDATES / sample
+    print(f"python set loop (8 skills), extrapolated to {CANDIDATES:,}: {loop_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compare ILIKE scans with the full-text search index on synthetic jobs.
+
+Usage: DATABASE_URL=... python benchmarks/bench_search.py [row_count]
+
+Everything runs in a throwaway ``bench`` schema that mirrors ``public.jobs``
+(generated search_vector column and indexes included) and is dropped at the
+end, so it is safe to point at a development database.
+"""
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import build_job_search_query  # noqa: E402
+
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+REPEAT = 20
+TERMS = ["python", "react developer", "kubernetes", "data analyst", "pyth"]
+
+ILIKE_QUERY = """
+              SELECT *
+              FROM jobs
+              WHERE status = 'Active'
+                AND (title ILIKE %s OR company ILIKE %s OR skills_required ILIKE %s OR description ILIKE %s)
+              ORDER BY created_at DESC
+              LIMIT 21
+              """
+
+SEED_QUERY = """
+             INSERT INTO jobs (title, company, location, job_type, experience_required,
+                               salary_range, skills_required, description, requirements, status)
+             SELECT (ARRAY ['Python Developer', 'Frontend Engineer', 'Data Analyst', 'DevOps Engineer',
+                 'Java Backend Developer', 'QA Engineer', 'Product Manager', 'ML Engineer'])[1 + i % 8],
+                    'Company ' || (i % 5000),
+                    (ARRAY ['Bangalore', 'Delhi', 'Mumbai', 'Hyderabad', 'Chennai', 'Pune'])[1 + i % 6],
+                    'Full-time',
+                    (i % 8) || '-' || (i % 8 + 2) || ' years',
+                    '₹' || (i % 20) || '-' || (i % 20 + 5) || ' LPA',
+                    (ARRAY ['Python, Flask, SQL', 'React, JavaScript, CSS', 'Excel, SQL, Power BI',
+                        'AWS, Docker, Kubernetes', 'Java, Spring, SQL', 'Selenium, Python',
+                        'Roadmaps, Analytics', 'Python, PyTorch, ML'])[1 + i % 8],
+                    repeat('We are hiring engineers to build reliable products for customers. ', 6),
+                    'Relevant experience and good communication',
+                    CASE WHEN i % 10 = 0 THEN 'Closed' ELSE 'Active' END
+             FROM generate_series(1, %s) AS i
+             """
+
+
+def timed(cursor, query, params):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    cursor = conn.cursor()
+
+    cursor.execute("DROP SCHEMA IF EXISTS bench CASCADE")
+    cursor.execute("CREATE SCHEMA bench")
+    cursor.execute("CREATE TABLE bench.jobs (LIKE public.jobs INCLUDING ALL)")
+    cursor.execute("CREATE SEQUENCE bench.jobs_job_id_seq OWNED BY bench.jobs.job_id")
+    cursor.execute("ALTER TABLE bench.jobs ALTER COLUMN job_id SET DEFAULT nextval('bench.jobs_job_id_seq')")
+    cursor.execute("SET search_path TO bench, public")
+
+    print(f"Seeding {ROWS:,} jobs...")
+    cursor.execute(SEED_QUERY, (ROWS,))
+    cursor.execute("ANALYZE jobs")
+    conn.commit()
+
+    print(f"{'term':<18}{'ILIKE p50':>12}{'ILIKE p95':>12}{'FTS p50':>12}{'FTS p95':>12}")
+    try:
+        for term in TERMS:
+            pattern = f"%{term}%"
+            ilike = timed(cursor, ILIKE_QUERY, (pattern, pattern, pattern, pattern))
+            query, params, _ = build_job_search_query(term)
+            fts = timed(cursor, query, params)
+            print(f"{term:<18}{ilike[0]:>10.2f}ms{ilike[1]:>10.2f}ms{fts[0]:>10.2f}ms{fts[1]:>10.2f}ms")
+    finally:
+        conn.rollback()
+        cursor.execute("DROP SCHEMA bench CASCADE")
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare the old per-skill substring loop with the compiled skill extractor.
+
+Usage: python benchmarks/bench_skills.py [synthetic_skill_count]
+
+Both run over the same synthetic resume text. The loop is the one
+resume_parser used before (``[s for s in skills if s in text]``), given the
+full taxonomy so it does the same work; the extractor makes one pass over
+the text whatever the taxonomy size. Passing a count pads the taxonomy with
+synthetic skills to show how each side scales.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from skill_extractor import SkillExtractor, load_taxonomy_file, normalize  # noqa: E402
+
+
+SYNTHETIC = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+REPEAT = 50
+
+FILLER = ("worked on delivered led team built improved designed the a and with for "
+          "platform customers service internal years of experience project reports").split()
+
+
+def make_resume(taxonomy, words=1500, seed=7):
+    rng = random.Random(seed)
+    patterns = [p for _, _, ps in taxonomy for p in ps]
+    tokens = []
+    for _ in range(words):
+        tokens.append(rng.choice(patterns) if rng.random() < 0.05 else rng.choice(FILLER))
+    return " ".join(tokens)
+
+
+def loop_extract(patterns, text):
+    text = normalize(text)
+    return {slug for pattern, slug in patterns if pattern in text}
+
+
+def timed(fn, *args):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    taxonomy = load_taxonomy_file()
+    taxonomy += [(f"synthetic-{i}", f"Synthetic Skill {i}", [f"synthetic skill {i}"]) for i in range(SYNTHETIC)]
+    text = make_resume(taxonomy)
+
+    started = time.perf_counter()
+    extractor = SkillExtractor(taxonomy)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    patterns = [(normalize(p), slug) for slug, _, ps in taxonomy for p in ps]
+
+    print(f"{len(taxonomy)} skills, {len(patterns)} patterns, {len(text):,} chars of text")
+    print(f"automaton compiled in {compile_ms:.1f} ms")
+    print(f"{'method':<12} {'p50 ms':>9} {'p95 ms':>9} {'skills':>7}")
+
+    for label, fn, args in (("loop", loop_extract, (patterns, text)),
+                            ("automaton", extractor.extract, (text,))):
+        p50, p95 = timed(fn, *args)
+        print(f"{label:<12} {p50:>9.2f} {p95:>9.2f} {len(fn(*args)):>7}")
+
+    # The loop counts substring hits ("java" inside "javascript"); the
+    # automaton only counts whole-word matches, so its count can be lower.
+
+
+if __name__ == "__main__":
+    main()
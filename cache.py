@@ -0,0 +1,302 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class MemoryBackend:
+    """Per-process LRU store with per-entry expiry"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    @contextmanager
+    def lease(self, key, timeout):
+        # In-process callers are already serialized by Cache._flight
+        yield True
+
+
+class SQLiteBackend:
+    """Host-wide store shared by all gunicorn workers through a SQLite file.
+
+    Besides the entries it keeps short-lived leases so only one worker
+    recomputes an expired key while the others wait for its result.
+    Every ``purge_interval`` seconds a write also deletes expired entries
+    and leases, then the entries closest to expiry beyond ``max_entries``.
+    """
+
+    def __init__(self, path, max_entries=1024, purge_interval=30):
+        self.path = path
+        self.max_entries = max_entries
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._next_purge = 0.0
+        self.evictions = 0
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key        TEXT PRIMARY KEY,
+                value      BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_expires ON cache_entries (expires_at);
+            CREATE TABLE IF NOT EXISTS cache_leases (
+                key        TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            );
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return False, None
+        return True, pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time.time() + ttl)
+        )
+        if time.monotonic() >= self._next_purge:
+            self.purge()
+
+    def purge(self):
+        self._next_purge = time.monotonic() + self.purge_interval
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+        conn.execute("DELETE FROM cache_leases WHERE expires_at < ?", (now,))
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            cursor = conn.execute(
+                """DELETE FROM cache_entries
+                   WHERE key IN (SELECT key FROM cache_entries ORDER BY expires_at LIMIT ?)""",
+                (excess,)
+            )
+            self.evictions += cursor.rowcount
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix):
+        self._conn().execute(
+            "DELETE FROM cache_entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache_entries")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+    @contextmanager
+    def lease(self, key, timeout):
+        now = time.time()
+        cursor = self._conn().execute(
+            """INSERT INTO cache_leases (key, expires_at) VALUES (?, ?)
+               ON CONFLICT (key) DO UPDATE SET expires_at = excluded.expires_at
+               WHERE cache_leases.expires_at < ?""",
+            (key, now + timeout, now)
+        )
+        acquired = cursor.rowcount == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._conn().execute("DELETE FROM cache_leases WHERE key = ?", (key,))
+
+
+class Cache:
+    """TTL cache with single-flight recompute and per-namespace counters.
+
+    Keys are ``"<namespace>:<rest>"``; hit/miss counters are kept per
+    namespace so each cached page or endpoint can be tuned separately.
+    """
+
+    def __init__(self, backend, default_ttl=60, lease_timeout=10):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.lease_timeout = lease_timeout
+
+        # Striped per-key locks: bounded memory however many keys we see
+        self._flights = [threading.Lock() for _ in range(64)]
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, key, field):
+        namespace = key.split(":", 1)[0]
+        with self._stats_lock:
+            counters = self._stats.setdefault(
+                namespace, {"hits": 0, "misses": 0, "computes": 0, "coalesced": 0, "invalidations": 0}
+            )
+            counters[field] += 1
+
+    @contextmanager
+    def _flight(self, key):
+        with self._flights[hash(key) % len(self._flights)]:
+            yield
+
+    def get(self, key):
+        found, value = self.backend.get(key)
+        self._count(key, "hits" if found else "misses")
+        return value if found else None
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, self.default_ttl if ttl is None else ttl)
+
+    def get_or_set(self, key, compute, ttl=None):
+        """Return the cached value for ``key``, computing it at most once.
+
+        Concurrent misses in this process wait on a per-key lock; misses in
+        other processes wait on the backend lease (SQLite only) and pick up
+        the value the lease holder stores.
+        """
+        found, value = self.backend.get(key)
+        if found:
+            self._count(key, "hits")
+            return value
+        self._count(key, "misses")
+
+        with self._flight(key):
+            found, value = self.backend.get(key)
+            if found:
+                self._count(key, "coalesced")
+                return value
+
+            with self.backend.lease(key, self.lease_timeout) as acquired:
+                if not acquired:
+                    deadline = time.monotonic() + self.lease_timeout
+                    while time.monotonic() < deadline:
+                        time.sleep(0.05)
+                        found, value = self.backend.get(key)
+                        if found:
+                            self._count(key, "coalesced")
+                            return value
+
+                value = compute()
+                self._count(key, "computes")
+                self.set(key, value, ttl)
+                return value
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self.backend.delete(key)
+            self._count(key, "invalidations")
+
+    def invalidate_prefix(self, prefix):
+        self.backend.delete_prefix(prefix)
+        self._count(prefix, "invalidations")
+
+    def stats(self):
+        with self._stats_lock:
+            namespaces = {}
+            for namespace, counters in self._stats.items():
+                lookups = counters["hits"] + counters["misses"]
+                namespaces[namespace] = dict(
+                    counters, hit_rate=round(counters["hits"] / lookups, 4) if lookups else 0.0
+                )
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "evictions": self.backend.evictions,
+            "namespaces": namespaces,
+        }
+
+
+_cache = None
+_jobs_changed_listeners = []
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = Cache(MemoryBackend())
+    return _cache
+
+
+def on_jobs_changed(listener):
+    """Register ``listener(job_ids, conn=None)`` to run after jobs are created or removed"""
+    _jobs_changed_listeners.append(listener)
+    return listener
+
+
+def jobs_changed(job_ids=None, conn=None):
+    """Invalidation hook fired after a committed write to ``jobs``.
+
+    ``job_ids`` is the list of affected jobs when known, or None for
+    "anything may have changed". ``conn`` is the writer's connection, for
+    listeners that need to read back what changed.
+    """
+    get_cache().invalidate_prefix("home:")
+    for listener in _jobs_changed_listeners:
+        listener(job_ids, conn=conn)
+
+
+def init_app(app):
+    global _cache
+
+    app.config.setdefault("CACHE_BACKEND", "memory")
+    app.config.setdefault("CACHE_SQLITE_PATH", "cache.sqlite")
+    app.config.setdefault("CACHE_MAX_ENTRIES", 1024)
+    app.config.setdefault("CACHE_DEFAULT_TTL", 60)
+    app.config.setdefault("HOME_CACHE_TTL", 60)
+
+    if app.config["CACHE_BACKEND"] == "sqlite":
+        backend = SQLiteBackend(app.config["CACHE_SQLITE_PATH"], max_entries=app.config["CACHE_MAX_ENTRIES"])
+    else:
+        backend = MemoryBackend(max_entries=app.config["CACHE_MAX_ENTRIES"])
+    _cache = Cache(backend, default_ttl=app.config["CACHE_DEFAULT_TTL"])
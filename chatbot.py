@@ -0,0 +1,391 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app
+
+import cache
+from db import get_db_connection
+from intents import IntentRouter
+from pagination import fetch_page
+from search import did_you_mean, fuzzy_search_jobs, search_jobs, to_prefix_tsquery
+from skill_extractor import load_taxonomy_file
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+router = IntentRouter()
+
+# ---------------- ENTITIES ----------------
+CITIES = {
+    "bangalore": "Bangalore",
+    "bengaluru": "Bangalore",
+    "delhi": "Delhi",
+    "new delhi": "Delhi",
+    "mumbai": "Mumbai",
+    "bombay": "Mumbai",
+    "hyderabad": "Hyderabad",
+    "chennai": "Chennai",
+    "madras": "Chennai",
+    "pune": "Pune",
+    "kolkata": "Kolkata",
+    "noida": "Noida",
+    "gurgaon": "Gurgaon",
+    "gurugram": "Gurgaon",
+    "ahmedabad": "Ahmedabad",
+}
+
+JOB_TYPES = {
+    "full-time": "Full-time",
+    "full time": "Full-time",
+    "fulltime": "Full-time",
+    "part-time": "Part-time",
+    "part time": "Part-time",
+    "parttime": "Part-time",
+    "contract": "Contract",
+    "contractual": "Contract",
+    "internship": "Internship",
+    "intern": "Internship",
+}
+
+# Experience levels in years
+EXPERIENCE_LEVELS = {
+    "fresher": 0,
+    "freshers": 0,
+    "entry level": 0,
+    "entry-level": 0,
+    "junior": 1,
+    "mid level": 3,
+    "mid-level": 3,
+    "senior": 5,
+}
+
+ROLES = {role: role for role in ("developer", "engineer", "analyst", "frontend", "backend", "data")}
+
+router.entity("city", CITIES, fuzzy=True)
+router.entity("job_type", JOB_TYPES)
+router.entity("experience", EXPERIENCE_LEVELS)
+router.entity("role", ROLES)
+
+# Skills come from the taxonomy file rather than the database so the router
+# can be compiled at import time without a connection.
+SKILL_NAMES = {}
+for _slug, _name, _patterns in load_taxonomy_file():
+    SKILL_NAMES[_slug] = _name
+    router.entity("skill", {pattern: _slug for pattern in _patterns})
+
+router.entity_pattern("experience", r"(\d{1,2})\s*\+?\s*(?:years?|yrs?)", lambda m: int(m.group(1)))
+router.entity_pattern("salary", r"(\d{1,3})\s*\+?\s*(?:lpa|lakhs?)", lambda m: int(m.group(1)))
+
+CITY_LIST = "Bangalore, Delhi, Mumbai, Hyderabad, Chennai, Pune"
+
+# What a chat job card carries; the full job loads on demand from
+# /chatbot/job-details/<id>
+CARD_FIELDS = ("job_id", "title", "company", "location", "salary_range", "job_type", "experience_required")
+
+# Card fields plus created_at, which the keyset for "more" needs
+CARD_COLUMNS = ", ".join(f"jobs.{field}" for field in CARD_FIELDS) + ", jobs.created_at"
+
+# Job cards per reply; the rest are paged through with the "more" cursor
+CHAT_PAGE_SIZE = 5
+
+# Years assumed for "experience" questions that don't say how many
+DEFAULT_EXPERIENCE = 2
+
+
+def reply(message, jobs=(), suggestions=(), action=None, more=None):
+    return {
+        "message": message,
+        "jobs": [{field: job[field] for field in CARD_FIELDS} for job in jobs],
+        "suggestions": list(suggestions),
+        "action": action,
+        "more": more
+    }
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """Serialize a chatbot payload to JSON bytes, with orjson when installed.
+
+    Datetimes come out as ISO 8601 either way.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default)
+    return json.dumps(payload, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def json_response(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype="application/json")
+
+
+def build_chat_query(entities, columns=CARD_COLUMNS, require_salary=False):
+    """Compose every entity in a chat message into one active-job query.
+
+    Skills join through the job_skills index, with jobs that have more of
+    the asked skills first; cities are OR-ed ILIKEs the location trigram
+    index answers; role words ("analyst") go through search_vector when no
+    skill was named; experience and salary compare against the parsed
+    filter columns. Returns ``(query, params, key, key_fields)`` for
+    ``pagination.fetch_page``.
+    """
+    joins, join_params = "", []
+    where, where_params = ["jobs.status = 'Active'"], []
+    key = ["jobs.created_at", "jobs.job_id"]
+    key_fields = ["created_at", "job_id"]
+
+    if entities.get("skill"):
+        joins = """
+                JOIN (SELECT js.job_id, COUNT(*) AS matched
+                      FROM job_skills js
+                               JOIN skills s ON s.skill_id = js.skill_id
+                      WHERE s.slug = ANY (%s)
+                      GROUP BY js.job_id) m ON m.job_id = jobs.job_id"""
+        join_params.append(entities["skill"])
+        columns += ", m.matched"
+        key.insert(0, "m.matched")
+        key_fields.insert(0, "matched")
+    elif entities.get("role"):
+        where.append("jobs.search_vector @@ to_tsquery('english', %s)")
+        where_params.append(to_prefix_tsquery(" ".join(entities["role"])))
+
+    if entities.get("city"):
+        where.append("(" + " OR ".join(["jobs.location ILIKE %s"] * len(entities["city"])) + ")")
+        where_params.extend(f"%{city}%" for city in entities["city"])
+
+    if entities.get("job_type"):
+        where.append("jobs.job_type = ANY (%s)")
+        where_params.append(entities["job_type"])
+
+    if entities.get("experience"):
+        years = entities["experience"][0]
+        where.append("jobs.experience_min <= %s AND (jobs.experience_max IS NULL OR jobs.experience_max >= %s)")
+        where_params.extend([years, years])
+
+    if entities.get("salary"):
+        where.append("jobs.salary_max_lpa >= %s")
+        where_params.append(max(entities["salary"]))
+    elif require_salary:
+        where.append("jobs.salary_range IS NOT NULL AND jobs.salary_range != ''")
+
+    query = f"""
+             SELECT {columns}
+             FROM jobs{joins}
+             WHERE {" AND ".join(where)} {{keyset}}
+             """
+    return query, join_params + where_params, key, key_fields
+
+
+def find_jobs(conn, entities, cursor=None, scope="", require_salary=False, page_size=CHAT_PAGE_SIZE):
+    """One page of job cards for ``entities`` as a ``pagination.Page``"""
+    query, params, key, key_fields = build_chat_query(entities, require_salary=require_salary)
+    return fetch_page(conn, query, params, key, key_fields, cursor, page_size, scope)
+
+
+def describe(entities):
+    """Headline for the filters, like "Full-time Python jobs in Pune paying 10+ LPA"."""
+    if entities.get("skill"):
+        what = " / ".join(SKILL_NAMES[slug] for slug in entities["skill"])
+    else:
+        what = " ".join(entities.get("role", [])).title()
+    text = " ".join(filter(None, [" / ".join(entities.get("job_type", [])), what, "jobs"]))
+
+    if entities.get("city"):
+        text += " in " + " or ".join(entities["city"])
+    if entities.get("experience"):
+        years = entities["experience"][0]
+        text += " for freshers" if years == 0 else f" for {years} years' experience"
+    if entities.get("salary"):
+        text += f" paying {max(entities['salary'])}+ LPA"
+    return text
+
+
+def planned_reply(match, conn, cursor, icon, suggestions=(), defaults=None, require_salary=False):
+    """Run the planned query for a job intent and phrase the reply.
+
+    ``defaults`` fills in entities the message did not mention.
+    """
+    entities = {**(defaults or {}), **match.entities}
+    page = find_jobs(conn, entities, cursor, cache_key(match), require_salary)
+
+    headline = describe(entities)
+    if require_salary and not entities.get("salary"):
+        headline += " with salary information"
+    if cursor:
+        message = f"{icon} More {headline}"
+    else:
+        message = f"{icon} Found {len(page)}{'+' if page.has_more else ''} {headline}"
+    return reply(message, page.items, suggestions, more=page.next_cursor)
+
+
+# ---------------- INTENTS ----------------
+# Priorities keep the order the original if/elif chain checked intents in,
+# except greeting, which no longer shadows every message containing "hi".
+# Whichever of the job intents wins, every entity in the message narrows
+# the one query it runs.
+@router.intent("show_jobs", keywords=["available jobs", "show jobs", "list jobs", "all jobs", "show all jobs",
+                                      "show me jobs", "any jobs"], priority=100)
+def show_jobs(match, conn, cursor=None):
+    return planned_reply(match, conn, cursor, "📋",
+                         ["Tell me more about these", "Jobs in specific location", "Filter by experience"])
+
+
+@router.intent("location", keywords=["location", "locations", "city", "cities"], entities=["city"], priority=90)
+def location_jobs(match, conn, cursor=None):
+    if not match.entities.get("city"):
+        return reply(f"Which city are you interested in? ({CITY_LIST})",
+                     suggestions=["Bangalore", "Delhi", "Mumbai", "Hyderabad"])
+    return planned_reply(match, conn, cursor, "📍")
+
+
+@router.intent("skill", entities=["skill", "role"], priority=80)
+def skill_jobs(match, conn, cursor=None):
+    return planned_reply(match, conn, cursor, "💼")
+
+
+@router.intent("salary", keywords=["salary", "salaries", "pay", "package", "lpa", "ctc"], entities=["salary"],
+               priority=70)
+def salary_jobs(match, conn, cursor=None):
+    return planned_reply(match, conn, cursor, "💰", ["Show high paying jobs", "Entry level salaries"],
+                         require_salary=True)
+
+
+@router.intent("experience", keywords=["experience", "experienced"], entities=["experience"], priority=60)
+def experience_jobs(match, conn, cursor=None):
+    return planned_reply(match, conn, cursor, "🎯", defaults={"experience": [DEFAULT_EXPERIENCE]})
+
+
+@router.intent("job_type", keywords=["job type", "job types"], entities=["job_type"], priority=50)
+def job_type_jobs(match, conn, cursor=None):
+    return planned_reply(match, conn, cursor, "⏰", defaults={"job_type": ["Full-time"]})
+
+
+@router.intent("hr_contact", keywords=["hr", "contact", "connect", "recruiter", "recruiters"], priority=40,
+               static=True)
+def hr_contact(match):
+    return reply("""📞 To connect with our HR team:
+
+- Apply to any job posting
+- Our HR will review your application
+- You'll receive interview invitations via email
+- Direct contact info is available in job postings
+
+Would you like to see available positions?""", suggestions=["Show all jobs", "Jobs with immediate hiring"])
+
+
+@router.intent("apply_help", keywords=["apply", "application", "applications", "how to apply", "applying"],
+               priority=30, static=True)
+def apply_help(match):
+    return reply("""📝 How to Apply:
+
+1. Browse jobs that match your skills
+2. Click "Apply Now" on any job card
+3. Fill in your details and upload resume
+4. Submit your application
+5. Track status in your dashboard
+
+Ready to start? Let me show you some jobs!""", suggestions=["Show me jobs", "What documents needed?"],
+                 action="show_jobs")
+
+
+@router.intent("help", keywords=["help", "what can you do", "features"], priority=20, static=True)
+def help_message(match):
+    return reply("""🤖 I can help you with:
+
+✅ Find jobs by title, skills, or location
+✅ Filter by experience level
+✅ Check salary information
+✅ Get job type details (Full-time, Part-time, etc.)
+✅ Guide you through application process
+✅ Connect you with HR teams
+
+Try asking:
+- "Show Python jobs in Bangalore"
+- "Entry level positions"
+- "Jobs with 10+ LPA salary"
+- "How to apply?"
+""", suggestions=["Show all jobs", "Jobs in my city", "Entry level jobs"])
+
+
+@router.intent("greeting", keywords=["hello", "hi", "hey", "start", "good morning", "good evening"], priority=10,
+               static=True)
+def greeting(match):
+    return reply("""👋 Hello! I'm your Job Assistant. I can help you with:
+
+- Find jobs by title, location, or skills
+- Get salary information
+- Connect with HR teams
+- Apply to positions
+
+What are you looking for today?""", suggestions=["Show me Python jobs", "Jobs in Bangalore", "Full-time positions",
+                                                   "Entry level jobs"])
+
+
+@router.fallback_intent()
+def search_fallback(match, conn, cursor=None):
+    """Search in all fields, then retry with spelling corrections"""
+    page = search_jobs(conn, match.text, columns=CARD_COLUMNS, cursor=cursor, per_page=CHAT_PAGE_SIZE)
+    search_text = match.text
+
+    if not page.items:
+        # A cursor from the fuzzy pass below is ignored by search_jobs (its
+        # scope differs), so later fuzzy pages come back through here
+        search_text = did_you_mean(conn, match.text) or match.text
+        page = fuzzy_search_jobs(conn, search_text, columns=CARD_COLUMNS, cursor=cursor,
+                                 per_page=CHAT_PAGE_SIZE)
+
+    if page.items:
+        found = "More jobs" if cursor else f"Found {len(page)}{'+' if page.has_more else ''} jobs"
+        return reply(f"🔍 {found} matching '{search_text}'", page.items, more=page.next_cursor)
+    return reply("""I didn't quite understand that. Try asking:
+
+- "Show me jobs in [city]"
+- "Find [skill] developer jobs"
+- "Entry level positions"
+- "Help" for more options""", suggestions=["Show all jobs", "Help", "Available locations"])
+
+
+router.compile()
+
+
+def cache_key(match):
+    """``chatbot:<intent>:<entities>``, so rewordings of a query share an entry"""
+    key = json.dumps(match.entities, sort_keys=True, separators=(",", ":"))
+    return f"chatbot:{match.name}:{key}"
+
+
+@cache.on_jobs_changed
+def _invalidate_responses(job_ids, conn=None):
+    cache.get_cache().invalidate_prefix("chatbot:")
+
+
+def respond(message, cursor=None):
+    """Route a chat message and build the response for the widget.
+
+    Static intents are answered without checking out a database connection.
+    First pages of job lookups are cached for CHATBOT_CACHE_TTL seconds per
+    intent and entity set, and dropped whenever a job is posted or deleted.
+    Free-text fallback searches (one key per distinct message) and
+    ``cursor`` pages (a reply's "more" token) are not cached.
+    """
+    match = router.route(message)
+    if match.intent.static:
+        return match.intent.handler(match)
+    if cursor or match.intent is router.fallback:
+        return match.intent.handler(match, get_db_connection(), cursor)
+    return cache.get_cache().get_or_set(cache_key(match),
+                                        lambda: match.intent.handler(match, get_db_connection()),
+                                        ttl=current_app.config["CHATBOT_CACHE_TTL"])
+
+
+def init_app(app):
+    app.config.setdefault("CHATBOT_CACHE_TTL", 30)
@@ -1,6 +1,8 @@
 import os
 import psycopg2
 
+from skill_extractor import backfill_skill_links
+
 
 def get_db_connection():
     database_url = os.environ.get("DATABASE_URL")
@@ -70,18 +72,86 @@ def init_db():
                    );
                    """)
 
-    # ACTIVITY LOG TABLE
+    # ACTIVITY LOG TABLE (range-partitioned by month; activity.py creates
+    # partitions ahead of time and archives old ones)
+    # A plain activity_log from before partitioning is moved aside and
+    # copied over below
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('activity_log');")
+    row = cursor.fetchone()
+    migrate_activity_log = row is not None and row[0] == "r"
+    if migrate_activity_log:
+        cursor.execute("""
+                       ALTER TABLE activity_log RENAME TO activity_log_unpartitioned;
+                       ALTER INDEX activity_log_pkey RENAME TO activity_log_unpartitioned_pkey;
+                       ALTER SEQUENCE activity_log_log_id_seq RENAME TO activity_log_unpartitioned_log_id_seq;
+                       """)
+
     cursor.execute("""
                    CREATE TABLE IF NOT EXISTS activity_log
                    (
-                       log_id    SERIAL PRIMARY KEY,
+                       log_id    SERIAL,
                        user_id   INTEGER REFERENCES users (user_id),
                        action    TEXT,
                        details   TEXT,
-                       timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                   );
+                       timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                       PRIMARY KEY (log_id, timestamp)
+                   ) PARTITION BY RANGE (timestamp);
+
+                   -- Catches rows for months that have no partition yet
+                   CREATE TABLE IF NOT EXISTS activity_log_default
+                       PARTITION OF activity_log DEFAULT;
+
+                   -- Created on the parent, so every partition gets its own copy
+                   CREATE INDEX IF NOT EXISTS idx_activity_log_user_timestamp
+                       ON activity_log (user_id, timestamp);
+                   CREATE INDEX IF NOT EXISTS idx_activity_log_action_timestamp
+                       ON activity_log (action, timestamp);
+
+                   -- Create the partition for the month containing "month" (if
+                   -- missing), moving any of its rows out of the default partition
+                   CREATE OR REPLACE FUNCTION create_activity_log_partition(month DATE) RETURNS TEXT AS
+                   $$
+                   DECLARE
+                       start_at  DATE := date_trunc('month', month)::DATE;
+                       end_at    DATE := (date_trunc('month', month) + INTERVAL '1 month')::DATE;
+                       part_name TEXT := 'activity_log_' || to_char(month, 'YYYY_MM');
+                   BEGIN
+                       IF to_regclass(part_name) IS NOT NULL THEN
+                           RETURN part_name;
+                       END IF;
+
+                       EXECUTE format('CREATE TABLE %I (LIKE activity_log INCLUDING DEFAULTS)', part_name);
+                       EXECUTE format('WITH moved AS (DELETE FROM activity_log_default'
+                                      ' WHERE "timestamp" >= %L AND "timestamp" < %L RETURNING *)'
+                                      ' INSERT INTO %I SELECT * FROM moved', start_at, end_at, part_name);
+                       EXECUTE format('ALTER TABLE activity_log ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                                      part_name, start_at, end_at);
+                       RETURN part_name;
+                   END;
+                   $$ LANGUAGE plpgsql;
+
+                   SELECT create_activity_log_partition(
+                                  (date_trunc('month', CURRENT_DATE) + make_interval(months => n))::DATE)
+                   FROM generate_series(0, 3) AS n;
                    """)
 
+    if migrate_activity_log:
+        cursor.execute("""
+                       SELECT create_activity_log_partition(month::DATE)
+                       FROM (SELECT DISTINCT date_trunc('month', timestamp) AS month
+                             FROM activity_log_unpartitioned
+                             WHERE timestamp IS NOT NULL) AS months;
+
+                       INSERT INTO activity_log (log_id, user_id, action, details, timestamp)
+                       SELECT log_id, user_id, action, details, COALESCE(timestamp, CURRENT_TIMESTAMP)
+                       FROM activity_log_unpartitioned;
+
+                       SELECT setval('activity_log_log_id_seq', COALESCE(MAX(log_id), 0) + 1, false)
+                       FROM activity_log;
+
+                       DROP TABLE activity_log_unpartitioned;
+                       """)
+
     # SAVED JOBS TABLE
     cursor.execute("""
                    CREATE TABLE IF NOT EXISTS saved_jobs
@@ -94,6 +164,542 @@ def init_db():
                    );
                    """)
 
+    # BACKGROUND TASK QUEUE (worker.py claims rows with FOR UPDATE SKIP LOCKED)
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS task_queue
+                   (
+                       task_id      BIGSERIAL PRIMARY KEY,
+                       kind         TEXT      NOT NULL,
+                       payload      JSONB     NOT NULL DEFAULT '{}',
+                       user_id      INTEGER REFERENCES users (user_id),
+                       status       TEXT      NOT NULL DEFAULT 'queued',
+                       attempts     INTEGER   NOT NULL DEFAULT 0,
+                       max_attempts INTEGER   NOT NULL DEFAULT 3,
+                       error        TEXT,
+                       result       JSONB,
+                       queued_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                       run_after    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                       started_at   TIMESTAMP,
+                       finished_at  TIMESTAMP,
+                       duration_ms  INTEGER
+                   );
+                   CREATE INDEX IF NOT EXISTS idx_task_queue_runnable
+                       ON task_queue (task_id)
+                       WHERE status = 'queued';
+                   CREATE INDEX IF NOT EXISTS idx_task_queue_running
+                       ON task_queue (started_at)
+                       WHERE status = 'running';
+                   CREATE INDEX IF NOT EXISTS idx_task_queue_user
+                       ON task_queue (user_id, kind, task_id DESC);
+                   """)
+
+    # RESUME UPLOADS (the PDF handed to the worker, which may not share the
+    # web process's disk; removed once its parse_resume task succeeds)
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS resume_uploads
+                   (
+                       upload_id   BIGSERIAL PRIMARY KEY,
+                       user_id     INTEGER   NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+                       resume_path TEXT      NOT NULL,
+                       content     BYTEA     NOT NULL,
+                       uploaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                   );
+                   CREATE INDEX IF NOT EXISTS idx_resume_uploads_user
+                       ON resume_uploads (user_id);
+                   """)
+
+    # RESUME PARSE CACHE (keyed by file content, invalidated by parser version)
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS resume_parse_cache
+                   (
+                       content_sha256 TEXT      NOT NULL,
+                       parser_version TEXT      NOT NULL,
+                       text           TEXT,
+                       skills         TEXT,
+                       experience     INTEGER,
+                       hit_count      INTEGER   NOT NULL DEFAULT 0,
+                       created_at     TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                       last_hit_at    TIMESTAMP,
+                       PRIMARY KEY (content_sha256, parser_version)
+                   );
+                   ALTER TABLE resume_parse_cache
+                       ADD COLUMN IF NOT EXISTS pages INTEGER,
+                       ADD COLUMN IF NOT EXISTS limit_hit TEXT;
+                   """)
+
+    # BULK RESUME IMPORTS (one row per file, so reruns skip finished work)
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS resume_imports
+                   (
+                       source         TEXT      NOT NULL,
+                       path           TEXT      NOT NULL,
+                       status         TEXT      NOT NULL,
+                       content_sha256 TEXT,
+                       pages          INTEGER,
+                       user_id        INTEGER REFERENCES users (user_id) ON DELETE SET NULL,
+                       error          TEXT,
+                       duration_ms    INTEGER,
+                       imported_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                       PRIMARY KEY (source, path)
+                   );
+                   ALTER TABLE resume_imports
+                       ADD COLUMN IF NOT EXISTS limit_hit TEXT;
+                   CREATE INDEX IF NOT EXISTS idx_users_email_lower
+                       ON users (lower(email));
+                   """)
+
+    # SKILL TAXONOMY (canonical skills + every spelling that maps to one)
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS skills
+                   (
+                       skill_id SERIAL PRIMARY KEY,
+                       slug     TEXT UNIQUE NOT NULL,
+                       name     TEXT        NOT NULL
+                   );
+                   CREATE TABLE IF NOT EXISTS skill_aliases
+                   (
+                       alias    TEXT PRIMARY KEY,
+                       skill_id INTEGER NOT NULL REFERENCES skills (skill_id) ON DELETE CASCADE
+                   );
+                   CREATE INDEX IF NOT EXISTS idx_skill_aliases_skill
+                       ON skill_aliases (skill_id);
+                   ALTER TABLE skills
+                       ADD COLUMN IF NOT EXISTS curated BOOLEAN NOT NULL DEFAULT TRUE;
+
+                   -- Only curated aliases (from load-skills) feed the resume
+                   -- extractor; the ones the sync triggers add for skill-list
+                   -- tokens ("Go", "C") are for linking and would match prose
+                   ALTER TABLE skill_aliases
+                       ADD COLUMN IF NOT EXISTS curated BOOLEAN;
+                   UPDATE skill_aliases a
+                   SET curated = s.curated AND NOT (length(s.name) <= 2 AND a.alias = lower(s.name))
+                   FROM skills s
+                   WHERE s.skill_id = a.skill_id
+                     AND a.curated IS NULL;
+                   ALTER TABLE skill_aliases
+                       ALTER COLUMN curated SET DEFAULT FALSE,
+                       ALTER COLUMN curated SET NOT NULL;
+                   """)
+
+    # USER / JOB SKILLS (normalized from users.skills and jobs.skills_required)
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS user_skills
+                   (
+                       user_id  INTEGER NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+                       skill_id INTEGER NOT NULL REFERENCES skills (skill_id) ON DELETE CASCADE,
+                       PRIMARY KEY (user_id, skill_id)
+                   );
+                   CREATE INDEX IF NOT EXISTS idx_user_skills_skill
+                       ON user_skills (skill_id, user_id);
+
+                   CREATE TABLE IF NOT EXISTS job_skills
+                   (
+                       job_id   INTEGER NOT NULL REFERENCES jobs (job_id) ON DELETE CASCADE,
+                       skill_id INTEGER NOT NULL REFERENCES skills (skill_id) ON DELETE CASCADE,
+                       PRIMARY KEY (job_id, skill_id)
+                   );
+                   CREATE INDEX IF NOT EXISTS idx_job_skills_skill
+                       ON job_skills (skill_id, job_id);
+                   """)
+
+    # Skill lists are split on , ; | and newlines; tokens are matched to
+    # skill_aliases case-insensitively. Tokens not in the taxonomy get an
+    # uncurated skill of their own, so nothing in the old strings is lost.
+    cursor.execute("""
+                   CREATE OR REPLACE FUNCTION skill_tokens(list TEXT) RETURNS SETOF TEXT AS
+                   $$
+                   SELECT DISTINCT btrim(regexp_replace(token, '\\s+', ' ', 'g'))
+                   FROM regexp_split_to_table(coalesce(list, ''), '[,;|\\n]') AS token
+                   WHERE btrim(token) <> ''
+                   $$ LANGUAGE sql IMMUTABLE;
+
+                   CREATE OR REPLACE FUNCTION skill_slug(token TEXT) RETURNS TEXT AS
+                   $$
+                   SELECT btrim(regexp_replace(lower(token), '[^a-z0-9+#.]+', '-', 'g'), '-')
+                   $$ LANGUAGE sql IMMUTABLE;
+
+                   CREATE OR REPLACE FUNCTION register_skill_tokens(list TEXT) RETURNS void AS
+                   $$
+                   INSERT INTO skills (slug, name, curated)
+                   SELECT DISTINCT ON (skill_slug(t)) skill_slug(t), t, FALSE
+                   FROM skill_tokens(list) AS t
+                   WHERE skill_slug(t) <> ''
+                     AND NOT EXISTS (SELECT 1 FROM skill_aliases a WHERE a.alias = lower(t))
+                   ORDER BY skill_slug(t), t
+                   ON CONFLICT (slug) DO NOTHING;
+
+                   INSERT INTO skill_aliases (alias, skill_id)
+                   SELECT DISTINCT lower(t), s.skill_id
+                   FROM skill_tokens(list) AS t
+                            JOIN skills s ON s.slug = skill_slug(t)
+                   ON CONFLICT (alias) DO NOTHING;
+                   $$ LANGUAGE sql;
+
+                   CREATE OR REPLACE FUNCTION sync_user_skills() RETURNS trigger AS
+                   $$
+                   BEGIN
+                       PERFORM register_skill_tokens(NEW.skills);
+                       DELETE FROM user_skills WHERE user_id = NEW.user_id;
+                       INSERT INTO user_skills (user_id, skill_id)
+                       SELECT DISTINCT NEW.user_id, a.skill_id
+                       FROM skill_tokens(NEW.skills) AS t
+                                JOIN skill_aliases a ON a.alias = lower(t);
+                       RETURN NULL;
+                   END;
+                   $$ LANGUAGE plpgsql;
+
+                   CREATE OR REPLACE FUNCTION sync_job_skills() RETURNS trigger AS
+                   $$
+                   BEGIN
+                       PERFORM register_skill_tokens(NEW.skills_required);
+                       DELETE FROM job_skills WHERE job_id = NEW.job_id;
+                       INSERT INTO job_skills (job_id, skill_id)
+                       SELECT DISTINCT NEW.job_id, a.skill_id
+                       FROM skill_tokens(NEW.skills_required) AS t
+                                JOIN skill_aliases a ON a.alias = lower(t);
+                       RETURN NULL;
+                   END;
+                   $$ LANGUAGE plpgsql;
+
+                   DROP TRIGGER IF EXISTS trg_user_skills_insert ON users;
+                   CREATE TRIGGER trg_user_skills_insert
+                       AFTER INSERT
+                       ON users
+                       FOR EACH ROW
+                       WHEN (NEW.skills IS NOT NULL)
+                   EXECUTE FUNCTION sync_user_skills();
+
+                   DROP TRIGGER IF EXISTS trg_user_skills_update ON users;
+                   CREATE TRIGGER trg_user_skills_update
+                       AFTER UPDATE OF skills
+                       ON users
+                       FOR EACH ROW
+                       WHEN (OLD.skills IS DISTINCT FROM NEW.skills)
+                   EXECUTE FUNCTION sync_user_skills();
+
+                   DROP TRIGGER IF EXISTS trg_job_skills_insert ON jobs;
+                   CREATE TRIGGER trg_job_skills_insert
+                       AFTER INSERT
+                       ON jobs
+                       FOR EACH ROW
+                       WHEN (NEW.skills_required IS NOT NULL)
+                   EXECUTE FUNCTION sync_job_skills();
+
+                   DROP TRIGGER IF EXISTS trg_job_skills_update ON jobs;
+                   CREATE TRIGGER trg_job_skills_update
+                       AFTER UPDATE OF skills_required
+                       ON jobs
+                       FOR EACH ROW
+                       WHEN (OLD.skills_required IS DISTINCT FROM NEW.skills_required)
+                   EXECUTE FUNCTION sync_job_skills();
+                   """)
+
+    # Users and jobs written before the triggers existed have no links yet;
+    # without them every existing application would rescore to 0
+    for link, (added, removed) in backfill_skill_links(conn).items():
+        print(f"📊 {link}: {added} link(s) added, {removed} stale link(s) removed")
+
+    # APPLICATION RESCORING (jobs / candidates whose skills changed since
+    # their applications were scored; drained by rescoring.py)
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS score_dirty
+                   (
+                       entity    TEXT      NOT NULL,
+                       entity_id INTEGER   NOT NULL,
+                       marked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                       PRIMARY KEY (entity, entity_id)
+                   );
+                   CREATE INDEX IF NOT EXISTS idx_score_dirty_marked
+                       ON score_dirty (marked_at);
+
+                   -- TG_ARGV: entity name, id column
+                   CREATE OR REPLACE FUNCTION mark_score_dirty() RETURNS trigger AS
+                   $$
+                   BEGIN
+                       INSERT INTO score_dirty (entity, entity_id)
+                       VALUES (TG_ARGV[0], (to_jsonb(NEW) ->> TG_ARGV[1])::INTEGER)
+                       ON CONFLICT (entity, entity_id) DO NOTHING;
+                       RETURN NULL;
+                   END;
+                   $$ LANGUAGE plpgsql;
+
+                   DROP TRIGGER IF EXISTS trg_score_dirty_user ON users;
+                   CREATE TRIGGER trg_score_dirty_user
+                       AFTER UPDATE OF skills
+                       ON users
+                       FOR EACH ROW
+                       WHEN (OLD.skills IS DISTINCT FROM NEW.skills)
+                   EXECUTE FUNCTION mark_score_dirty('candidate', 'user_id');
+
+                   DROP TRIGGER IF EXISTS trg_score_dirty_job ON jobs;
+                   CREATE TRIGGER trg_score_dirty_job
+                       AFTER UPDATE OF skills_required
+                       ON jobs
+                       FOR EACH ROW
+                       WHEN (OLD.skills_required IS DISTINCT FROM NEW.skills_required)
+                   EXECUTE FUNCTION mark_score_dirty('job', 'job_id');
+                   """)
+
+    # JOB FULL-TEXT SEARCH (weights: title A, skills B, company C, description D)
+    cursor.execute("""
+                   ALTER TABLE jobs
+                       ADD COLUMN IF NOT EXISTS search_vector tsvector
+                           GENERATED ALWAYS AS (
+                               setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') ||
+                               setweight(to_tsvector('english'::regconfig, coalesce(skills_required, '')), 'B') ||
+                               setweight(to_tsvector('english'::regconfig, coalesce(company, '')), 'C') ||
+                               setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'D')
+                               ) STORED;
+                   CREATE INDEX IF NOT EXISTS idx_jobs_search_vector
+                       ON jobs USING GIN (search_vector)
+                       WHERE status = 'Active';
+                   CREATE INDEX IF NOT EXISTS idx_jobs_active_created
+                       ON jobs (created_at DESC, job_id DESC)
+                       WHERE status = 'Active';
+                   """)
+
+    # JOB FUZZY SEARCH (trigram indexes + vocabulary for "did you mean")
+    cursor.execute("""
+                   CREATE EXTENSION IF NOT EXISTS pg_trgm;
+                   CREATE INDEX IF NOT EXISTS idx_jobs_title_trgm
+                       ON jobs USING GIN (title gin_trgm_ops);
+                   CREATE INDEX IF NOT EXISTS idx_jobs_company_trgm
+                       ON jobs USING GIN (company gin_trgm_ops);
+                   CREATE INDEX IF NOT EXISTS idx_jobs_location_trgm
+                       ON jobs USING GIN (location gin_trgm_ops);
+
+                   CREATE MATERIALIZED VIEW IF NOT EXISTS job_search_words AS
+                   SELECT word, COUNT(DISTINCT job_id) AS ndoc
+                   FROM jobs,
+                        regexp_split_to_table(
+                                lower(concat_ws(' ', title, company, location, skills_required)),
+                                '[^a-z0-9]+') AS word
+                   WHERE status = 'Active'
+                     AND length(word) >= 3
+                   GROUP BY word;
+                   CREATE UNIQUE INDEX IF NOT EXISTS idx_job_search_words_word
+                       ON job_search_words (word);
+                   CREATE INDEX IF NOT EXISTS idx_job_search_words_trgm
+                       ON job_search_words USING GIN (word gin_trgm_ops);
+                   """)
+
+    # JOB FILTER COLUMNS (experience in years and salary in LPA, parsed from
+    # the free-text fields so the chatbot can filter on them with an index)
+    # "2-4 years" -> 2..4, "5+ years" -> 5..NULL, "Fresher" -> 0..0;
+    # "₹8-12 LPA" -> 8..12, salaries not quoted in LPA/lakhs stay NULL.
+    cursor.execute("""
+                   ALTER TABLE jobs
+                       ADD COLUMN IF NOT EXISTS experience_min INTEGER
+                           GENERATED ALWAYS AS (
+                               CASE
+                                   WHEN experience_required ~* 'fresher|entry' THEN 0
+                                   ELSE substring(experience_required FROM '(\\d+)')::INTEGER
+                                   END
+                               ) STORED,
+                       ADD COLUMN IF NOT EXISTS experience_max INTEGER
+                           GENERATED ALWAYS AS (
+                               CASE
+                                   WHEN experience_required ~ '\\d+\\s*\\+' THEN NULL
+                                   WHEN experience_required ~* 'fresher|entry' THEN 0
+                                   ELSE coalesce(
+                                           substring(experience_required FROM '\\d+\\s*(?:-|–|to)\\s*(\\d+)'),
+                                           substring(experience_required FROM '(\\d+)'))::INTEGER
+                                   END
+                               ) STORED,
+                       ADD COLUMN IF NOT EXISTS salary_min_lpa INTEGER
+                           GENERATED ALWAYS AS (
+                               CASE
+                                   WHEN salary_range ~* 'lpa|lakh|lac'
+                                       THEN substring(salary_range FROM '(\\d+)')::INTEGER
+                                   END
+                               ) STORED,
+                       ADD COLUMN IF NOT EXISTS salary_max_lpa INTEGER
+                           GENERATED ALWAYS AS (
+                               CASE
+                                   WHEN salary_range ~* 'lpa|lakh|lac'
+                                       THEN coalesce(
+                                           substring(salary_range FROM '\\d+(?:\\.\\d+)?\\s*(?:-|–|to)\\s*(\\d+)'),
+                                           substring(salary_range FROM '(\\d+)'))::INTEGER
+                                   END
+                               ) STORED;
+                   CREATE INDEX IF NOT EXISTS idx_jobs_active_type_created
+                       ON jobs (job_type, created_at DESC, job_id DESC)
+                       WHERE status = 'Active';
+                   CREATE INDEX IF NOT EXISTS idx_jobs_active_experience
+                       ON jobs (experience_min, experience_max)
+                       WHERE status = 'Active';
+                   CREATE INDEX IF NOT EXISTS idx_jobs_active_salary
+                       ON jobs (salary_max_lpa)
+                       WHERE status = 'Active';
+                   """)
+
+    # BULK JOB IMPORT (feeds are merged on the poster's own reference, so one
+    # poster's feed can never overwrite another poster's job; 0 stands for
+    # imports with no poster)
+    cursor.execute("""
+                   ALTER TABLE jobs
+                       ADD COLUMN IF NOT EXISTS external_ref TEXT;
+                   DROP INDEX IF EXISTS idx_jobs_external_ref;
+                   CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_poster_external_ref
+                       ON jobs (COALESCE(posted_by, 0), external_ref);
+                   """)
+
+    # DASHBOARD AND KEYSET PAGINATION INDEXES
+    cursor.execute("""
+                   CREATE INDEX IF NOT EXISTS idx_applications_candidate_applied
+                       ON applications (candidate_id, applied_on DESC, application_id DESC);
+                   CREATE INDEX IF NOT EXISTS idx_applications_applied_on
+                       ON applications (applied_on DESC, application_id DESC);
+                   CREATE INDEX IF NOT EXISTS idx_jobs_created
+                       ON jobs (created_at DESC, job_id DESC);
+                   CREATE INDEX IF NOT EXISTS idx_saved_jobs_candidate_saved
+                       ON saved_jobs (candidate_id, saved_on DESC, save_id DESC);
+                   """)
+
+    # APPLICATION STATS COUNTER TABLE (maintained by triggers)
+    # Each status is spread over 16 slot rows so concurrent applications
+    # don't queue on a single row lock; readers SUM over the slots.
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS application_stats
+                   (
+                       status    TEXT     NOT NULL,
+                       slot      SMALLINT NOT NULL,
+                       app_count BIGINT   NOT NULL DEFAULT 0,
+                       PRIMARY KEY (status, slot)
+                   );
+                   """)
+
+    cursor.execute("""
+                   CREATE OR REPLACE FUNCTION application_stats_apply() RETURNS trigger AS
+                   $$
+                   BEGIN
+                       IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                           INSERT INTO application_stats (status, slot, app_count)
+                           VALUES (COALESCE(NEW.status, ''), floor(random() * 16)::SMALLINT, 1)
+                           ON CONFLICT (status, slot)
+                               DO UPDATE SET app_count = application_stats.app_count + 1;
+                       END IF;
+                       IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                           INSERT INTO application_stats (status, slot, app_count)
+                           VALUES (COALESCE(OLD.status, ''), floor(random() * 16)::SMALLINT, -1)
+                           ON CONFLICT (status, slot)
+                               DO UPDATE SET app_count = application_stats.app_count - 1;
+                       END IF;
+                       RETURN NULL;
+                   END;
+                   $$ LANGUAGE plpgsql;
+
+                   CREATE OR REPLACE FUNCTION application_stats_truncate() RETURNS trigger AS
+                   $$
+                   BEGIN
+                       DELETE FROM application_stats;
+                       RETURN NULL;
+                   END;
+                   $$ LANGUAGE plpgsql;
+
+                   DROP TRIGGER IF EXISTS trg_application_stats_ins_del ON applications;
+                   CREATE TRIGGER trg_application_stats_ins_del
+                       AFTER INSERT OR DELETE
+                       ON applications
+                       FOR EACH ROW
+                   EXECUTE FUNCTION application_stats_apply();
+
+                   DROP TRIGGER IF EXISTS trg_application_stats_status ON applications;
+                   CREATE TRIGGER trg_application_stats_status
+                       AFTER UPDATE OF status
+                       ON applications
+                       FOR EACH ROW
+                       WHEN (OLD.status IS DISTINCT FROM NEW.status)
+                   EXECUTE FUNCTION application_stats_apply();
+
+                   DROP TRIGGER IF EXISTS trg_application_stats_truncate ON applications;
+                   CREATE TRIGGER trg_application_stats_truncate
+                       AFTER TRUNCATE
+                       ON applications
+                       FOR EACH STATEMENT
+                   EXECUTE FUNCTION application_stats_truncate();
+                   """)
+
+    # Seed counters for rows that existed before the triggers
+    cursor.execute("SELECT COUNT(*) FROM application_stats;")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("""
+                       INSERT INTO application_stats (status, slot, app_count)
+                       SELECT COALESCE(status, ''), 0, COUNT(*)
+                       FROM applications
+                       GROUP BY COALESCE(status, '');
+                       """)
+
+    # HR ANALYTICS ROLLUPS (filled incrementally by analytics.py from
+    # applications.updated_on and activity_log.log_id watermarks)
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS analytics_watermarks
+                   (
+                       source     TEXT PRIMARY KEY,
+                       last_ts    TIMESTAMP,
+                       last_id    BIGINT    NOT NULL DEFAULT 0,
+                       updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                   );
+                   INSERT INTO analytics_watermarks (source)
+                   VALUES ('applications'),
+                          ('activity_log')
+                   ON CONFLICT (source) DO NOTHING;
+
+                   -- Last status seen per application; new rows are diffed
+                   -- against it to find status changes and funnel progress
+                   CREATE TABLE IF NOT EXISTS analytics_application_state
+                   (
+                       application_id INTEGER PRIMARY KEY,
+                       job_id         INTEGER   NOT NULL,
+                       status         TEXT      NOT NULL,
+                       status_since   TIMESTAMP NOT NULL,
+                       stage          SMALLINT  NOT NULL
+                   );
+
+                   -- grain is 'hour' or 'day'; bucket is date_trunc(grain, ...)
+                   CREATE TABLE IF NOT EXISTS analytics_applications
+                   (
+                       grain        TEXT      NOT NULL,
+                       bucket       TIMESTAMP NOT NULL,
+                       job_id       INTEGER   NOT NULL,
+                       applications INTEGER   NOT NULL DEFAULT 0,
+                       PRIMARY KEY (grain, bucket, job_id)
+                   );
+
+                   CREATE TABLE IF NOT EXISTS analytics_status_changes
+                   (
+                       grain         TEXT             NOT NULL,
+                       bucket        TIMESTAMP        NOT NULL,
+                       job_id        INTEGER          NOT NULL,
+                       from_status   TEXT             NOT NULL,
+                       to_status     TEXT             NOT NULL,
+                       changes       INTEGER          NOT NULL DEFAULT 0,
+                       total_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+                       PRIMARY KEY (grain, bucket, job_id, from_status, to_status)
+                   );
+
+                   -- Applications per job that ever reached each funnel stage
+                   CREATE TABLE IF NOT EXISTS analytics_job_funnel
+                   (
+                       job_id       INTEGER NOT NULL,
+                       stage        TEXT    NOT NULL,
+                       applications INTEGER NOT NULL DEFAULT 0,
+                       PRIMARY KEY (job_id, stage)
+                   );
+
+                   CREATE TABLE IF NOT EXISTS analytics_activity
+                   (
+                       grain  TEXT      NOT NULL,
+                       bucket TIMESTAMP NOT NULL,
+                       action TEXT      NOT NULL,
+                       events INTEGER   NOT NULL DEFAULT 0,
+                       PRIMARY KEY (grain, bucket, action)
+                   );
+
+                   CREATE INDEX IF NOT EXISTS idx_applications_updated_on
+                       ON applications (updated_on, application_id);
+                   """)
+
     # Insert sample jobs if empty
     cursor.execute("SELECT COUNT(*) FROM jobs;")
     jobs_count = cursor.fetchone()[0]
@@ -0,0 +1,282 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from flask import g
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the wait timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool.
+
+    Connections are created lazily up to ``maxconn``; ``prefill`` opens
+    ``minconn`` of them up front. On checkout a connection is pinged if it has been idle
+    longer than ``health_check_interval`` and recycled once it is older than
+    ``max_lifetime``. When the pool is exhausted callers wait up to ``timeout``
+    seconds for a connection to be returned.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, max_lifetime=1800,
+                 timeout=5.0, health_check_interval=30):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: min=%s max=%s" % (minconn, maxconn))
+
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, returned_at)]
+        self._created = {}  # id(conn) -> created_at
+        self._in_use = 0
+        self._waiters = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    # ---------------- internals ----------------
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _close(self, conn):
+        self._created.pop(id(conn), None)
+        self._discarded += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _expired(self, conn, now):
+        created = self._created.get(id(conn), now)
+        return self.max_lifetime and now - created > self.max_lifetime
+
+    def _healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    # ---------------- public API ----------------
+    def getconn(self):
+        """Check out a connection, waiting up to ``timeout`` seconds"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        with self._cond:
+            if self._closed:
+                raise PoolTimeout("Connection pool is closed")
+
+            while not self._idle and self._in_use >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        "Timed out after %.1fs waiting for a database connection" % self.timeout
+                    )
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+            waited = time.monotonic() - started
+            self._checkouts += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+
+            self._in_use += 1
+            candidate = self._idle.pop() if self._idle else None
+
+        # Health checks and connects happen outside the lock so one slow
+        # handshake never blocks other threads returning connections.
+        try:
+            if candidate is not None:
+                conn, returned_at = candidate
+                now = time.monotonic()
+                if not self._expired(conn, now) and self._healthy(conn, now - returned_at):
+                    return conn
+                with self._cond:
+                    self._close(conn)
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        if not discard and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            now = time.monotonic()
+            if (discard or conn.closed or self._closed or self._expired(conn, now)
+                    or len(self._idle) >= self.maxconn):
+                self._close(conn)
+                replenish = not self._closed and len(self._idle) + self._in_use < self.minconn
+            else:
+                self._idle.append((conn, now))
+                replenish = False
+            self._cond.notify()
+
+        # Top back up to minconn outside the lock; a failed connect just
+        # leaves the pool to open connections on demand
+        if replenish:
+            try:
+                self.prefill()
+            except psycopg2.Error:
+                pass
+
+    def prefill(self):
+        """Open connections until ``minconn`` are idle or in use"""
+        with self._cond:
+            missing = self.minconn - len(self._idle) - self._in_use
+        for _ in range(max(missing, 0)):
+            conn = self._connect()
+            with self._cond:
+                # Another thread may have topped the pool up meanwhile
+                surplus = self._closed or len(self._idle) + self._in_use >= self.minconn
+                if not surplus:
+                    self._idle.append((conn, time.monotonic()))
+                    self._cond.notify()
+            if surplus:
+                self._created.pop(id(conn), None)
+                conn.close()
+                break
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._close(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiters": self._waiters,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 3),
+                "wait_time_avg_ms": round(
+                    self._wait_time_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 3),
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use.
+
+    The pool is keyed on the process id so gunicorn workers forked from a
+    preloaded master never share sockets with their parent.
+    """
+    global _pool, _pool_pid
+
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            database_url = os.environ.get("DATABASE_URL")
+            if not database_url:
+                raise ValueError("DATABASE_URL environment variable is not set")
+
+            _pool = ConnectionPool(
+                database_url,
+                minconn=int(os.environ.get("DB_POOL_MIN", 1)),
+                maxconn=int(os.environ.get("DB_POOL_MAX", 10)),
+                max_lifetime=float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),
+                timeout=float(os.environ.get("DB_POOL_TIMEOUT", 5)),
+                health_check_interval=float(os.environ.get("DB_POOL_HEALTH_CHECK_INTERVAL", 30)),
+            )
+            _pool_pid = pid
+            try:
+                _pool.prefill()
+            except psycopg2.Error as e:
+                # Not fatal: connections are opened on demand once the
+                # database is reachable
+                print(f"⚠️  Could not open {_pool.minconn} pooled connection(s): {e}",
+                      file=sys.stderr, flush=True)
+    return _pool
+
+
+def get_db_connection():
+    """Get the request-scoped pooled PostgreSQL connection.
+
+    The connection is checked out on first use within a request and handed
+    back to the pool by ``release_db_connection`` at teardown, so views that
+    never touch the database never take a connection. Scripts and workers
+    running outside a request should use ``pooled_connection`` instead.
+    """
+    if "db" not in g:
+        g.db = get_pool().getconn()
+    return g.db
+
+
+def release_db_connection(exception=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        get_pool().putconn(conn, discard=conn.closed != 0)
+
+
+@contextmanager
+def pooled_connection():
+    """Check out a connection for the duration of a ``with`` block"""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn, discard=conn.closed != 0)
+
+
+def get_dict_cursor(conn):
+    """Get a cursor that returns results as dictionaries"""
+    return conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+
+def init_app(app):
+    app.teardown_appcontext(release_db_connection)
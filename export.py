@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime
+
+import click
+
+from db import pooled_connection
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+# Rows pulled from the server-side cursor per network round trip
+EXPORT_ITERSIZE = 2000
+
+# Rows written into one response chunk
+EXPORT_CHUNK_ROWS = 500
+
+# Spreadsheets run a cell starting with one of these as a formula; user text
+# such as "=HYPERLINK(...)" is exported with a leading quote instead
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def build_export_query(job_id=None, status=None, date_from=None, date_to=None,
+                       include_cover_letter=False):
+    """SQL and params for the applications export, filtered on indexed columns"""
+    columns = """
+              a.application_id,
+              a.status,
+              a.applied_on,
+              a.updated_on,
+              a.score,
+              a.hr_notes,
+              j.job_id,
+              j.title   AS job_title,
+              j.company,
+              u.user_id AS candidate_id,
+              u.full_name,
+              u.email,
+              u.phone,
+              u.location,
+              u.skills,
+              u.experience_years"""
+    if include_cover_letter:
+        columns += ",\n              a.cover_letter"
+
+    query = f"""
+            SELECT {columns}
+            FROM applications a
+                     JOIN jobs j ON a.job_id = j.job_id
+                     JOIN users u ON a.candidate_id = u.user_id
+            WHERE TRUE"""
+    params = []
+
+    if job_id:
+        query += " AND a.job_id = %s"
+        params.append(job_id)
+
+    if status:
+        query += " AND a.status = %s"
+        params.append(status)
+
+    if date_from:
+        query += " AND a.applied_on >= %s"
+        params.append(date_from)
+
+    if date_to:
+        # date_to is inclusive of the whole day
+        query += " AND a.applied_on < %s::date + 1"
+        params.append(date_to)
+
+    query += " ORDER BY a.application_id"
+    return query, params
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def csv_safe(value):
+    """Neutralise text a spreadsheet would otherwise evaluate"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_export(fmt, filters, itersize=EXPORT_ITERSIZE, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the export as text chunks with constant memory.
+
+    Rows come from a named (server-side) cursor, so PostgreSQL holds the
+    result set and only ``itersize`` rows are in this process at a time.
+    The generator owns its pooled connection for the whole stream because
+    it outlives the request that started it.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    query, params = build_export_query(**filters)
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor(name="applications_export")
+        cursor.itersize = itersize
+        cursor.execute(query, params)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        columns = None
+        pending = 0
+
+        try:
+            for row in cursor:
+                if columns is None:
+                    columns = [column[0] for column in cursor.description]
+                    if fmt == "csv":
+                        writer.writerow(columns)
+
+                if fmt == "csv":
+                    writer.writerow([csv_safe(value) for value in row])
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, row)), default=_json_default,
+                                            ensure_ascii=False))
+                    buffer.write("\n")
+
+                pending += 1
+                if pending >= chunk_rows:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+
+            if columns is None and fmt == "csv" and cursor.description:
+                writer.writerow([column[0] for column in cursor.description])
+
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            cursor.close()
+            conn.rollback()
+
+
+@click.command("export-applications")
+@click.option("--format", "fmt", type=click.Choice(sorted(EXPORT_FORMATS)), default="csv")
+@click.option("--job-id", type=int, default=None)
+@click.option("--status", default=None)
+@click.option("--from", "date_from", type=click.DateTime(["%Y-%m-%d"]), default=None,
+              help="First applied_on date (YYYY-MM-DD)")
+@click.option("--to", "date_to", type=click.DateTime(["%Y-%m-%d"]), default=None,
+              help="Last applied_on date (YYYY-MM-DD)")
+@click.option("--cover-letters", is_flag=True, help="Include full cover letters")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), default=None,
+              help="Write to a file instead of stdout")
+def export_applications_command(fmt, job_id, status, date_from, date_to, cover_letters, output):
+    """Stream applications joined with jobs and candidates as CSV or JSONL."""
+    filters = {
+        "job_id": job_id,
+        "status": status,
+        "date_from": date_from.date() if date_from else None,
+        "date_to": date_to.date() if date_to else None,
+        "include_cover_letter": cover_letters,
+    }
+
+    out = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    try:
+        for chunk in iter_export(fmt, filters):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
+
+    if output:
+        click.echo(f"✅ Exported applications to {output}", err=True)
+
+
+def init_app(app):
+    app.cli.add_command(export_applications_command)
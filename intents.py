@@ -0,0 +1,195 @@
+import difflib
+import re
+
+from skill_extractor import normalize
+
+
+# Typo tolerance for fuzzy entity kinds: words this long or longer that match
+# nothing are compared with the kind's one-word phrases (difflib ratio) that
+# start with the same letter
+FUZZY_MIN_LENGTH = 4
+FUZZY_CUTOFF = 0.8
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def trie_pattern(phrases):
+    """Compile phrases into one regex shaped like a trie.
+
+    Shared prefixes are matched once ("java(?:script)?" rather than
+    "javascript|java"), and greedy optional tails make the longest phrase
+    win at any position.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def walk(node):
+        branches = [re.escape(ch) + walk(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return walk(trie)
+
+
+class Intent:
+    def __init__(self, name, handler, keywords=(), entities=(), priority=0, static=False):
+        self.name = name
+        self.handler = handler
+        self.keywords = [normalize(k) for k in keywords]
+        self.entities = tuple(entities)
+        self.priority = priority
+        self.static = static
+
+
+class IntentMatch:
+    """The winning intent for a message plus every entity found in it"""
+
+    def __init__(self, intent, entities, text):
+        self.intent = intent
+        self.entities = entities
+        self.text = text
+
+    @property
+    def name(self):
+        return self.intent.name if self.intent else None
+
+    def first(self, kind, default=None):
+        values = self.entities.get(kind)
+        return values[0] if values else default
+
+
+class IntentRouter:
+    """Declarative intents compiled into a single matcher.
+
+    Intent keywords, entity vocabularies (city names, skills, ...) and entity
+    patterns ("5 years") all become alternatives of one regex, so a message
+    is scanned once and yields both the intent and its entities. An intent
+    fires on any of its keywords or on the presence of any of its entity
+    kinds; the highest priority wins, then the earliest hit.
+    """
+
+    def __init__(self):
+        self.intents = []
+        self.fallback = None
+        self._vocabulary = {}
+        self._fuzzy = {}
+        self._patterns = []
+        self._regex = None
+
+    def intent(self, name, keywords=(), entities=(), priority=0, static=False):
+        """Register the decorated ``handler(match[, conn])`` for an intent.
+
+        Static intents answer from fixed text and are called without a
+        database connection.
+        """
+        def decorator(f):
+            self.intents.append(Intent(name, f, keywords, entities, priority, static))
+            self._regex = None
+            return f
+
+        return decorator
+
+    def fallback_intent(self, static=False):
+        def decorator(f):
+            self.fallback = Intent("fallback", f, static=static)
+            return f
+
+        return decorator
+
+    def entity(self, kind, values, fuzzy=False):
+        """Add ``{phrase: value}`` entries to the ``kind`` vocabulary.
+
+        With ``fuzzy``, a message with no exact ``kind`` match also has its
+        unmatched words compared with the one-word phrases, so a misspelling
+        such as "banglore" still yields the entity.
+        """
+        for phrase, value in values.items():
+            self._vocabulary.setdefault(normalize(phrase), []).append((kind, value))
+            if fuzzy and " " not in normalize(phrase):
+                # Bucketed by first letter; a typo there is not looked for
+                by_initial = self._fuzzy.setdefault(kind, {})
+                by_initial.setdefault(normalize(phrase)[0], {})[normalize(phrase)] = value
+        self._regex = None
+
+    def entity_pattern(self, kind, pattern, convert=lambda m: m.group(0)):
+        """Add a regex whose matches are ``kind`` entities.
+
+        ``convert`` receives a match of ``pattern`` on its own, so its groups
+        are numbered as written whatever else the router compiles in.
+        """
+        self._patterns.append((kind, re.compile(pattern), convert))
+        self._regex = None
+
+    def compile(self):
+        phrases = dict(self._vocabulary)
+        for intent in self.intents:
+            for keyword in intent.keywords:
+                phrases.setdefault(keyword, []).append(("intent", intent))
+        self._phrases = phrases
+
+        # Patterns come first so "10 lpa" is read as a salary rather than
+        # stopping at the bare number or keyword
+        parts = [f"(?P<p{i}>{pattern.pattern})" for i, (_, pattern, _) in enumerate(self._patterns)]
+        parts.append(f"(?P<phrase>{trie_pattern(phrases)})")
+        self._regex = re.compile(r"(?<![a-z0-9])(?:" + "|".join(parts) + r")(?![a-z0-9])")
+        return self
+
+    def scan(self, text):
+        """Return ``(intent_hits, entities)`` for normalized text in one pass"""
+        if self._regex is None:
+            self.compile()
+
+        intent_hits = {}
+        entities = {}
+        matched = []
+
+        def add_entity(kind, value, position):
+            values = entities.setdefault(kind, [])
+            if value not in values:
+                values.append(value)
+            for intent in self.intents:
+                if kind in intent.entities:
+                    intent_hits.setdefault(intent, position)
+
+        for m in self._regex.finditer(text):
+            matched.append(m.span())
+            group = m.lastgroup
+            if group == "phrase":
+                for kind, value in self._phrases[m.group(group)]:
+                    if kind == "intent":
+                        intent_hits.setdefault(value, m.start())
+                    else:
+                        add_entity(kind, value, m.start())
+            else:
+                kind, pattern, convert = self._patterns[int(group[1:])]
+                add_entity(kind, convert(pattern.fullmatch(m.group(group))), m.start())
+
+        for kind, by_initial in self._fuzzy.items():
+            if kind in entities:
+                continue
+            for word in _WORD_RE.finditer(text):
+                token = word.group()
+                choices = by_initial.get(token[0])
+                if not choices or len(token) < FUZZY_MIN_LENGTH or any(start <= word.start() < end
+                                                                       for start, end in matched):
+                    continue
+                close = difflib.get_close_matches(token, choices, n=1, cutoff=FUZZY_CUTOFF)
+                if close:
+                    add_entity(kind, choices[close[0]], word.start())
+
+        return intent_hits, entities
+
+    def route(self, message):
+        text = normalize(message)
+        intent_hits, entities = self.scan(text)
+        if intent_hits:
+            intent = min(intent_hits, key=lambda i: (-i.priority, intent_hits[i]))
+        else:
+            intent = self.fallback
+        return IntentMatch(intent, entities, text)
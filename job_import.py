@@ -0,0 +1,271 @@
+import csv
+import io
+import json
+import os
+import time
+
+import click
+
+import activity
+import cache
+import rescoring
+from chatbot import JOB_TYPES
+from db import pooled_connection
+
+
+IMPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+# Columns a feed may set, in staging-table order; external_ref is the
+# poster's own id for the opening and, together with posted_by, decides
+# insert vs update
+IMPORT_FIELDS = ("external_ref", "title", "company", "location", "job_type", "experience_required",
+                 "salary_range", "skills_required", "description", "requirements", "status")
+REQUIRED_FIELDS = ("external_ref", "title", "company")
+IMPORT_STATUSES = ("Active", "Closed")
+
+# Validation errors returned per run; the counts always cover every row
+ERROR_LIMIT = 500
+
+_UPDATABLE = [field for field in IMPORT_FIELDS if field != "external_ref"]
+
+MERGE_QUERY = f"""
+              INSERT INTO jobs ({", ".join(IMPORT_FIELDS)}, posted_by)
+              SELECT {", ".join(IMPORT_FIELDS)}, %s
+              FROM job_import_stage
+              ON CONFLICT ((COALESCE(posted_by, 0)), external_ref)
+                  DO UPDATE SET {", ".join(f"{field} = EXCLUDED.{field}" for field in _UPDATABLE)}
+              WHERE jobs.posted_by IS NOT DISTINCT FROM EXCLUDED.posted_by
+                AND ({", ".join(f"jobs.{field}" for field in _UPDATABLE)})
+                        IS DISTINCT FROM ({", ".join(f"EXCLUDED.{field}" for field in _UPDATABLE)})
+              RETURNING job_id, xmax = 0 AS inserted
+              """
+
+# Staged rows that still differ from the job under their key once the merge
+# has run: the DO UPDATE guard refused them
+REJECTED_QUERY = f"""
+                 SELECT s.external_ref
+                 FROM job_import_stage s
+                          JOIN jobs ON COALESCE(jobs.posted_by, 0) = COALESCE(%s, 0)
+                     AND jobs.external_ref = s.external_ref
+                 WHERE ({", ".join(f"jobs.{field}" for field in _UPDATABLE)})
+                           IS DISTINCT FROM ({", ".join(f"s.{field}" for field in _UPDATABLE)})
+                 ORDER BY s.external_ref
+                 """
+
+
+def detect_format(filename, content_type=None):
+    """Pick csv or jsonl from a file name, falling back to the content type"""
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if ext in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    if ext == "csv":
+        return "csv"
+    for fmt, mimetype in IMPORT_FORMATS.items():
+        if content_type and content_type.startswith(mimetype):
+            return fmt
+    return None
+
+
+def iter_feed(stream, fmt):
+    """Yield ``(line, record_or_None, error)`` for each row of a text feed"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as e:
+            yield line, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line, None, "expected a JSON object"
+            continue
+        yield line, record, None
+
+
+def clean_record(record):
+    """Return ``(row, error)``: a tuple in IMPORT_FIELDS order, or why it was rejected"""
+    values = {}
+    for field in IMPORT_FIELDS:
+        value = record.get(field)
+        if value is not None and not isinstance(value, str):
+            if isinstance(value, (dict, list, bool)):
+                return None, f"{field} must be text"
+            value = str(value)
+        value = value.strip() if value else ""
+        values[field] = value or None
+
+    missing = [field for field in REQUIRED_FIELDS if not values[field]]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+
+    if values["job_type"]:
+        job_type = JOB_TYPES.get(values["job_type"].lower())
+        if job_type is None:
+            return None, f"unknown job_type {values['job_type']!r}"
+        values["job_type"] = job_type
+    else:
+        values["job_type"] = "Full-time"
+
+    status = (values["status"] or "Active").capitalize()
+    if status not in IMPORT_STATUSES:
+        return None, f"status must be one of {', '.join(IMPORT_STATUSES)}"
+    values["status"] = status
+
+    return tuple(values[field] for field in IMPORT_FIELDS), None
+
+
+def validate_feed(stream, fmt):
+    """Validate every row; return ``(rows, errors, total)``.
+
+    Rejected rows are reported as ``{"line", "external_ref", "error"}``.
+    A repeated external_ref keeps its first row.
+    """
+    rows = []
+    errors = []
+    seen = {}
+    total = 0
+
+    for line, record, error in iter_feed(stream, fmt):
+        total += 1
+        row = None
+        if error is None:
+            row, error = clean_record(record)
+        if error is None and row[0] in seen:
+            error = f"duplicate external_ref (first on line {seen[row[0]]})"
+        if error is not None:
+            errors.append({"line": line, "external_ref": (record or {}).get("external_ref"), "error": error})
+            continue
+        seen[row[0]] = line
+        rows.append(row)
+
+    return rows, errors, total
+
+
+def stage_and_merge(conn, rows, posted_by=None):
+    """COPY rows into a temp table and upsert them into jobs in one transaction.
+
+    Rows identical to the job already stored are skipped, so re-sending an
+    unchanged feed writes nothing (and does not re-trigger skill syncing or
+    rescoring); only jobs of ``posted_by`` are ever updated. Returns
+    ``(inserted_ids, updated_ids, rejected_refs)`` once committed.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+                       CREATE TEMP TABLE job_import_stage
+                       (
+                           {", ".join(f"{field} TEXT" for field in IMPORT_FIELDS)}
+                       ) ON COMMIT DROP
+                       """)
+        cursor.copy_expert(f"COPY job_import_stage ({', '.join(IMPORT_FIELDS)}) FROM STDIN WITH (FORMAT csv)",
+                           buffer)
+        cursor.execute(MERGE_QUERY, (posted_by,))
+        merged = cursor.fetchall()
+        cursor.execute(REJECTED_QUERY, (posted_by,))
+        rejected = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    inserted = [job_id for job_id, is_new in merged if is_new]
+    updated = [job_id for job_id, is_new in merged if not is_new]
+    return inserted, updated, rejected
+
+
+def import_jobs(conn, stream, fmt, posted_by=None, dry_run=False):
+    """Validate a CSV/JSONL feed and merge its valid rows into jobs.
+
+    Invalid rows are skipped and reported; the valid ones are written in a
+    single transaction. Caches are invalidated (which also queues the "did
+    you mean" vocabulary refresh) and affected scores rescored once at the
+    end.
+    """
+    started = time.perf_counter()
+    rows, errors, total = validate_feed(stream, fmt)
+    validated = time.perf_counter()
+
+    inserted, updated, rejected = [], [], []
+    if rows and not dry_run:
+        inserted, updated, rejected = stage_and_merge(conn, rows, posted_by)
+        errors.extend({"line": None, "external_ref": ref, "error": "belongs to a job this poster may not update"}
+                      for ref in rejected)
+
+    report = {
+        "rows": total,
+        "valid": len(rows) - len(rejected),
+        "invalid": len(errors),
+        "inserted": len(inserted),
+        "updated": len(updated),
+        "rejected": len(rejected),
+        "unchanged": 0 if dry_run else len(rows) - len(inserted) - len(updated) - len(rejected),
+        "dry_run": dry_run,
+        "validate_ms": round((validated - started) * 1000, 1),
+        "merge_ms": round((time.perf_counter() - validated) * 1000, 1),
+        "errors": errors[:ERROR_LIMIT],
+        "errors_truncated": len(errors) > ERROR_LIMIT,
+        "rescore": None,
+    }
+
+    if inserted or updated:
+        cache.jobs_changed(inserted + updated, conn)
+        if updated:
+            report["rescore"] = rescoring.schedule_rescore(conn, [("job", job_id) for job_id in updated])
+        activity.log(conn, posted_by, "JOBS_IMPORTED",
+                     f"Imported {len(inserted)} new, {len(updated)} updated job(s)")
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_ms"] = round(elapsed * 1000, 1)
+    report["rows_per_sec"] = round(total / elapsed, 1) if elapsed else None
+    return report
+
+
+@click.command("import-jobs")
+@click.argument("feed", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(sorted(IMPORT_FORMATS)), default=None,
+              help="Feed format (default: from the file extension)")
+@click.option("--posted-by", type=int, default=None, help="user_id recorded as the poster of new jobs")
+@click.option("--dry-run", is_flag=True, help="Validate only")
+def import_jobs_command(feed, fmt, posted_by, dry_run):
+    """Bulk-import job openings from a CSV or JSONL feed, keyed by external_ref."""
+    fmt = fmt or detect_format(feed)
+    if fmt is None:
+        raise click.UsageError("Cannot tell the feed format from its name; pass --format")
+
+    with open(feed, encoding="utf-8-sig", newline="") as stream, pooled_connection() as conn:
+        report = import_jobs(conn, stream, fmt, posted_by, dry_run)
+
+    click.echo(f"{'✅' if not report['invalid'] else '⚠️ '} {report['rows']} row(s) in {report['elapsed_ms']} ms "
+               f"({report['rows_per_sec']} rows/s): {report['inserted']} inserted, {report['updated']} updated, "
+               f"{report['unchanged']} unchanged, {report['invalid']} invalid"
+               f"{' (dry run)' if dry_run else ''}")
+
+    rescore = report["rescore"]
+    if rescore and rescore["mode"] == "queued":
+        click.echo(f"   {rescore['pending']} application score(s) queued for rescoring (task #{rescore['task_id']})")
+    elif rescore:
+        click.echo(f"   {rescore['updated']} application score(s) updated in {rescore['elapsed_ms']} ms")
+
+    for error in report["errors"]:
+        click.echo(f"   line {error['line'] or '-'} [{error['external_ref'] or '-'}]: {error['error']}")
+    if report["errors_truncated"]:
+        click.echo(f"   ... {report['invalid'] - len(report['errors'])} more")
+
+
+def init_app(app):
+    app.cli.add_command(import_jobs_command)
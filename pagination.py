@@ -0,0 +1,149 @@
+import json
+from datetime import date, datetime
+
+from flask import current_app, request
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from db import get_dict_cursor
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt="keyset-cursor")
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(values, scope=""):
+    """Sign the sort key of the last row on a page into an opaque token"""
+    return _serializer().dumps({"s": scope, "k": [_dump_value(v) for v in values]})
+
+
+def decode_cursor(token, scope="", arity=None):
+    """Return the sort key encoded in ``token``, or None to start from the top.
+
+    Tampered tokens, tokens minted for another listing (``scope``) and keys
+    of the wrong length are all treated as "first page".
+    """
+    if not token:
+        return None
+    try:
+        payload = _serializer().loads(token)
+    except BadSignature:
+        return None
+    if payload.get("s") != scope:
+        return None
+    values = [_load_value(v) for v in payload.get("k", [])]
+    if arity is not None and len(values) != arity:
+        return None
+    return tuple(values)
+
+
+def cursor_scope(token):
+    """Return the scope a valid ``token`` was minted for, or None"""
+    if not token:
+        return None
+    try:
+        return _serializer().loads(token).get("s")
+    except BadSignature:
+        return None
+
+
+def page_size_from_request(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    size = request.args.get("per_page", default, type=int)
+    return max(1, min(size, maximum))
+
+
+def keyset_predicate(key, after, casts=None):
+    """``(k1, k2) < (%s, %s)`` for a descending keyset, with its params.
+
+    ``casts`` optionally gives a SQL type per key column; computed float
+    keys need ``real`` so the round-tripped value compares equal.
+    """
+    casts = casts or [None] * len(key)
+    placeholders = ", ".join(f"%s::{cast}" if cast else "%s" for cast in casts)
+    return f"({', '.join(key)}) < ({placeholders})", list(after)
+
+
+def order_by(key):
+    return "ORDER BY " + ", ".join(f"{column} DESC" for column in key)
+
+
+class Page:
+    """One page of rows plus the opaque cursor for the next page"""
+
+    def __init__(self, rows, key_fields, page_size, scope="", total=None):
+        self.has_more = len(rows) > page_size
+        self.items = rows[:page_size]
+        self.total = total
+        self.next_cursor = None
+        if self.has_more:
+            last = self.items[-1]
+            self.next_cursor = encode_cursor([last[field] for field in key_fields], scope)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def approximate_count(conn, query, params=()):
+    """Planner row estimate for ``query``: free to compute, close enough for "~N results"."""
+    cursor = conn.cursor()
+    cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    plan = cursor.fetchone()[0]
+    cursor.close()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def fetch_page(conn, query, params, key, key_fields, token=None, page_size=DEFAULT_PAGE_SIZE,
+               scope="", with_total=False):
+    """Fetch one page of ``query`` using keyset (seek) pagination.
+
+    ``query`` must contain a ``{keyset}`` placeholder inside its WHERE clause
+    where ``AND (<key>) < (<last key>)`` is spliced in; ORDER BY and LIMIT
+    are appended. ``key`` lists the SQL sort columns (descending, unique as a
+    tuple) and ``key_fields`` the matching names in the result rows.
+    """
+    after = decode_cursor(token, scope, arity=len(key))
+    params = list(params)
+
+    keyset_sql = ""
+    keyset_params = []
+    if after is not None:
+        predicate, keyset_params = keyset_predicate(key, after)
+        keyset_sql = "AND " + predicate
+
+    total = None
+    if with_total:
+        total = approximate_count(conn, query.format(keyset=""), params)
+
+    sql = query.format(keyset=keyset_sql) + " " + order_by(key) + " LIMIT %s"
+
+    cursor = get_dict_cursor(conn)
+    cursor.execute(sql, params + keyset_params + [page_size + 1])
+    rows = cursor.fetchall()
+    cursor.close()
+
+    return Page(rows, key_fields, page_size, scope, total)
@@ -0,0 +1,242 @@
+import sys
+import threading
+import time
+
+import numpy as np
+
+from db import get_dict_cursor, pooled_connection
+from skill_extractor import get_extractor
+
+
+# How long the in-process candidate matrix is reused before it is rebuilt
+# from the users table. Profile edits show up in rankings within this time.
+CANDIDATE_MATRIX_TTL = 5 * 60
+
+# Rows pulled per round trip while building the matrix
+MATRIX_ITERSIZE = 10_000
+
+MAX_TOP_K = 200
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(a):
+        counts = _BYTE_POPCOUNT[np.ascontiguousarray(a).view(np.uint8)]
+        return counts.reshape(a.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+class SkillVocabulary:
+    """Maps canonical skill slugs to bit positions in a packed uint64 row"""
+
+    def __init__(self, slugs):
+        self.slugs = sorted(slugs)
+        self.index = {slug: i for i, slug in enumerate(self.slugs)}
+        self.words = max(1, (len(self.slugs) + 63) // 64)
+
+    def encode(self, slugs):
+        row = np.zeros(self.words, dtype=np.uint64)
+        for slug in slugs:
+            bit = self.index.get(slug)
+            if bit is not None:
+                row[bit >> 6] |= np.uint64(1) << np.uint64(bit & 63)
+        return row
+
+    def decode(self, row):
+        return [self.slugs[word * 64 + bit]
+                for word in np.flatnonzero(row)
+                for bit in range(64)
+                if int(row[word]) >> bit & 1]
+
+
+class CandidateMatrix:
+    """Every candidate's skills as one row of a ``(n, words)`` uint64 array.
+
+    Scoring a job is a bitwise AND with the job's row and a popcount per
+    candidate, done for all candidates at once by NumPy.
+    """
+
+    def __init__(self, vocabulary, user_ids, experience, bits, fingerprint=None):
+        self.vocabulary = vocabulary
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.experience = np.asarray(experience, dtype=np.int32)
+        self.bits = bits
+        self.fingerprint = fingerprint
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @classmethod
+    def from_rows(cls, rows, extractor):
+        """Build from ``(user_id, skills_text, experience_years)`` rows"""
+        vocabulary = SkillVocabulary(extractor.names)
+        user_ids, experience, set_rows, set_bits = [], [], [], []
+        encoded = {}
+
+        for n, (user_id, skills, years) in enumerate(rows):
+            user_ids.append(user_id)
+            experience.append(years or 0)
+            # Many candidates type the same skill list; extract each one once
+            bits = encoded.get(skills)
+            if bits is None:
+                bits = encoded[skills] = [vocabulary.index[slug] for slug in extractor.extract(skills or "")]
+            set_rows.extend([n] * len(bits))
+            set_bits.extend(bits)
+
+        matrix = np.zeros((len(user_ids), vocabulary.words), dtype=np.uint64)
+        if set_bits:
+            set_bits = np.asarray(set_bits, dtype=np.uint64)
+            np.bitwise_or.at(matrix, (np.asarray(set_rows), (set_bits >> np.uint64(6)).astype(np.intp)),
+                             np.uint64(1) << (set_bits & np.uint64(63)))
+
+        return cls(vocabulary, user_ids, experience, matrix, extractor.fingerprint)
+
+    def rank(self, job_row, top_k=50, min_experience=None, max_experience=None, min_score=1):
+        """Top ``top_k`` candidates for a job as ``(rows, scores)`` arrays.
+
+        ``rows`` index into the matrix; ``user_ids[rows]`` gives the users.
+        The score is the share of the job's skills the candidate has, 0-100,
+        with both sides extracted from the skill text by the taxonomy
+        extractor. Stored application scores use the user_skills/job_skills
+        link tables instead, so the two can differ for skills the taxonomy
+        does not know. Ties go to the lower user_id.
+        """
+        required = int(_popcount(job_row).sum())
+        if required == 0 or len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+        # Only the words the job actually uses take part in the AND
+        words = np.flatnonzero(job_row)
+        overlap = _popcount(self.bits[:, words] & job_row[words]).sum(axis=1, dtype=np.int32)
+        scores = overlap * 100 // required
+
+        eligible = scores >= min_score
+        if min_experience is not None:
+            eligible &= self.experience >= min_experience
+        if max_experience is not None:
+            eligible &= self.experience <= max_experience
+
+        candidates = np.flatnonzero(eligible)
+        k = min(top_k, len(candidates))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+        if k < len(candidates):
+            # argpartition splits ties at the k-th score arbitrarily, so keep
+            # everyone scoring at least that much and let the sort decide
+            cutoff = -np.partition(-scores[candidates], k - 1)[k - 1]
+            candidates = candidates[scores[candidates] >= cutoff]
+        order = np.lexsort((self.user_ids[candidates], -scores[candidates]))
+        top = candidates[order[:k]]
+        return top, scores[top]
+
+    def matched_skills(self, row, job_row):
+        return self.vocabulary.decode(self.bits[row] & job_row)
+
+
+def load_candidate_matrix(conn, extractor):
+    cursor = conn.cursor(name="candidate_matrix")
+    cursor.itersize = MATRIX_ITERSIZE
+    cursor.execute("""
+                   SELECT user_id, skills, experience_years
+                   FROM users
+                   WHERE role = 'CANDIDATE'
+                   ORDER BY user_id
+                   """)
+    try:
+        return CandidateMatrix.from_rows(cursor, extractor)
+    finally:
+        cursor.close()
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+_rebuilding = False
+
+
+def _rebuild_matrix():
+    """Build a fresh matrix on a connection of its own and swap it in"""
+    global _matrix, _rebuilding
+
+    try:
+        with pooled_connection() as conn:
+            matrix = load_candidate_matrix(conn, get_extractor(conn))
+            conn.rollback()
+        _matrix = matrix
+    except Exception as e:
+        print(f"⚠️  Candidate matrix rebuild failed: {type(e).__name__}: {e}", file=sys.stderr, flush=True)
+    finally:
+        with _matrix_lock:
+            _rebuilding = False
+
+
+def get_candidate_matrix(conn):
+    """Return the process-wide candidate matrix, rebuilding it when stale.
+
+    It is rebuilt after CANDIDATE_MATRIX_TTL or when the skill taxonomy
+    changes. Only the first build blocks; afterwards one background thread
+    rebuilds while every request keeps ranking against the old matrix,
+    which stays self-consistent because jobs are encoded with its own
+    vocabulary.
+    """
+    global _matrix, _rebuilding
+
+    extractor = get_extractor(conn)
+    matrix = _matrix
+    if matrix is None:
+        with _matrix_lock:
+            if _matrix is None:
+                _matrix = load_candidate_matrix(conn, extractor)
+            return _matrix
+
+    if (matrix.fingerprint != extractor.fingerprint
+            or time.monotonic() - matrix.loaded_at >= CANDIDATE_MATRIX_TTL):
+        with _matrix_lock:
+            start = not _rebuilding
+            _rebuilding = True
+        if start:
+            threading.Thread(target=_rebuild_matrix, name="candidate-matrix", daemon=True).start()
+    return matrix
+
+
+def rank_candidates_for_job(conn, job_id, top_k=50, min_experience=None, max_experience=None):
+    """Rank every candidate against a job's current skills.
+
+    Returns None if the job does not exist, otherwise a list of candidate
+    dicts with ``score`` and ``matched_skills``, best first.
+    """
+    cursor = get_dict_cursor(conn)
+    cursor.execute("SELECT job_id, skills_required FROM jobs WHERE job_id = %s", (job_id,))
+    job = cursor.fetchone()
+    if job is None:
+        cursor.close()
+        return None
+
+    extractor = get_extractor(conn)
+    matrix = get_candidate_matrix(conn)
+    job_row = matrix.vocabulary.encode(extractor.extract(job["skills_required"] or ""))
+
+    rows, scores = matrix.rank(job_row, min(top_k, MAX_TOP_K), min_experience, max_experience)
+    if len(rows) == 0:
+        cursor.close()
+        return []
+
+    cursor.execute("""
+                   SELECT user_id, full_name, email, location, skills, experience_years
+                   FROM users
+                   WHERE user_id = ANY (%s)
+                   """, (matrix.user_ids[rows].tolist(),))
+    users = {row["user_id"]: row for row in cursor.fetchall()}
+    cursor.close()
+
+    ranked = []
+    for row, score in zip(rows.tolist(), scores.tolist()):
+        user = users.get(int(matrix.user_ids[row]))
+        if user is None:
+            continue
+        ranked.append(dict(user, score=score,
+                           matched_skills=[extractor.names.get(slug, slug)
+                                           for slug in matrix.matched_skills(row, job_row)]))
+    return ranked
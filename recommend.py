@@ -0,0 +1,297 @@
+import bisect
+import heapq
+import re
+import sys
+import threading
+import time
+
+import cache
+from db import get_dict_cursor, pooled_connection
+from search import JOB_COLUMNS
+
+
+DEFAULT_RECOMMENDATIONS = 6
+MAX_RECOMMENDATIONS = 50
+
+# Jobs posted by other worker processes are picked up this often; a full
+# rebuild (which also drops jobs deleted elsewhere) runs every INDEX_TTL.
+SYNC_INTERVAL = 15
+INDEX_TTL = 10 * 60
+
+# Weights of the three parts of a recommendation score
+SKILL_WEIGHT = 0.7
+LOCATION_WEIGHT = 0.2
+EXPERIENCE_WEIGHT = 0.1
+
+_RANGE_RE = re.compile(r"(\d+)\s*(?:-|–|to)\s*(\d+)")
+_MIN_RE = re.compile(r"(\d+)\s*\+")
+_SINGLE_RE = re.compile(r"(\d+)")
+
+
+def parse_experience_range(text):
+    """"2-4 years" -> (2, 4), "5+ years" -> (5, None), "Fresher" -> (0, 0)"""
+    text = (text or "").lower()
+    if not text:
+        return None, None
+    match = _RANGE_RE.search(text)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    match = _MIN_RE.search(text)
+    if match:
+        return int(match.group(1)), None
+    if "fresher" in text or "entry" in text:
+        return 0, 0
+    match = _SINGLE_RE.search(text)
+    if match:
+        return int(match.group(1)), int(match.group(1))
+    return None, None
+
+
+def experience_fit(years, low, high):
+    if low is None:
+        return 1.0
+    if years >= low and (high is None or years <= high):
+        return 1.0
+    gap = low - years if years < low else years - high
+    return 0.5 if gap <= 1 else 0.0
+
+
+class JobIndex:
+    """Inverted index over active jobs: skill_id -> sorted list of job_ids.
+
+    Also keeps the few per-job fields scoring needs, so a recommendation
+    only touches the postings of the candidate's own skills.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.jobs = {}
+        self.max_job_id = 0
+        self.built_at = time.monotonic()
+        self.synced_at = self.built_at
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def add(self, job_id, skill_ids, location, experience_required):
+        with self.lock:
+            self.remove(job_id)
+            low, high = parse_experience_range(experience_required)
+            self.jobs[job_id] = (tuple(skill_ids), (location or "").strip().lower(), low, high)
+            for skill_id in skill_ids:
+                bisect.insort(self.postings.setdefault(skill_id, []), job_id)
+            self.max_job_id = max(self.max_job_id, job_id)
+
+    def remove(self, job_id):
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+            if job is None:
+                return
+            for skill_id in job[0]:
+                posting = self.postings.get(skill_id)
+                i = bisect.bisect_left(posting, job_id) if posting else 0
+                if posting and i < len(posting) and posting[i] == job_id:
+                    del posting[i]
+                    if not posting:
+                        del self.postings[skill_id]
+
+    def load(self, conn, job_ids=None, after_job_id=None):
+        """(Re)load active jobs from the database; inactive ones are dropped"""
+        cursor = conn.cursor()
+        cursor.execute("""
+                       SELECT j.job_id,
+                              j.status = 'Active' AS active,
+                              j.location,
+                              j.experience_required,
+                              COALESCE(array_agg(js.skill_id) FILTER (WHERE js.skill_id IS NOT NULL), '{}')
+                       FROM jobs j
+                                LEFT JOIN job_skills js ON js.job_id = j.job_id
+                       WHERE (%s::int[] IS NULL OR j.job_id = ANY (%s::int[]))
+                         AND (%s::int IS NULL OR j.job_id > %s::int)
+                       GROUP BY j.job_id
+                       """, (job_ids, job_ids, after_job_id, after_job_id))
+        rows = cursor.fetchall()
+        cursor.close()
+
+        seen = set()
+        for job_id, active, location, experience_required, skill_ids in rows:
+            seen.add(job_id)
+            if active:
+                self.add(job_id, skill_ids, location, experience_required)
+            else:
+                self.remove(job_id)
+        for job_id in job_ids or ():
+            if job_id not in seen:
+                self.remove(job_id)
+        return len(rows)
+
+    def recommend(self, skill_ids, location=None, experience_years=0, limit=DEFAULT_RECOMMENDATIONS,
+                  exclude=()):
+        """Return ``[(score, job_id, matched), ...]`` best first, score 0-100"""
+        location = (location or "").strip().lower()
+        overlap = {}
+        with self.lock:
+            for skill_id in set(skill_ids):
+                for job_id in self.postings.get(skill_id, ()):
+                    overlap[job_id] = overlap.get(job_id, 0) + 1
+
+            scored = []
+            for job_id, matched in overlap.items():
+                if job_id in exclude:
+                    continue
+                job_skills, job_location, low, high = self.jobs[job_id]
+                score = SKILL_WEIGHT * matched / len(job_skills)
+                if location and job_location and (location in job_location or job_location in location):
+                    score += LOCATION_WEIGHT
+                score += EXPERIENCE_WEIGHT * experience_fit(experience_years or 0, low, high)
+                scored.append((round(score * 100), -job_id, matched))
+
+        return [(score, -neg_id, matched) for score, neg_id, matched in heapq.nlargest(limit, scored)]
+
+
+_index = None
+# Guards _index, _rebuilding and _missed; only ever held for small loads,
+# never for a full build
+_index_lock = threading.Lock()
+# One cold build at a time
+_build_lock = threading.Lock()
+_rebuilding = False
+# Jobs written while a build was reading its snapshot, replayed into the new
+# index when it is swapped in; None means "anything may have changed"
+_missed = set()
+
+
+def _swap_in(index, conn):
+    global _index, _rebuilding, _missed
+
+    with _index_lock:
+        _index = index
+        missed, _missed, _rebuilding = _missed, set(), False
+        if missed is None:
+            index.built_at = float("-inf")
+        elif missed:
+            index.load(conn, job_ids=list(missed))
+
+
+def _rebuild_index():
+    """Build a fresh index on a connection of its own and swap it in"""
+    global _rebuilding, _missed
+
+    try:
+        with pooled_connection() as conn:
+            index = JobIndex()
+            index.load(conn)
+            _swap_in(index, conn)
+            conn.rollback()
+    except Exception as e:
+        print(f"⚠️  Job index rebuild failed: {type(e).__name__}: {e}", file=sys.stderr, flush=True)
+        with _index_lock:
+            _rebuilding, _missed = False, set()
+
+
+def get_index(conn):
+    """Return this process's job index, building or catching it up as needed.
+
+    Only the first build blocks. After INDEX_TTL a background thread builds
+    a replacement while requests keep using the current index, and job
+    writes made meanwhile are replayed into it before it is swapped in.
+    """
+    global _rebuilding, _missed
+
+    index = _index
+    if index is None:
+        with _build_lock:
+            if _index is None:
+                with _index_lock:
+                    _rebuilding = True
+                try:
+                    built = JobIndex()
+                    built.load(conn)
+                    _swap_in(built, conn)
+                except Exception:
+                    with _index_lock:
+                        _rebuilding, _missed = False, set()
+                    raise
+            return _index
+
+    now = time.monotonic()
+    if now - index.built_at >= INDEX_TTL:
+        with _index_lock:
+            start = not _rebuilding
+            _rebuilding = True
+        if start:
+            threading.Thread(target=_rebuild_index, name="job-index", daemon=True).start()
+    elif now - index.synced_at >= SYNC_INTERVAL:
+        with _index_lock:
+            if now - index.synced_at >= SYNC_INTERVAL:
+                index.load(conn, after_job_id=index.max_job_id)
+                index.synced_at = now
+    return index
+
+
+@cache.on_jobs_changed
+def _update_index(job_ids, conn=None):
+    """Apply a committed job write to this process's index in place.
+
+    Reads through the writer's ``conn`` when given, so a request does not
+    check out a second pooled connection for this. A write made while an
+    index is being built is also remembered for that build.
+    """
+    global _missed
+
+    with _index_lock:
+        if _rebuilding:
+            _missed = None if job_ids is None or _missed is None else _missed | set(job_ids)
+        if _index is None:
+            return
+        if job_ids is None:
+            # Rebuilt in the background on the next get_index
+            _index.built_at = float("-inf")
+        elif conn is not None:
+            _index.load(conn, job_ids=list(job_ids))
+        else:
+            with pooled_connection() as own:
+                _index.load(own, job_ids=list(job_ids))
+                own.rollback()
+
+
+def recommended_jobs(conn, candidate_id, limit=DEFAULT_RECOMMENDATIONS):
+    """Top active jobs for a candidate by skill overlap, location and experience.
+
+    Jobs the candidate already applied to are left out. Each returned job
+    row carries ``match_score`` (0-100) and ``matched_skills`` (a count).
+    """
+    cursor = get_dict_cursor(conn)
+    cursor.execute("""
+                   SELECT u.location,
+                          u.experience_years,
+                          ARRAY(SELECT skill_id FROM user_skills WHERE user_id = u.user_id)      AS skill_ids,
+                          ARRAY(SELECT job_id FROM applications WHERE candidate_id = u.user_id) AS applied
+                   FROM users u
+                   WHERE u.user_id = %s
+                   """, (candidate_id,))
+    candidate = cursor.fetchone()
+    if candidate is None or not candidate["skill_ids"]:
+        cursor.close()
+        return []
+
+    index = get_index(conn)
+    ranked = index.recommend(candidate["skill_ids"], candidate["location"], candidate["experience_years"],
+                             limit=min(limit, MAX_RECOMMENDATIONS), exclude=set(candidate["applied"]))
+    if not ranked:
+        cursor.close()
+        return []
+
+    # The index may briefly lag a job closed by another process; re-check here
+    cursor.execute(f"""
+                   SELECT {JOB_COLUMNS}
+                   FROM jobs
+                   WHERE job_id = ANY (%s)
+                     AND status = 'Active'
+                   """, ([job_id for _, job_id, _ in ranked],))
+    jobs = {job["job_id"]: job for job in cursor.fetchall()}
+    cursor.close()
+
+    return [dict(jobs[job_id], match_score=score, matched_skills=matched)
+            for score, job_id, matched in ranked if job_id in jobs]
@@ -0,0 +1,193 @@
+import time
+
+import click
+
+import tasks
+from db import pooled_connection
+from tasks import task_handler
+
+
+RESCORE_TASK = "rescore_applications"
+
+# Dirty jobs/candidates claimed per transaction
+RESCORE_BATCH_SIZE = 200
+
+# Up to this many affected applications are rescored inside the request that
+# caused the change; more than that is handed to the worker.
+INLINE_LIMIT = 500
+
+# One set-based pass: claim a batch of dirty entities, recompute the score of
+# every application touching them from the skill link tables (same formula
+# as apply_job), and write only the scores that actually changed. The
+# entity/id arrays restrict the claim to those entities; NULL claims any.
+RESCORE_BATCH_QUERY = """
+                      WITH batch AS (
+                          DELETE FROM score_dirty
+                          WHERE (entity, entity_id) IN (SELECT entity, entity_id
+                                                        FROM score_dirty
+                                                        WHERE %s::text[] IS NULL
+                                                           OR (entity, entity_id) IN
+                                                              (SELECT * FROM unnest(%s::text[], %s::integer[]))
+                                                        ORDER BY marked_at
+                                                        LIMIT %s FOR UPDATE SKIP LOCKED)
+                          RETURNING entity, entity_id),
+                           affected AS (
+                               SELECT a.application_id, a.job_id, a.candidate_id
+                               FROM applications a
+                                        JOIN batch b ON b.entity = 'job' AND a.job_id = b.entity_id
+                               UNION
+                               SELECT a.application_id, a.job_id, a.candidate_id
+                               FROM applications a
+                                        JOIN batch b ON b.entity = 'candidate' AND a.candidate_id = b.entity_id),
+                           scores AS (
+                               SELECT af.application_id,
+                                      COALESCE(COUNT(us.skill_id) * 100 / NULLIF(COUNT(js.skill_id), 0), 0) AS score
+                               FROM affected af
+                                        LEFT JOIN job_skills js ON js.job_id = af.job_id
+                                        LEFT JOIN user_skills us
+                                                  ON us.user_id = af.candidate_id
+                                                      AND us.skill_id = js.skill_id
+                               GROUP BY af.application_id),
+                           updated AS (
+                               UPDATE applications a
+                                   SET score = s.score
+                                   FROM scores s
+                                   WHERE a.application_id = s.application_id
+                                       AND a.score IS DISTINCT FROM s.score
+                                   RETURNING a.application_id)
+                      SELECT (SELECT COUNT(*) FROM batch)    AS entities,
+                             (SELECT COUNT(*) FROM affected) AS checked,
+                             (SELECT COUNT(*) FROM updated)  AS updated
+                      """
+
+
+def _entity_arrays(entities):
+    """``[(entity, entity_id), ...]`` as the (text[], integer[]) pair the queries take; None for all"""
+    if entities is None:
+        return None, None
+    return [entity for entity, _ in entities], [entity_id for _, entity_id in entities]
+
+
+def pending_applications(conn, entities=None):
+    """Estimate of how many applications the dirty set (or just ``entities``) touches"""
+    kinds, ids = _entity_arrays(entities)
+    cursor = conn.cursor()
+    cursor.execute("""
+                   WITH dirty AS (SELECT entity, entity_id
+                                  FROM score_dirty
+                                  WHERE %s::text[] IS NULL
+                                     OR (entity, entity_id) IN (SELECT * FROM unnest(%s::text[], %s::integer[])))
+                   SELECT (SELECT COUNT(*)
+                           FROM applications a
+                                    JOIN dirty d ON d.entity = 'job' AND a.job_id = d.entity_id) +
+                          (SELECT COUNT(*)
+                           FROM applications a
+                                    JOIN dirty d ON d.entity = 'candidate' AND a.candidate_id = d.entity_id)
+                   """, (kinds, kinds, ids))
+    pending = cursor.fetchone()[0]
+    cursor.close()
+    return pending
+
+
+def rescore(conn, batch_size=RESCORE_BATCH_SIZE, max_batches=None, entities=None):
+    """Drain the dirty set, or only its ``entities``, committing after each batch.
+
+    Dirty rows are removed in the same transaction as the scores they
+    produce, so an interrupted run simply leaves the rest for next time.
+    Returns counts of entities, applications checked / updated and the
+    elapsed time.
+    """
+    started = time.perf_counter()
+    report = {"batches": 0, "entities": 0, "checked": 0, "updated": 0}
+    kinds, ids = _entity_arrays(entities)
+
+    cursor = conn.cursor()
+    while max_batches is None or report["batches"] < max_batches:
+        cursor.execute(RESCORE_BATCH_QUERY, (kinds, kinds, ids, batch_size))
+        entities, checked, updated = cursor.fetchone()
+        conn.commit()
+        if entities == 0:
+            break
+        report["batches"] += 1
+        report["entities"] += entities
+        report["checked"] += checked
+        report["updated"] += updated
+    cursor.close()
+
+    report["elapsed_ms"] = int((time.perf_counter() - started) * 1000)
+    return report
+
+
+def enqueue_rescore(conn):
+    """Queue a rescore task in the caller's transaction unless one is waiting"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM task_queue WHERE kind = %s AND status = 'queued' LIMIT 1", (RESCORE_TASK,))
+    waiting = cursor.fetchone() is not None
+    cursor.close()
+    if waiting:
+        return None
+    return tasks.enqueue(conn, RESCORE_TASK, {})
+
+
+def schedule_rescore(conn, entities=None, inline_limit=INLINE_LIMIT):
+    """Bring scores up to date after a committed skills change.
+
+    Only the caller's own ``entities`` (``("candidate" | "job", id)``
+    pairs) are rescored right away, and only when they touch few
+    applications; anything else dirty, such as other writers' backlog, is
+    queued for the worker so the request never pays for it. Returns the
+    inline report or the queued task, or None if nothing was dirty.
+    """
+    if entities:
+        pending = pending_applications(conn, entities)
+        if 0 < pending <= inline_limit:
+            report = dict(rescore(conn, entities=entities), mode="inline")
+            # The rest of the dirty set is still the worker's
+            cursor = conn.cursor()
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM score_dirty)")
+            if cursor.fetchone()[0]:
+                enqueue_rescore(conn)
+            cursor.close()
+            conn.commit()
+            return report
+
+    pending = pending_applications(conn)
+    if pending == 0:
+        conn.rollback()
+        return None
+
+    task_id = enqueue_rescore(conn)
+    conn.commit()
+    return {"mode": "queued", "task_id": task_id, "pending": pending}
+
+
+@task_handler(RESCORE_TASK)
+def rescore_task(conn, payload):
+    return rescore(conn)
+
+
+@click.command("rescore-applications")
+@click.option("--all", "rescore_all", is_flag=True, help="Mark every job as dirty first")
+@click.option("--batch-size", type=int, default=RESCORE_BATCH_SIZE, show_default=True)
+def rescore_applications_command(rescore_all, batch_size):
+    """Recompute application scores for jobs and candidates whose skills changed."""
+    with pooled_connection() as conn:
+        if rescore_all:
+            cursor = conn.cursor()
+            cursor.execute("""
+                           INSERT INTO score_dirty (entity, entity_id)
+                           SELECT 'job', job_id
+                           FROM jobs
+                           ON CONFLICT DO NOTHING
+                           """)
+            cursor.close()
+            conn.commit()
+        report = rescore(conn, batch_size)
+
+    click.echo(f"✅ Rescored {report['entities']} job(s)/candidate(s) in {report['batches']} batch(es): "
+               f"{report['checked']} application(s) checked, {report['updated']} updated "
+               f"in {report['elapsed_ms']} ms")
+
+
+def init_app(app):
+    app.cli.add_command(rescore_applications_command)
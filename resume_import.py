@@ -0,0 +1,288 @@
+import hashlib
+import io
+import os
+import re
+import signal
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import click
+import psycopg2.extras
+
+import rescoring
+from db import pooled_connection
+from resume_parser import analyze_text, read_resume
+
+
+IMPORT_BATCH_SIZE = 200
+IMPORT_FILE_TIMEOUT = 30
+
+# Failures printed at the end of a run; the full list stays in resume_imports
+REPORT_LIMIT = 50
+
+_EMAIL_RE = re.compile(r"[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}")
+
+# (source, ZipFile or None) for the source this process is reading from
+_source = None
+
+
+class ParseTimeout(Exception):
+    pass
+
+
+def iter_resume_files(source):
+    """Yield PDF paths under a directory, or PDF member names inside a zip"""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(".pdf"):
+                    yield info.filename
+        return
+
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                yield os.path.relpath(os.path.join(root, name), source)
+
+
+def _open_source(source):
+    """Pool initializer: open a zip source once, not once per member"""
+    global _source
+    _source = (source, zipfile.ZipFile(source) if zipfile.is_zipfile(source) else None)
+
+
+def _read_bytes(source, path):
+    if _source is None or _source[0] != source:
+        _open_source(source)
+    archive = _source[1]
+    if archive is not None:
+        return archive.read(path)
+    with open(os.path.join(source, path), "rb") as f:
+        return f.read()
+
+
+def _on_timeout(signum, frame):
+    raise ParseTimeout()
+
+
+def _match_email(path, text):
+    # A file named after the candidate wins over the first address in the text
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    if _EMAIL_RE.fullmatch(stem):
+        return stem
+    found = _EMAIL_RE.search(text)
+    return found.group(0) if found else None
+
+
+def parse_file(source, path, timeout=IMPORT_FILE_TIMEOUT):
+    """Parse one resume in a pool process and return a plain result dict.
+
+    The timeout is enforced inside the child with SIGALRM, so a stuck PDF
+    fails on its own instead of occupying a pool slot for the whole run.
+    """
+    started = time.perf_counter()
+    result = {"path": path, "ok": False, "error": None, "pages": 0, "sha256": None,
+              "limit": None, "email": None, "skills": "", "experience": 0}
+
+    previous = signal.signal(signal.SIGALRM, _on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        data = _read_bytes(source, path)
+        result["sha256"] = hashlib.sha256(data).hexdigest()
+        text, pages, limit = read_resume(io.BytesIO(data), time_budget=timeout)
+        result.update(analyze_text(text), pages=pages, limit=limit, email=_match_email(path, text), ok=True)
+    except ParseTimeout:
+        result["error"] = f"Timed out after {timeout}s"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+    result["duration_ms"] = int((time.perf_counter() - started) * 1000)
+    return result
+
+
+def finished_paths(conn, source, retry_failed=False):
+    """Paths a previous run already settled, so a rerun picks up where it stopped"""
+    cursor = conn.cursor()
+    cursor.execute("""
+                   SELECT path
+                   FROM resume_imports
+                   WHERE source = %s
+                     AND (status <> 'failed' OR NOT %s)
+                   """, (source, retry_failed))
+    paths = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return paths
+
+
+def flush_batch(conn, source, batch):
+    """Apply one batch of parse results in a single transaction.
+
+    Candidates are matched on email and updated with one ``UPDATE ... FROM
+    (VALUES ...)``; every file's outcome is recorded in ``resume_imports``.
+    Returns the number of candidates updated.
+    """
+    cursor = conn.cursor()
+
+    matched = {}
+    parsed = [r for r in batch if r["ok"] and r["email"]]
+    if parsed:
+        rows = psycopg2.extras.execute_values(cursor, """
+            UPDATE users
+            SET skills           = COALESCE(NULLIF(v.skills, ''), users.skills),
+                experience_years = CASE WHEN v.experience > 0 THEN v.experience ELSE users.experience_years END
+            FROM (VALUES %s) AS v (email, skills, experience)
+            WHERE lower(users.email) = v.email
+              AND users.role = 'CANDIDATE'
+            RETURNING v.email, users.user_id
+            """, [(r["email"], r["skills"], r["experience"]) for r in parsed],
+            template="(%s, %s, %s::integer)", page_size=len(parsed), fetch=True)
+        matched = dict(rows)
+
+    outcomes = []
+    for r in batch:
+        if not r["ok"]:
+            status, error = "failed", r["error"]
+        elif r["email"] in matched:
+            status, error = "done", None
+        else:
+            status = "unmatched"
+            error = f"No candidate with email {r['email']}" if r["email"] else "No email address found"
+        outcomes.append((source, r["path"], status, r["sha256"], r["pages"], r["limit"],
+                         matched.get(r["email"]), error, r["duration_ms"]))
+
+    psycopg2.extras.execute_values(cursor, """
+        INSERT INTO resume_imports (source, path, status, content_sha256, pages, limit_hit, user_id, error,
+                                    duration_ms)
+        VALUES %s
+        ON CONFLICT (source, path) DO UPDATE
+            SET status         = EXCLUDED.status,
+                content_sha256 = EXCLUDED.content_sha256,
+                pages          = EXCLUDED.pages,
+                limit_hit      = EXCLUDED.limit_hit,
+                user_id        = EXCLUDED.user_id,
+                error          = EXCLUDED.error,
+                duration_ms    = EXCLUDED.duration_ms,
+                imported_at    = CURRENT_TIMESTAMP
+        """, outcomes, page_size=len(outcomes))
+
+    conn.commit()
+    cursor.close()
+    return len(matched)
+
+
+def failure_report(conn, source, limit=REPORT_LIMIT):
+    cursor = conn.cursor()
+    cursor.execute("""
+                   SELECT path, status, error
+                   FROM resume_imports
+                   WHERE source = %s
+                     AND status <> 'done'
+                   ORDER BY status, path
+                   LIMIT %s
+                   """, (source, limit))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def import_resumes(source, workers=None, batch_size=IMPORT_BATCH_SIZE, timeout=IMPORT_FILE_TIMEOUT,
+                   retry_failed=False, echo=print):
+    """Parse every PDF under ``source`` in a process pool and apply the results.
+
+    Only a bounded window of files is in flight at once, and results are
+    committed every ``batch_size`` files, so an interrupted run loses at most
+    one batch and a rerun skips everything already recorded.
+    """
+    source = os.path.abspath(source)
+    workers = workers or os.cpu_count() or 1
+    totals = {"files": 0, "pages": 0, "updated": 0, "failed": 0, "truncated": 0, "skipped": 0}
+
+    with pooled_connection() as conn:
+        done = finished_paths(conn, source, retry_failed)
+        pending = [path for path in iter_resume_files(source) if path not in done]
+        totals["skipped"] = len(done)
+        echo(f"📂 {len(pending)} resume(s) to import, {len(done)} already done, {workers} worker(s)")
+
+        started = time.perf_counter()
+        batch = []
+        queue = iter(pending)
+        in_flight = set()
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_open_source, initargs=(source,)) as pool:
+            while True:
+                while len(in_flight) < workers * 4:
+                    path = next(queue, None)
+                    if path is None:
+                        break
+                    in_flight.add(pool.submit(parse_file, source, path, timeout))
+                if not in_flight:
+                    break
+
+                completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    result = future.result()
+                    batch.append(result)
+                    totals["files"] += 1
+                    totals["pages"] += result["pages"]
+                    totals["failed"] += not result["ok"]
+                    totals["truncated"] += result["limit"] is not None
+
+                if len(batch) >= batch_size:
+                    totals["updated"] += flush_batch(conn, source, batch)
+                    batch = []
+                    elapsed = time.perf_counter() - started
+                    echo(f"  {totals['files']}/{len(pending)} files, "
+                         f"{totals['files'] / elapsed:.1f} files/s, {totals['pages'] / elapsed:.1f} pages/s")
+
+        if batch:
+            totals["updated"] += flush_batch(conn, source, batch)
+
+        totals["elapsed"] = time.perf_counter() - started
+        totals["failures"] = failure_report(conn, source)
+        # Every matched candidate is dirty now; too many to rescore inline
+        totals["rescore"] = rescoring.schedule_rescore(conn)
+
+    return totals
+
+
+@click.command("import-resumes")
+@click.argument("source", type=click.Path(exists=True))
+@click.option("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+@click.option("--batch-size", type=int, default=IMPORT_BATCH_SIZE, show_default=True)
+@click.option("--timeout", type=int, default=IMPORT_FILE_TIMEOUT, show_default=True,
+              help="Seconds allowed per file")
+@click.option("--retry-failed", is_flag=True, help="Parse files that failed in an earlier run again")
+def import_resumes_command(source, workers, batch_size, timeout, retry_failed):
+    """Bulk-import PDF resumes from a directory or zip into candidate profiles.
+
+    Each resume is matched to a candidate by file name (<email>.pdf) or by
+    the first email address in its text. Reruns skip files already imported.
+    """
+    totals = import_resumes(source, workers, batch_size, timeout, retry_failed, echo=click.echo)
+    elapsed = totals["elapsed"] or 1e-9
+
+    click.echo(f"✅ Parsed {totals['files']} file(s), {totals['pages']} page(s) in {elapsed:.1f}s "
+               f"({totals['files'] / elapsed:.1f} files/s, {totals['pages'] / elapsed:.1f} pages/s)")
+    click.echo(f"   {totals['updated']} candidate(s) updated, {totals['failed']} failed, "
+               f"{totals['truncated']} cut short by a page/char/time budget, "
+               f"{totals['skipped']} skipped from earlier runs")
+
+    rescore = totals["rescore"]
+    if rescore and rescore["mode"] == "queued":
+        click.echo(f"   {rescore['pending']} application score(s) queued for rescoring (task #{rescore['task_id']})")
+    elif rescore:
+        click.echo(f"   {rescore['updated']} application score(s) updated in {rescore['elapsed_ms']} ms")
+
+    if totals["failures"]:
+        click.echo("⚠️  Not imported:")
+        for path, status, error in totals["failures"]:
+            click.echo(f"   [{status}] {path}: {error}")
+
+
+def init_app(app):
+    app.cli.add_command(import_resumes_command)
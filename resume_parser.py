@@ -0,0 +1,220 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import time
+
+from PyPDF2 import PdfReader
+
+import rescoring
+from cache import MemoryBackend
+from skill_extractor import get_extractor
+from tasks import task_handler
+
+
+# Bump whenever extraction or analysis changes so cached results from the
+# old code are ignored rather than served. The skill taxonomy fingerprint is
+# appended at lookup time, so editing the taxonomy has the same effect.
+PARSER_VERSION = "3"
+
+# Extraction budgets. A resume is a few pages; anything past these limits is
+# a scan or a hostile file, and what was read so far is analysed as is.
+MAX_PAGES = int(os.environ.get("RESUME_MAX_PAGES", 20))
+MAX_CHARS = int(os.environ.get("RESUME_MAX_CHARS", 200_000))
+TIME_BUDGET = float(os.environ.get("RESUME_TIME_BUDGET", 10))
+
+# The time budget is checked between pages; a single page that never
+# finishes is handled by killing the parser process this long afterwards.
+KILL_GRACE = 5
+
+# In-process LRU in front of resume_parse_cache; entries never go stale on
+# their own because the key includes the content hash and parser version.
+_memory_cache = MemoryBackend(max_entries=256)
+MEMORY_CACHE_TTL = 24 * 60 * 60
+
+
+class ExtractionError(Exception):
+    pass
+
+
+def read_resume(source, max_pages=MAX_PAGES, max_chars=MAX_CHARS, time_budget=TIME_BUDGET):
+    """Extract text from a PDF path or binary file object within budgets.
+
+    Pages are pulled one at a time and their text collected in a list, so
+    work and memory stop growing as soon as a budget is reached. Returns
+    ``(text, pages_read, limit)`` where limit is "pages", "chars", "time" or
+    None if the whole document was read.
+    """
+    started = time.monotonic()
+    reader = PdfReader(source)
+    chunks = []
+    chars = 0
+    pages_read = 0
+    limit = None
+
+    for page in reader.pages:
+        if pages_read >= max_pages:
+            limit = "pages"
+            break
+        if time.monotonic() - started > time_budget:
+            limit = "time"
+            break
+
+        chunk = page.extract_text() or ""
+        pages_read += 1
+        if chars + len(chunk) >= max_chars:
+            chunks.append(chunk[:max_chars - chars])
+            limit = "chars"
+            break
+        chunks.append(chunk)
+        chars += len(chunk)
+
+    return "".join(chunks).lower(), pages_read, limit
+
+
+def _extract_child(pipe, file_path, limits):
+    try:
+        pipe.send(("ok", read_resume(file_path, **limits)))
+    except Exception as e:
+        pipe.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        pipe.close()
+
+
+def read_resume_isolated(file_path, max_pages=MAX_PAGES, max_chars=MAX_CHARS, time_budget=TIME_BUDGET):
+    """Run ``read_resume`` in a child process that is killed if it overruns.
+
+    The budgets stop a well-behaved parse; the kill covers a PDF that hangs
+    inside a single page. Raises ExtractionError if the child fails or has
+    to be killed.
+    """
+    ctx = multiprocessing.get_context("forkserver")
+    receiver, sender = ctx.Pipe(duplex=False)
+    limits = {"max_pages": max_pages, "max_chars": max_chars, "time_budget": time_budget}
+    process = ctx.Process(target=_extract_child, args=(sender, file_path, limits), daemon=True)
+    process.start()
+    sender.close()
+
+    try:
+        if not receiver.poll(time_budget + KILL_GRACE):
+            raise ExtractionError(f"Parser killed after {time_budget + KILL_GRACE:.0f}s")
+        status, value = receiver.recv()
+    except EOFError:
+        raise ExtractionError(f"Parser exited with code {process.exitcode}") from None
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    if status != "ok":
+        raise ExtractionError(value)
+    return value
+
+
+def extract_text(file_path):
+    return read_resume(file_path)[0]
+
+
+def analyze_text(text, extractor=None):
+    extractor = extractor or get_extractor()
+    detected_skills = extractor.extract_names(text)
+
+    exp_match = re.search(r'(\d+)\+?\s+years', text)
+    experience = int(exp_match.group(1)) if exp_match else 0
+
+    return {
+        "skills": ", ".join(detected_skills),
+        "experience": experience
+    }
+
+
+def parse_resume(file_path):
+    return analyze_text(extract_text(file_path))
+
+
+def parse_resume_cached(conn, data):
+    """Parse a resume's PDF bytes, reusing results for byte-identical files.
+
+    Looks in the in-process LRU, then in ``resume_parse_cache``, and only
+    opens the PDF on a miss in both, in a budgeted child process. Returns
+    ``(parsed, source)`` where source is "memory", "db" or "parsed";
+    ``parsed["limit"]`` names the budget that cut extraction short, if any.
+    """
+    extractor = get_extractor(conn)
+    version = f"{PARSER_VERSION}.{extractor.fingerprint}"
+    sha = hashlib.sha256(data).hexdigest()
+    key = f"{sha}:{version}"
+
+    found, parsed = _memory_cache.get(key)
+    if found:
+        return parsed, "memory"
+
+    cursor = conn.cursor()
+    cursor.execute("""
+                   UPDATE resume_parse_cache
+                   SET hit_count   = hit_count + 1,
+                       last_hit_at = CURRENT_TIMESTAMP
+                   WHERE content_sha256 = %s
+                     AND parser_version = %s
+                   RETURNING skills, experience, limit_hit
+                   """, (sha, version))
+    row = cursor.fetchone()
+
+    if row:
+        parsed = {"skills": row[0], "experience": row[1], "limit": row[2]}
+        source = "db"
+    else:
+        text, pages, limit = read_resume_isolated(io.BytesIO(data))
+        parsed = dict(analyze_text(text, extractor), limit=limit)
+        cursor.execute("""
+                       INSERT INTO resume_parse_cache (content_sha256, parser_version, text, skills, experience,
+                                                       pages, limit_hit)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s)
+                       ON CONFLICT (content_sha256, parser_version) DO NOTHING
+                       """, (sha, version, text, parsed["skills"], parsed["experience"], pages, limit))
+        source = "parsed"
+
+    cursor.close()
+    _memory_cache.set(key, parsed, MEMORY_CACHE_TTL)
+    return parsed, source
+
+
+@task_handler("parse_resume")
+def parse_resume_task(conn, payload):
+    """Parse an uploaded resume and write the results back to the candidate.
+
+    The update is skipped if the candidate has uploaded a newer resume in
+    the meantime, and empty results never wipe what they typed in the form.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT content FROM resume_uploads WHERE upload_id = %s", (payload.get("upload_id"),))
+    row = cursor.fetchone()
+    if row is None:
+        # Replaced by a newer upload before this task ran (or queued before
+        # uploads were stored in the database)
+        cursor.close()
+        return {"applied": False, "superseded": True}
+
+    started = time.perf_counter()
+    parsed, source = parse_resume_cached(conn, bytes(row[0]))
+    parse_ms = int((time.perf_counter() - started) * 1000)
+
+    cursor.execute("""
+                   UPDATE users
+                   SET skills           = COALESCE(NULLIF(%s, ''), skills),
+                       experience_years = CASE WHEN %s > 0 THEN %s ELSE experience_years END
+                   WHERE user_id = %s
+                     AND resume_path = %s
+                   """, (parsed["skills"], parsed["experience"], parsed["experience"],
+                         payload["user_id"], payload["resume_path"]))
+    applied = cursor.rowcount == 1
+    cursor.execute("DELETE FROM resume_uploads WHERE upload_id = %s", (payload["upload_id"],))
+    cursor.close()
+
+    if applied:
+        # Committed with this task; the worker picks the rescore up next
+        rescoring.enqueue_rescore(conn)
+
+    return dict(parsed, parse_ms=parse_ms, cache=source, applied=applied)
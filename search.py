@@ -0,0 +1,288 @@
+import re
+
+import click
+
+import cache
+import tasks
+from db import get_dict_cursor, pooled_connection
+from pagination import Page, cursor_scope, decode_cursor, keyset_predicate
+from tasks import task_handler
+
+
+# ts_rank_cd weights for {D, C, B, A} = {description, company, skills, title}
+RANK_WEIGHTS = "{0.1, 0.2, 0.4, 1.0}"
+
+MAX_PER_PAGE = 50
+
+# Every jobs column except the generated search_vector, which is never
+# worth shipping to templates or JSON clients.
+JOB_COLUMNS = ("jobs.job_id, jobs.title, jobs.company, jobs.location, jobs.job_type, "
+               "jobs.experience_required, jobs.salary_range, jobs.skills_required, "
+               "jobs.description, jobs.requirements, jobs.status, jobs.posted_by, "
+               "jobs.created_at")
+
+# pg_trgm thresholds: a term must be this similar to a word in title,
+# company or location to match, or to a vocabulary word to be suggested.
+FUZZY_THRESHOLD = 0.5
+SUGGEST_THRESHOLD = 0.4
+
+# Job writes queue one vocabulary refresh, held back this long so a burst of
+# postings or an import shares a single REFRESH instead of one each
+SEARCH_WORDS_TASK = "refresh_search_words"
+SEARCH_WORDS_DELAY = 60
+
+_TERM_RE = re.compile(r"[a-z0-9]+")
+
+
+def to_prefix_tsquery(text):
+    """Turn free text into a prefix tsquery string, e.g. "pyth dev" -> "pyth:* & dev:*".
+
+    Only alphanumeric runs are kept, so user input can never inject tsquery
+    operators. Returns an empty string when there is nothing to search for.
+    """
+    terms = _TERM_RE.findall((text or "").lower())
+    return " & ".join(f"{term}:*" for term in dict.fromkeys(terms))
+
+
+def _search_scope(mode, text, location, job_type):
+    return "|".join(["jobs", mode, text or "", location or "", job_type or ""])
+
+
+def is_fuzzy_cursor(token):
+    """True when ``token`` continues a fuzzy_search_jobs listing"""
+    scope = cursor_scope(token)
+    return scope is not None and scope.split("|")[:2] == ["jobs", "fuzzy"]
+
+
+def _keyset(rank_sql, rank_params, after):
+    """Keyset predicate over (rank, created_at, job_id) or (created_at, job_id)"""
+    if after is None:
+        return "", []
+    if rank_sql:
+        predicate, params = keyset_predicate(
+            [rank_sql, "jobs.created_at", "jobs.job_id"], after, casts=["real", None, None]
+        )
+        return " AND " + predicate, rank_params + params
+    predicate, params = keyset_predicate(["jobs.created_at", "jobs.job_id"], after)
+    return " AND " + predicate, params
+
+
+def build_job_search_query(text="", location="", job_type="", columns=JOB_COLUMNS,
+                           after=None, per_page=20):
+    """Build the SQL, params and sort-key fields for an active-job search.
+
+    Matching uses the GIN-indexed ``search_vector`` column; results are
+    ordered by weighted rank and then recency, and paginated by keyset
+    (``after`` is the sort key of the previous page's last row). One extra
+    row is fetched so callers can tell whether another page exists.
+    """
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+
+    tsquery = to_prefix_tsquery(text)
+    params = []
+    rank_sql = None
+    rank_params = []
+
+    if tsquery:
+        rank_sql = "ts_rank_cd(%s, search_vector, q.query)"
+        rank_params = [RANK_WEIGHTS]
+        select = f"SELECT {columns}, {rank_sql} AS rank"
+        params.extend(rank_params)
+        sources = " FROM jobs, to_tsquery('english', %s) AS q(query)"
+        params.append(tsquery)
+        where = " WHERE status = 'Active' AND search_vector @@ q.query"
+        order = " ORDER BY rank DESC, created_at DESC, job_id DESC"
+        key_fields = ("rank", "created_at", "job_id")
+    else:
+        select = f"SELECT {columns}"
+        sources = " FROM jobs"
+        where = " WHERE status = 'Active'"
+        order = " ORDER BY created_at DESC, job_id DESC"
+        key_fields = ("created_at", "job_id")
+
+    if location:
+        where += " AND location ILIKE %s"
+        params.append(f"%{location}%")
+
+    if job_type:
+        where += " AND job_type = %s"
+        params.append(job_type)
+
+    keyset_sql, keyset_params = _keyset(rank_sql, rank_params, after)
+    query = select + sources + where + keyset_sql + order + " LIMIT %s"
+    params.extend(keyset_params)
+    params.append(per_page + 1)
+
+    return query, params, key_fields
+
+
+def _run_search(conn, query, params, key_fields, per_page, scope, setup=None):
+    cursor = get_dict_cursor(conn)
+    if setup:
+        cursor.execute(*setup)
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    cursor.close()
+    return Page(rows, key_fields, per_page, scope)
+
+
+def search_jobs(conn, text="", location="", job_type="", columns=JOB_COLUMNS,
+                cursor=None, per_page=20):
+    """Run a job search and return a ``pagination.Page``"""
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    scope = _search_scope("fts", text, location, job_type)
+    arity = 3 if to_prefix_tsquery(text) else 2
+
+    after = decode_cursor(cursor, scope, arity)
+    query, params, key_fields = build_job_search_query(text, location, job_type, columns,
+                                                       after, per_page)
+    return _run_search(conn, query, params, key_fields, per_page, scope)
+
+
+# ---------------- FUZZY (TRIGRAM) SEARCH ----------------
+def fuzzy_terms(text):
+    return list(dict.fromkeys(t for t in _TERM_RE.findall((text or "").lower()) if len(t) >= 3))
+
+
+def build_fuzzy_search_query(text, location="", job_type="", columns=JOB_COLUMNS,
+                             after=None, per_page=20):
+    """Build a typo-tolerant search over title, company and location.
+
+    Every term must be word-similar to one of the three columns, which the
+    planner answers with a BitmapOr of their trigram GIN indexes per term.
+    Rows are ranked by the summed best similarity of each term.
+    """
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+
+    terms = fuzzy_terms(text)
+    params = []
+    where = " WHERE status = 'Active'"
+
+    for term in terms:
+        where += " AND (%s <%% title OR %s <%% company OR %s <%% location)"
+        params.extend([term, term, term])
+
+    rank_sql = " + ".join(
+        "GREATEST(word_similarity(%s, title), word_similarity(%s, company), "
+        "word_similarity(%s, coalesce(location, '')))" for _ in terms
+    ) or "0::real"
+    rank_params = [term for term in terms for _ in range(3)]
+
+    if location:
+        where += " AND %s <%% location"
+        params.append(location)
+
+    if job_type:
+        where += " AND job_type = %s"
+        params.append(job_type)
+
+    keyset_sql, keyset_params = _keyset(f"({rank_sql})", rank_params, after)
+    query = (f"SELECT {columns}, ({rank_sql}) AS rank FROM jobs" + where + keyset_sql
+             + " ORDER BY rank DESC, created_at DESC, job_id DESC LIMIT %s")
+
+    params = rank_params + params + keyset_params + [per_page + 1]
+    return query, params, ("rank", "created_at", "job_id")
+
+
+def fuzzy_search_jobs(conn, text, location="", job_type="", columns=JOB_COLUMNS,
+                      cursor=None, per_page=20, threshold=FUZZY_THRESHOLD):
+    """Run a trigram search and return a ``pagination.Page``"""
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    scope = _search_scope("fuzzy", text, location, job_type)
+
+    after = decode_cursor(cursor, scope, arity=3)
+    query, params, key_fields = build_fuzzy_search_query(text, location, job_type, columns,
+                                                         after, per_page)
+    setup = ("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", (str(threshold),))
+    return _run_search(conn, query, params, key_fields, per_page, scope, setup)
+
+
+def suggest_terms(conn, text, threshold=SUGGEST_THRESHOLD):
+    """Map each search term to its closest word in the job vocabulary.
+
+    Lookups go through the trigram index on ``job_search_words`` in one
+    round trip. Terms that are already known map to themselves; terms with
+    no close match map to None.
+    """
+    terms = fuzzy_terms(text)
+    if not terms:
+        return {}
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", (str(threshold),))
+    cursor.execute("""
+                   SELECT t.term, s.word
+                   FROM unnest(%s::text[]) AS t(term)
+                            LEFT JOIN LATERAL (
+                       SELECT w.word
+                       FROM job_search_words w
+                       WHERE w.word %% t.term
+                       ORDER BY similarity(w.word, t.term) DESC, w.ndoc DESC
+                       LIMIT 1
+                       ) s ON true
+                   """, (terms,))
+    suggestions = dict(cursor.fetchall())
+    cursor.close()
+    return suggestions
+
+
+def did_you_mean(conn, text):
+    """Return the query rewritten to known vocabulary words, or None.
+
+    Misspelt terms are replaced by their closest word; terms with no close
+    word at all (filler such as "show" or "please") are dropped.
+    """
+    terms = fuzzy_terms(text)
+    suggestions = suggest_terms(conn, text)
+    corrected = [suggestions[term] for term in terms if suggestions.get(term)]
+    if not corrected or corrected == terms:
+        return None
+    return " ".join(corrected)
+
+
+def refresh_search_words(conn):
+    cursor = conn.cursor()
+    cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY job_search_words")
+    conn.commit()
+    cursor.close()
+
+
+def enqueue_search_words_refresh(conn):
+    """Queue a delayed vocabulary refresh in the caller's transaction unless one is waiting"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM task_queue WHERE kind = %s AND status = 'queued' LIMIT 1",
+                   (SEARCH_WORDS_TASK,))
+    waiting = cursor.fetchone() is not None
+    cursor.close()
+    if waiting:
+        return None
+    return tasks.enqueue(conn, SEARCH_WORDS_TASK, {}, delay=SEARCH_WORDS_DELAY)
+
+
+@cache.on_jobs_changed
+def _schedule_search_words_refresh(job_ids, conn=None):
+    if conn is not None:
+        enqueue_search_words_refresh(conn)
+        conn.commit()
+    else:
+        with pooled_connection() as own:
+            enqueue_search_words_refresh(own)
+            own.commit()
+
+
+@task_handler(SEARCH_WORDS_TASK)
+def refresh_search_words_task(conn, payload):
+    refresh_search_words(conn)
+    return {}
+
+
+@click.command("refresh-search-words")
+def refresh_search_words_command():
+    """Rebuild the "did you mean" vocabulary from active jobs."""
+    with pooled_connection() as conn:
+        refresh_search_words(conn)
+    click.echo("✅ job_search_words refreshed")
+
+
+def init_app(app):
+    app.cli.add_command(refresh_search_words_command)
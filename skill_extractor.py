@@ -0,0 +1,306 @@
+import csv
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import click
+
+from db import pooled_connection
+
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "skills.csv")
+
+# How long a compiled automaton is reused before the taxonomy is reloaded,
+# so `flask load-skills` reaches running web workers without a restart.
+TAXONOMY_TTL = 10 * 60
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text):
+    return _WHITESPACE_RE.sub(" ", (text or "").lower()).strip()
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: every pattern is found in one pass over the text"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+    def add(self, pattern, value):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), value))
+
+    def build(self):
+        """Compute failure links breadth-first and fold outputs along them"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        return self
+
+    def iter_matches(self, text):
+        """Yield ``(start, end, value)`` for every occurrence of every pattern"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for length, value in out[node]:
+                    yield i - length + 1, i + 1, value
+
+
+class SkillExtractor:
+    """Finds canonical skills in free text using a compiled taxonomy.
+
+    ``taxonomy`` is a list of ``(slug, name, patterns)``. Matches must sit on
+    word boundaries ("java" does not match inside "javascript", "sql" not
+    inside "nosql"), and overlapping matches resolve leftmost-longest, so
+    "react native" is React Native rather than React.
+    """
+
+    def __init__(self, taxonomy):
+        self.names = {}
+        self._automaton = AhoCorasick()
+        fingerprint = hashlib.sha256()
+
+        for slug, name, patterns in sorted(taxonomy):
+            self.names[slug] = name
+            for pattern in sorted(set(normalize(p) for p in patterns if p and p.strip())):
+                self._automaton.add(pattern, slug)
+                fingerprint.update(f"{slug}\0{pattern}\0".encode())
+
+        self._automaton.build()
+        self.fingerprint = fingerprint.hexdigest()[:12]
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.names)
+
+    def extract(self, text):
+        """Return matched skill slugs in order of first appearance"""
+        text = normalize(text)
+        last = len(text)
+
+        matches = []
+        for start, end, slug in self._automaton.iter_matches(text):
+            if start > 0 and text[start - 1].isalnum() and text[start].isalnum():
+                continue
+            if end < last and text[end].isalnum() and text[end - 1].isalnum():
+                continue
+            matches.append((start, -end, slug))
+
+        matches.sort()
+        found = {}
+        covered_until = 0
+        for start, neg_end, slug in matches:
+            if start < covered_until:
+                continue
+            covered_until = -neg_end
+            found.setdefault(slug, None)
+        return list(found)
+
+    def extract_names(self, text):
+        return [self.names[slug] for slug in self.extract(text)]
+
+
+# ---------------- TAXONOMY LOADING ----------------
+def _patterns(name, aliases):
+    # Bare names of one or two letters (C, R, Go) are too ambiguous to
+    # match on their own; those skills are found through their aliases.
+    patterns = [alias for alias in aliases if alias]
+    if len(name) > 2:
+        patterns.append(name)
+    return patterns
+
+
+def load_taxonomy_file(path=DEFAULT_TAXONOMY_PATH):
+    taxonomy = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            aliases = [a.strip() for a in (row.get("aliases") or "").split("|")]
+            taxonomy.append((row["slug"].strip(), row["name"].strip(), _patterns(row["name"].strip(), aliases)))
+    return taxonomy
+
+
+def load_taxonomy_db(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+                   SELECT s.slug, s.name, array_agg(a.alias)
+                   FROM skills s
+                            JOIN skill_aliases a ON a.skill_id = s.skill_id AND a.curated
+                   WHERE s.curated
+                   GROUP BY s.slug, s.name
+                   """)
+    taxonomy = [(slug, name, list(aliases)) for slug, name, aliases in cursor.fetchall()]
+    cursor.close()
+    return taxonomy
+
+
+def save_taxonomy_db(conn, taxonomy):
+    """Upsert a taxonomy into ``skills`` / ``skill_aliases``"""
+    cursor = conn.cursor()
+    for slug, name, patterns in taxonomy:
+        cursor.execute("""
+                       INSERT INTO skills (slug, name, curated)
+                       VALUES (%s, %s, TRUE)
+                       ON CONFLICT (slug) DO UPDATE SET name    = EXCLUDED.name,
+                                                        curated = TRUE
+                       RETURNING skill_id
+                       """, (slug, name))
+        skill_id = cursor.fetchone()[0]
+        for pattern in set(normalize(p) for p in patterns if p):
+            cursor.execute("""
+                           INSERT INTO skill_aliases (alias, skill_id, curated)
+                           VALUES (%s, %s, TRUE)
+                           ON CONFLICT (alias) DO UPDATE SET skill_id = EXCLUDED.skill_id,
+                                                             curated  = TRUE
+                           """, (pattern, skill_id))
+    conn.commit()
+    cursor.close()
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_extractor(conn=None):
+    """Return the compiled extractor, building it on first use.
+
+    The taxonomy comes from the ``skills`` tables when ``conn`` is given and
+    they are populated, otherwise from ``data/skills.csv``. The automaton is
+    shared by every request in the process and rebuilt after TAXONOMY_TTL.
+    """
+    global _extractor
+
+    extractor = _extractor
+    if extractor is not None and time.monotonic() - extractor.loaded_at < TAXONOMY_TTL:
+        return extractor
+
+    with _extractor_lock:
+        if _extractor is None or time.monotonic() - _extractor.loaded_at >= TAXONOMY_TTL:
+            taxonomy = load_taxonomy_db(conn) if conn is not None else []
+            _extractor = SkillExtractor(taxonomy or load_taxonomy_file())
+        return _extractor
+
+
+def reload_extractor(conn=None):
+    global _extractor
+    with _extractor_lock:
+        _extractor = None
+    return get_extractor(conn)
+
+
+# (table, key, skill list column, link table) kept in sync by triggers
+SKILL_LINKS = [
+    ("users", "user_id", "skills", "user_skills"),
+    ("jobs", "job_id", "skills_required", "job_skills"),
+]
+
+
+def backfill_skill_links(conn):
+    """Resync user_skills / job_skills with the comma-separated skill columns.
+
+    The same splitting and alias lookup as the sync triggers, done as one
+    set-based pass per table: for rows written before the triggers existed,
+    and after load-skills moves aliases to other skills. Links the current
+    aliases no longer produce are deleted before the missing ones are
+    added. Returns ``{link table: (added, removed)}``.
+    """
+    cursor = conn.cursor()
+    synced = {}
+
+    for table, key, column, link in SKILL_LINKS:
+        cursor.execute(f"""
+                       INSERT INTO skills (slug, name, curated)
+                       SELECT DISTINCT ON (skill_slug(t)) skill_slug(t), t, FALSE
+                       FROM {table} x
+                                CROSS JOIN LATERAL skill_tokens(x.{column}) AS t
+                       WHERE skill_slug(t) <> ''
+                         AND NOT EXISTS (SELECT 1 FROM skill_aliases a WHERE a.alias = lower(t))
+                       ORDER BY skill_slug(t), t
+                       ON CONFLICT (slug) DO NOTHING
+                       """)
+        cursor.execute(f"""
+                       INSERT INTO skill_aliases (alias, skill_id)
+                       SELECT DISTINCT lower(t), s.skill_id
+                       FROM {table} x
+                                CROSS JOIN LATERAL skill_tokens(x.{column}) AS t
+                                JOIN skills s ON s.slug = skill_slug(t)
+                       ON CONFLICT (alias) DO NOTHING
+                       """)
+        cursor.execute(f"""
+                       DELETE
+                       FROM {link} l
+                       WHERE NOT EXISTS (SELECT 1
+                                         FROM {table} x
+                                                  CROSS JOIN LATERAL skill_tokens(x.{column}) AS t
+                                                  JOIN skill_aliases a ON a.alias = lower(t)
+                                         WHERE x.{key} = l.{key}
+                                           AND a.skill_id = l.skill_id)
+                       """)
+        removed = cursor.rowcount
+        cursor.execute(f"""
+                       INSERT INTO {link} ({key}, skill_id)
+                       SELECT DISTINCT x.{key}, a.skill_id
+                       FROM {table} x
+                                CROSS JOIN LATERAL skill_tokens(x.{column}) AS t
+                                JOIN skill_aliases a ON a.alias = lower(t)
+                       ON CONFLICT DO NOTHING
+                       """)
+        synced[link] = (cursor.rowcount, removed)
+
+    conn.commit()
+    cursor.close()
+    return synced
+
+
+@click.command("backfill-skills")
+def backfill_skills_command():
+    """Populate user_skills and job_skills from the existing skill strings."""
+    with pooled_connection() as conn:
+        synced = backfill_skill_links(conn)
+    for link, (added, removed) in synced.items():
+        click.echo(f"✅ {link}: {added} link(s) added, {removed} stale link(s) removed")
+
+
+@click.command("load-skills")
+@click.argument("path", default=DEFAULT_TAXONOMY_PATH, type=click.Path(exists=True, dir_okay=False))
+def load_skills_command(path):
+    """Load a skill taxonomy CSV (slug,name,aliases) into the database."""
+    taxonomy = load_taxonomy_file(path)
+    with pooled_connection() as conn:
+        save_taxonomy_db(conn, taxonomy)
+        # Aliases may have moved to other skills; relink users and jobs
+        synced = backfill_skill_links(conn)
+        extractor = reload_extractor(conn)
+    click.echo(f"✅ Loaded {len(taxonomy)} skills ({extractor.fingerprint})")
+    for link, (added, removed) in synced.items():
+        click.echo(f"   {link}: {added} link(s) added, {removed} stale link(s) removed")
+
+
+def init_app(app):
+    app.cli.add_command(load_skills_command)
+    app.cli.add_command(backfill_skills_command)
@@ -0,0 +1,111 @@
+import click
+from flask import current_app
+
+from db import get_dict_cursor, pooled_connection
+
+
+HR_STATS_QUERY = """
+                 SELECT j.total_jobs,
+                        j.active_jobs,
+                        a.total_applications,
+                        a.shortlisted,
+                        a.interviews
+                 FROM (SELECT COUNT(*)                                   AS total_jobs,
+                              COUNT(*) FILTER (WHERE status = 'Active') AS active_jobs
+                       FROM jobs) j
+                          CROSS JOIN
+                      (SELECT COUNT(*)                                        AS total_applications,
+                              COUNT(*) FILTER (WHERE status = 'Shortlisted') AS shortlisted,
+                              COUNT(*) FILTER (WHERE status = 'Interview')   AS interviews
+                       FROM applications) a
+                 """
+
+HR_STATS_FROM_COUNTERS_QUERY = """
+                               SELECT j.total_jobs,
+                                      j.active_jobs,
+                                      a.total_applications,
+                                      a.shortlisted,
+                                      a.interviews
+                               FROM (SELECT COUNT(*)                                   AS total_jobs,
+                                            COUNT(*) FILTER (WHERE status = 'Active') AS active_jobs
+                                     FROM jobs) j
+                                        CROSS JOIN
+                                    (SELECT COALESCE(SUM(app_count), 0)::BIGINT AS total_applications,
+                                            COALESCE(SUM(app_count) FILTER (WHERE status = 'Shortlisted'), 0)::BIGINT
+                                                                                AS shortlisted,
+                                            COALESCE(SUM(app_count) FILTER (WHERE status = 'Interview'), 0)::BIGINT
+                                                                                AS interviews
+                                     FROM application_stats) a
+                               """
+
+CANDIDATE_STATS_QUERY = """
+                        SELECT COUNT(*)                                        AS total_applications,
+                               COUNT(*) FILTER (WHERE status = 'Applied')     AS pending,
+                               COUNT(*) FILTER (WHERE status = 'Shortlisted') AS shortlisted,
+                               COUNT(*) FILTER (WHERE status = 'Interview')   AS interviews,
+                               (SELECT COUNT(*)
+                                FROM saved_jobs
+                                WHERE candidate_id = %s)                      AS saved_count
+                        FROM applications
+                        WHERE candidate_id = %s
+                        """
+
+
+def hr_dashboard_stats(conn, use_counters=None):
+    """All HR dashboard counters in one round trip.
+
+    With ``use_counters`` (defaults to the USE_STATS_TABLE config flag) the
+    application counts come from the trigger-maintained ``application_stats``
+    table, so the cost no longer grows with the size of ``applications``.
+    """
+    if use_counters is None:
+        use_counters = current_app.config.get("USE_STATS_TABLE", False)
+
+    cursor = get_dict_cursor(conn)
+    cursor.execute(HR_STATS_FROM_COUNTERS_QUERY if use_counters else HR_STATS_QUERY)
+    stats = dict(cursor.fetchone())
+    cursor.close()
+    return stats
+
+
+def candidate_dashboard_stats(conn, candidate_id):
+    """All candidate dashboard counters in one round trip"""
+    cursor = get_dict_cursor(conn)
+    cursor.execute(CANDIDATE_STATS_QUERY, (candidate_id, candidate_id))
+    stats = dict(cursor.fetchone())
+    cursor.close()
+    return stats
+
+
+def rebuild_application_stats(conn):
+    """Recompute application_stats from scratch.
+
+    Takes a SHARE lock on ``applications`` so no writes (and therefore no
+    trigger updates) interleave with the recount.
+    """
+    cursor = conn.cursor()
+    cursor.execute("LOCK TABLE applications IN SHARE MODE")
+    cursor.execute("DELETE FROM application_stats")
+    cursor.execute("""
+                   INSERT INTO application_stats (status, slot, app_count)
+                   SELECT COALESCE(status, ''), 0, COUNT(*)
+                   FROM applications
+                   GROUP BY COALESCE(status, '')
+                   """)
+    rows = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    return rows
+
+
+@click.command("rebuild-stats")
+def rebuild_stats_command():
+    """Rebuild the application_stats counter table."""
+    with pooled_connection() as conn:
+        rows = rebuild_application_stats(conn)
+    click.echo(f"✅ application_stats rebuilt ({rows} statuses)")
+
+
+def init_app(app):
+    app.config.setdefault("USE_STATS_TABLE", False)
+    app.cli.add_command(rebuild_stats_command)
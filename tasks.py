@@ -0,0 +1,184 @@
+import time
+
+import psycopg2.extras
+
+from db import get_dict_cursor
+
+
+# Channel the worker LISTENs on; enqueue() NOTIFYs it so idle workers wake
+# up as soon as the enqueuing transaction commits.
+TASK_CHANNEL = "task_queue"
+
+# A task still 'running' after this long is assumed to belong to a dead
+# worker and is put back in the queue.
+STALE_AFTER_SECONDS = 15 * 60
+
+_handlers = {}
+
+
+def task_handler(kind):
+    """Register ``handler(conn, payload) -> result`` for a task kind.
+
+    The handler runs inside the worker's transaction; whatever it writes is
+    committed together with the task being marked done.
+    """
+    def decorator(f):
+        _handlers[kind] = f
+        return f
+
+    return decorator
+
+
+def get_handler(kind):
+    return _handlers.get(kind)
+
+
+def enqueue(conn, kind, payload, user_id=None, supersede=False, max_attempts=3, delay=0):
+    """Queue a task in the caller's transaction and return its id.
+
+    Nothing is visible to workers until the caller commits, so a task is
+    never picked up for a row the request later rolls back. With
+    ``supersede`` any still-queued task of the same kind for the same user
+    is cancelled first. ``delay`` holds the task back for that many seconds.
+    """
+    cursor = conn.cursor()
+
+    if supersede and user_id is not None:
+        cursor.execute("""
+                       UPDATE task_queue
+                       SET status      = 'superseded',
+                           finished_at = CURRENT_TIMESTAMP
+                       WHERE kind = %s
+                         AND user_id = %s
+                         AND status = 'queued'
+                       """, (kind, user_id))
+
+    cursor.execute("""
+                   INSERT INTO task_queue (kind, payload, user_id, max_attempts, run_after)
+                   VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP + make_interval(secs => %s))
+                   RETURNING task_id
+                   """, (kind, psycopg2.extras.Json(payload), user_id, max_attempts, delay))
+    task_id = cursor.fetchone()[0]
+
+    cursor.execute("SELECT pg_notify(%s, %s)", (TASK_CHANNEL, kind))
+    cursor.close()
+    return task_id
+
+
+def claim(conn, kinds=None):
+    """Atomically take the oldest runnable task, or return None.
+
+    ``FOR UPDATE SKIP LOCKED`` lets any number of workers poll the same
+    table without blocking each other or double-claiming a row.
+    """
+    cursor = get_dict_cursor(conn)
+    cursor.execute("""
+                   UPDATE task_queue
+                   SET status     = 'running',
+                       started_at = CURRENT_TIMESTAMP,
+                       attempts   = attempts + 1
+                   WHERE task_id = (SELECT task_id
+                                    FROM task_queue
+                                    WHERE status = 'queued'
+                                      AND run_after <= CURRENT_TIMESTAMP
+                                      AND (%s::text[] IS NULL OR kind = ANY (%s::text[]))
+                                    ORDER BY task_id
+                                    LIMIT 1 FOR UPDATE SKIP LOCKED)
+                   RETURNING task_id, kind, payload, user_id, attempts, max_attempts
+                   """, (kinds, kinds))
+    task = cursor.fetchone()
+    conn.commit()
+    cursor.close()
+    return task
+
+
+def complete(conn, task_id, result, duration_ms):
+    cursor = conn.cursor()
+    cursor.execute("""
+                   UPDATE task_queue
+                   SET status      = 'done',
+                       result      = %s,
+                       error       = NULL,
+                       finished_at = CURRENT_TIMESTAMP,
+                       duration_ms = %s
+                   WHERE task_id = %s
+                   """, (psycopg2.extras.Json(result), duration_ms, task_id))
+    cursor.close()
+
+
+def fail(conn, task, error, duration_ms):
+    """Record a failure; retry with backoff until ``max_attempts`` is used up"""
+    retry = task["attempts"] < task["max_attempts"]
+    cursor = conn.cursor()
+    cursor.execute("""
+                   UPDATE task_queue
+                   SET status      = %s,
+                       error       = %s,
+                       run_after   = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                       finished_at = CASE WHEN %s THEN NULL ELSE CURRENT_TIMESTAMP END,
+                       duration_ms = %s
+                   WHERE task_id = %s
+                   """, ("queued" if retry else "failed", error[:2000], 30 * 2 ** task["attempts"],
+                         retry, duration_ms, task["task_id"]))
+    conn.commit()
+    cursor.close()
+
+
+def requeue_stale(conn, stale_after=STALE_AFTER_SECONDS):
+    """Put tasks of dead workers back in the queue.
+
+    A task that has used up its attempts is failed instead, so one that
+    kills its worker every time (an OOM on a poison PDF) is not re-claimed
+    forever. Returns ``(requeued, failed)`` counts.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+                   UPDATE task_queue
+                   SET status      = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                       error       = CASE
+                                         WHEN attempts >= max_attempts
+                                             THEN 'Worker died or stalled on the last attempt'
+                                         ELSE error END,
+                       finished_at = CASE WHEN attempts >= max_attempts THEN CURRENT_TIMESTAMP END
+                   WHERE status = 'running'
+                     AND started_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+                   RETURNING status
+                   """, (stale_after,))
+    statuses = [row[0] for row in cursor.fetchall()]
+    conn.commit()
+    cursor.close()
+    return statuses.count("queued"), statuses.count("failed")
+
+
+def run_task(conn, task):
+    """Run one claimed task and record its outcome. Returns True on success."""
+    handler = get_handler(task["kind"])
+    started = time.perf_counter()
+
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task kind {task['kind']!r}")
+        result = handler(conn, task["payload"])
+        complete(conn, task["task_id"], result, int((time.perf_counter() - started) * 1000))
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        fail(conn, task, f"{type(e).__name__}: {e}", int((time.perf_counter() - started) * 1000))
+        return False
+
+
+def latest_task(conn, kind, user_id):
+    """Most recent task of ``kind`` for a user, for showing its status in the UI"""
+    cursor = get_dict_cursor(conn)
+    cursor.execute("""
+                   SELECT task_id, status, error, queued_at, started_at, finished_at, duration_ms, result
+                   FROM task_queue
+                   WHERE kind = %s
+                     AND user_id = %s
+                   ORDER BY task_id DESC
+                   LIMIT 1
+                   """, (kind, user_id))
+    task = cursor.fetchone()
+    cursor.close()
+    return task
@@ -0,0 +1,105 @@
+"""Background task worker.
+
+Usage: python worker.py [--once] [kind ...]
+
+Claims tasks from the task_queue table with SELECT ... FOR UPDATE SKIP
+LOCKED, so any number of workers can run side by side without a broker.
+Idle workers sleep on LISTEN task_queue and wake when a task is queued.
+"""
+import os
+import select
+import signal
+import sys
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+import analytics
+import rescoring  # noqa: F401  (registers the rescore_applications handler)
+import resume_parser  # noqa: F401  (registers the parse_resume handler)
+import search  # noqa: F401  (registers the refresh_search_words handler)
+import tasks
+from db import pooled_connection
+
+
+POLL_INTERVAL = float(os.environ.get("WORKER_POLL_INTERVAL", 5))
+STALE_CHECK_INTERVAL = 60
+
+# Seconds between HR analytics rollups (0 disables them in this worker)
+ANALYTICS_INTERVAL = float(os.environ.get("WORKER_ANALYTICS_INTERVAL", 300))
+
+_stopping = False
+
+
+def _stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+
+def _listen_connection():
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    cursor = conn.cursor()
+    cursor.execute(f"LISTEN {tasks.TASK_CHANNEL}")
+    cursor.close()
+    return conn
+
+
+def run_worker(kinds=None, once=False):
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    listener = None if once else _listen_connection()
+    last_stale_check = 0.0
+    last_rollup = 0.0
+    processed = 0
+
+    print(f"🚀 Worker {os.getpid()} started (kinds: {', '.join(kinds) if kinds else 'all'})", flush=True)
+
+    with pooled_connection() as conn:
+        while not _stopping:
+            if time.monotonic() - last_stale_check > STALE_CHECK_INTERVAL:
+                requeued, failed = tasks.requeue_stale(conn)
+                if requeued:
+                    print(f"↩️  Requeued {requeued} stale task(s)", flush=True)
+                if failed:
+                    print(f"✗ Failed {failed} stale task(s) with no attempts left", flush=True)
+                last_stale_check = time.monotonic()
+
+            if not once and ANALYTICS_INTERVAL and time.monotonic() - last_rollup > ANALYTICS_INTERVAL:
+                try:
+                    report = analytics.roll_up(conn)
+                    if report and (report["applications"] or report["activity"]):
+                        print(f"📊 Rolled up {report['applications']} application change(s), "
+                              f"{report['activity']} activity event(s)", flush=True)
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    print(f"⚠️  Analytics rollup failed: {e}", file=sys.stderr, flush=True)
+                last_rollup = time.monotonic()
+
+            task = tasks.claim(conn, kinds)
+            if task is not None:
+                ok = tasks.run_task(conn, task)
+                processed += 1
+                print(f"{'✓' if ok else '✗'} task #{task['task_id']} ({task['kind']})", flush=True)
+                continue
+
+            if once:
+                break
+
+            # Queue is empty: block until NOTIFY or the poll interval elapses
+            if select.select([listener], [], [], POLL_INTERVAL) != ([], [], []):
+                listener.poll()
+                listener.notifies.clear()
+
+    if listener is not None:
+        listener.close()
+    print(f"👋 Worker {os.getpid()} stopped after {processed} task(s)", flush=True)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run_once = "--once" in args
+    task_kinds = [arg for arg in args if arg != "--once"] or None
+    run_worker(task_kinds, once=run_once)